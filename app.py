@@ -1,11 +1,19 @@
 # app.py  – tabs only, zero sidebar
+import importlib
+
 import streamlit as st
 
+from utils import diagnostics_panel, keep_widget_state, stage, start_recorder
+
 # ---------------- page modules -----------------
-from pages.Page1_Upload import upload_tab
-from pages.Page2_Weight import weight_tab
-from pages.Page3_Scoring import scoring_tab
-from pages.Page4_Ranking import ranking_tab
+# (tab label, module, entry function) – a page module is imported the first
+# time its tab is opened and then stays loaded for the life of the process
+PAGES = [
+    ("1. Upload / Choose Data", "pages.Page1_Upload", "upload_tab"),
+    ("2. Weight Criteria", "pages.Page2_Weight", "weight_tab"),
+    ("3. Scoring & Results", "pages.Page3_Scoring", "scoring_tab"),
+    ("4. BORDA Ranking", "pages.Page4_Ranking", "ranking_tab"),
+]
 
 # ------------ App configuration ---------------
 st.set_page_config(
@@ -25,25 +33,29 @@ HIDE_SIDEBAR = """
 """
 st.markdown(HIDE_SIDEBAR, unsafe_allow_html=True)
 
+# ------ Per-stage timing for this run ---------
+recorder = start_recorder()
+
 # ----------------- Title ----------------------
 st.title("Undergraduate Scholarship DSS")
 
 # ----------------- Tabs -----------------------
-tabs = st.tabs([
-    "1. Upload / Choose Data",
-    "2. Weight Criteria",
-    "3. Scoring & Results",
-    "4. BORDA Ranking",
-])
-
-with tabs[0]:
-    upload_tab()
-
-with tabs[1]:
-    weight_tab()
-
-with tabs[2]:
-    scoring_tab()
-
-with tabs[3]:
-    ranking_tab()
\ No newline at end of file
+# Switching tabs reruns the script and only the open tab's body executes;
+# widgets on hidden tabs keep their values through keep_widget_state()
+keep_widget_state()
+tabs = st.tabs([label for label, _, _ in PAGES], key="active_tab", on_change="rerun")
+
+try:
+    for tab, (_, module_name, entry) in zip(tabs, PAGES):
+        if not tab.open:
+            continue
+        with tab:
+            with stage("app.load_page"):
+                page = importlib.import_module(module_name)
+            getattr(page, entry)()
+
+    # ------------- Diagnostics --------------------
+    st.markdown("---")
+    diagnostics_panel(recorder)
+finally:
+    recorder.flush()
\ No newline at end of file
@@ -0,0 +1,105 @@
+# engine/__init__.py
+"""
+Headless scoring engine for the Scholarship DSS.
+
+The Streamlit tabs in pages/ handle I/O and display; everything numeric lives
+here and works on plain NumPy arrays so it can run without a UI. Importing
+the package registers every built-in scoring method (engine.methods).
+"""
+
+from engine.kernels import (
+    METHOD_REGISTRY,
+    METHODS,
+    NORMALIZATIONS,
+    ColumnStats,
+    MethodKernel,
+    Normalizations,
+    ScoringScheme,
+    as_matrix,
+    as_scoring_matrix,
+    as_weights,
+    compute_saw,
+    compute_topsis,
+    compute_wp,
+    get_method,
+    map_blocks,
+    normalized_coefficients,
+    register_method,
+    registered_methods,
+    row_blocks,
+    score_all,
+    set_scoring_threads,
+)
+import engine.methods  # registers VIKOR, MOORA, EDAS, CODAS and PROMETHEE_II
+from engine.aggregation import (
+    AGGREGATIONS,
+    aggregate_ranks,
+    agreement,
+    copeland_scores,
+    kemeny_scores,
+    kendall_tau,
+    spearman_rho,
+    weighted_borda,
+)
+from engine.compact import CRITERIA_SPECS, CompactMatrix, CriterionSpec
+from engine.batch import ProfileScores, as_weight_matrix, load_weight_profiles, score_profiles
+from engine.incremental import IncrementalScorer, RankIndex, RunningStats
+from engine.outofcore import OutOfCoreResult, external_rank, score_out_of_core
+from engine.pipeline import ScoringPipeline, ScoringRun, persist_async
+from engine.ranking import borda_scores, rank_desc
+from engine.sensitivity import StabilityReport, rank_stability, sample_weights
+from engine.store import ResultStore
+
+__all__ = [
+    "AGGREGATIONS",
+    "CRITERIA_SPECS",
+    "METHODS",
+    "METHOD_REGISTRY",
+    "NORMALIZATIONS",
+    "ColumnStats",
+    "CompactMatrix",
+    "CriterionSpec",
+    "IncrementalScorer",
+    "MethodKernel",
+    "Normalizations",
+    "OutOfCoreResult",
+    "ProfileScores",
+    "RankIndex",
+    "ResultStore",
+    "RunningStats",
+    "ScoringPipeline",
+    "ScoringRun",
+    "ScoringScheme",
+    "StabilityReport",
+    "aggregate_ranks",
+    "agreement",
+    "as_matrix",
+    "as_scoring_matrix",
+    "as_weight_matrix",
+    "as_weights",
+    "borda_scores",
+    "compute_saw",
+    "compute_topsis",
+    "compute_wp",
+    "copeland_scores",
+    "external_rank",
+    "get_method",
+    "kemeny_scores",
+    "kendall_tau",
+    "load_weight_profiles",
+    "map_blocks",
+    "normalized_coefficients",
+    "persist_async",
+    "rank_desc",
+    "rank_stability",
+    "register_method",
+    "registered_methods",
+    "row_blocks",
+    "sample_weights",
+    "score_all",
+    "score_out_of_core",
+    "score_profiles",
+    "set_scoring_threads",
+    "spearman_rho",
+    "weighted_borda",
+]
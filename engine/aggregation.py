@@ -0,0 +1,320 @@
+# engine/aggregation.py
+"""
+Rank aggregation over an (applicants × methods) rank matrix, plus
+inter-method agreement.
+
+Flow:
+1. Every aggregation takes the per-method ranks (rank 1 is best) and
+   optional method weights, and returns one score per applicant (higher is
+   better) so the result ranks, pages and shortlists like any method:
+    • BORDA    → Σ w·(n − rank); with equal weights exactly the ranking
+                 tab's BORDA (engine.ranking.borda_scores)
+    • COPELAND → pairwise weighted-majority contests: wins − losses.
+                 Exact (every pair, O(n² · methods) in blocks) up to
+                 COPELAND_EXACT_ROWS applicants. Larger cohorts are
+                 estimated against a reference set (the top of the BORDA
+                 order plus one representative per stratum, counted with
+                 the stratum's size), and the COPELAND_EXACT_TOP best
+                 estimates are then scored exactly against everyone:
+                 the top of the list is exact, the rest an estimate.
+                 O(n · (reference_rows + exact_top) · methods)
+    • KEMENY   → Kemeny approximation: order by weighted median rank (the
+                 footrule aggregation, within a constant factor of the
+                 optimal Kemeny order), then adjacent swaps wherever a
+                 weighted majority prefers the lower applicant (local
+                 Kemenization, odd-even passes, O(n · methods) each)
+   A NaN rank (a method that could not score an applicant) counts as last
+   place for COPELAND and KEMENY; BORDA keeps it NaN, as before.
+2. agreement() reports Kendall's tau-b and Spearman's rho for every pair
+   of methods. Tau counts discordant pairs as inversions of one ranking
+   sorted by the other, bit by bit (one stable partition per bit), so it
+   is O(n log n) rather than a pairwise loop; rho is the correlation of
+   average ranks.
+"""
+
+from itertools import combinations
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from engine.ranking import BORDA
+
+# ---------- Constants ----------
+COPELAND = "COPELAND"
+KEMENY = "KEMENY"
+AGGREGATIONS = (BORDA, COPELAND, KEMENY)
+SCORE_COLUMNS = {BORDA: "Borda_Score", COPELAND: "Copeland_Score", KEMENY: "Kemeny_Score"}
+
+COPELAND_EXACT_ROWS = 8192  # cohorts up to this size compare every pair
+COPELAND_EXACT_TOP = 512  # above it: best estimates re-scored exactly against everyone
+COPELAND_REFERENCE_ROWS = 512  # estimate: opponents per applicant, half the top, half strata representatives
+COPELAND_BLOCK_CELLS = 1 << 21  # applicants × opponents compared per block
+KEMENY_MAX_PASSES = 128  # odd-even swap passes (stops earlier once no swap helps)
+
+# ---------- Helper Functions ----------
+
+def as_rank_matrix(ranks) -> np.ndarray:
+    """Ranks as a float64 (applicants × methods) matrix."""
+    ranks = np.asarray(ranks, dtype=np.float64)
+    if ranks.ndim == 1:
+        ranks = ranks[:, None]
+    if ranks.ndim != 2:
+        raise ValueError(f"Expected an (applicants × methods) rank matrix, got {ranks.ndim}-D")
+    return ranks
+
+def as_method_weights(weights, n_methods: int) -> np.ndarray:
+    """Method weights as a float64 vector (equal weights when None)."""
+    if weights is None:
+        return np.ones(n_methods)
+    if isinstance(weights, dict):
+        weights = list(weights.values())
+    w = np.asarray(weights, dtype=np.float64)
+    if w.shape != (n_methods,):
+        raise ValueError(f"Expected {n_methods} method weights, got shape {w.shape}")
+    if (w < 0).any() or not w.sum() > 0:
+        raise ValueError("Method weights must be non-negative and not all zero")
+    return w
+
+def _last_for_nan(ranks: np.ndarray) -> np.ndarray:
+    return np.where(np.isnan(ranks), ranks.shape[0] + 1.0, ranks)
+
+def _preference(a: np.ndarray, b: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Weighted vote of a over b per row pair: Σ w·sign(rank_b − rank_a) (> 0: a is preferred)."""
+    return np.sign(b - a) @ weights
+
+# ---------- Aggregations ----------
+
+def weighted_borda(ranks, weights=None) -> np.ndarray:
+    """Σ w·(n − rank) over the methods, higher is better."""
+    ranks = as_rank_matrix(ranks)
+    w = as_method_weights(weights, ranks.shape[1])
+    return (ranks.shape[0] - ranks) @ w
+
+def _copeland_against(columns: np.ndarray, rows: np.ndarray, reference: np.ndarray, counts: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """
+    Σ count·sign(weighted vote) of each applicant in rows against every
+    reference applicant (columns and reference: one contiguous row per
+    method; the block buffers are reused).
+    """
+    scores = np.empty(len(rows))
+    block_rows = max(1, COPELAND_BLOCK_CELLS // reference.shape[1])
+    votes = np.empty((min(block_rows, len(rows)), reference.shape[1]), dtype=reference.dtype)
+    vote = np.empty_like(votes)
+    for start in range(0, len(rows), block_rows):
+        block = rows[start:start + block_rows]
+        size = len(block)
+        votes[:size] = 0.0
+        for j in range(len(w)):
+            np.subtract(reference[j][None, :], columns[j, block][:, None], out=vote[:size])
+            np.sign(vote[:size], out=vote[:size])
+            vote[:size] *= w[j]
+            votes[:size] += vote[:size]
+        np.sign(votes[:size], out=votes[:size])
+        scores[start:start + size] = votes[:size] @ counts
+    return scores
+
+def copeland_scores(
+    ranks,
+    weights=None,
+    exact_rows: int = COPELAND_EXACT_ROWS,
+    exact_top: int = COPELAND_EXACT_TOP,
+    reference_rows: int = COPELAND_REFERENCE_ROWS,
+) -> np.ndarray:
+    """
+    Weighted-majority wins minus losses against every other applicant.
+
+    Exact up to exact_rows applicants (every pair is compared). Above that,
+    every applicant is first estimated against reference_rows opponents
+    (the top half of the BORDA order one by one, the rest through one
+    middle applicant per stratum, counted once per stratum member); the
+    exact_top best estimates are then scored exactly against everyone, so
+    the top of the list, where awards are decided, is exact and the rest
+    is an estimate (is_copeland_exact).
+    """
+    ranks = as_rank_matrix(ranks)
+    n_rows, n_methods = ranks.shape
+    w = as_method_weights(weights, n_methods)
+    ranks = _last_for_nan(ranks)
+    if n_rows == 0:
+        return np.empty(0)
+
+    # float32 while ranks are exact in it (half the memory traffic)
+    dtype = np.float32 if n_rows < 2 ** 24 else np.float64
+    columns = np.ascontiguousarray(ranks.T, dtype=dtype)  # methods × applicants
+    w = w.astype(dtype)
+    everyone = np.arange(n_rows)
+    if is_copeland_exact(n_rows, exact_rows):
+        return _copeland_against(columns, everyone, columns, np.ones(n_rows, dtype=dtype), w)
+
+    order = np.argsort(-((n_rows - ranks) @ w), kind="stable")
+    top = reference_rows // 2
+    edges = np.linspace(top, n_rows, reference_rows - top + 1).round().astype(np.int64)
+    middles = (edges[:-1] + edges[1:]) // 2
+    opponents = np.concatenate((order[:top], order[middles]))
+    counts = np.concatenate((np.ones(top), np.diff(edges))).astype(dtype)
+    scores = _copeland_against(columns, everyone, np.ascontiguousarray(columns[:, opponents]), counts, w)
+
+    candidates = np.sort(np.argsort(-scores, kind="stable")[:exact_top])
+    scores[candidates] = _copeland_against(columns, candidates, columns, np.ones(n_rows, dtype=dtype), w)
+    return scores
+
+def is_copeland_exact(n_rows: int, exact_rows: int = COPELAND_EXACT_ROWS) -> bool:
+    """Whether copeland_scores compares every pair for a cohort this size (otherwise only its top is exact)."""
+    return n_rows <= exact_rows
+
+def kemeny_scores(ranks, weights=None, max_passes: int = KEMENY_MAX_PASSES) -> np.ndarray:
+    """
+    Kemeny approximation as scores: n − position in the aggregated order.
+
+    The start is the weighted median rank (ties: weighted mean rank, then
+    row order); odd-even passes then swap neighbours a weighted majority
+    ranks the other way round, each swap lowering the weighted Kendall
+    distance to the methods, until no swap helps (a locally Kemeny-optimal
+    order) or max_passes is reached.
+    """
+    ranks = as_rank_matrix(ranks)
+    n_rows, n_methods = ranks.shape
+    w = as_method_weights(weights, n_methods)
+    ranks = _last_for_nan(ranks)
+
+    # Weighted (lower) median rank per applicant
+    sort = np.argsort(ranks, axis=1)
+    sorted_ranks = np.take_along_axis(ranks, sort, axis=1)
+    cumulative = np.cumsum(w[sort], axis=1)
+    median_at = (cumulative < w.sum() / 2).sum(axis=1)
+    median = sorted_ranks[np.arange(n_rows), np.minimum(median_at, n_methods - 1)]
+    order = np.lexsort((np.arange(n_rows), ranks @ w, median))
+
+    # Ranks in the current order, so neighbours are compared with strided
+    # slices; only the rows that swap are moved
+    current = ranks[order]
+    for p in range(max_passes):
+        swapped = False
+        for first in (p % 2, 1 - p % 2):
+            pairs = (n_rows - first) // 2
+            if pairs == 0:
+                continue
+            upper = current[first:first + 2 * pairs:2]
+            lower = current[first + 1:first + 2 * pairs:2]
+            left = first + 2 * np.flatnonzero(_preference(upper, lower, w) < 0)
+            if len(left):
+                order[left], order[left + 1] = order[left + 1], order[left].copy()
+                current[left], current[left + 1] = current[left + 1], current[left].copy()
+                swapped = True
+        if not swapped:
+            break
+
+    scores = np.empty(n_rows)
+    scores[order] = n_rows - np.arange(n_rows, dtype=np.float64)
+    return scores
+
+def aggregate_ranks(ranks, aggregation: str = BORDA, weights=None) -> np.ndarray:
+    """Aggregate scores (higher is better) by name: BORDA, COPELAND or KEMENY."""
+    aggregation = aggregation.upper()
+    if aggregation == BORDA:
+        return weighted_borda(ranks, weights)
+    if aggregation == COPELAND:
+        return copeland_scores(ranks, weights)
+    if aggregation == KEMENY:
+        return kemeny_scores(ranks, weights)
+    raise ValueError(f"Unknown rank aggregation {aggregation!r} (choose from {', '.join(AGGREGATIONS)})")
+
+# ---------- Agreement ----------
+
+def _codes(values: np.ndarray) -> np.ndarray:
+    """Dense integer codes 0..u−1 in value order."""
+    return np.unique(values, return_inverse=True)[1].astype(np.int64)
+
+def _tied_pairs(counts: np.ndarray) -> float:
+    counts = counts.astype(np.float64)
+    return float((counts * (counts - 1) / 2).sum())
+
+def _inversions(y: np.ndarray) -> int:
+    """
+    Pairs i < j with y[i] > y[j], for non-negative integer codes.
+
+    From the top bit down, y is kept stably sorted by its higher bits; within
+    a group of equal higher bits every 1 at this bit ahead of a 0 is an
+    inversion, and a stable partition by the bit (cumulative sums, O(n))
+    prepares the next bit.
+    """
+    n = len(y)
+    if n < 2:
+        return 0
+    positions = np.arange(n)
+    inversions = 0
+    for b in range(int(y.max()).bit_length() - 1, -1, -1):
+        key, bit = y >> (b + 1), (y >> b) & 1
+        start = np.ones(n, dtype=bool)
+        start[1:] = key[1:] != key[:-1]
+        starts = np.flatnonzero(start)
+        group = np.cumsum(start) - 1
+        group_start = starts[group]
+
+        ones_before = np.cumsum(bit) - bit
+        ones_before -= ones_before[group_start]
+        zeros_before = positions - group_start - ones_before
+        inversions += int(ones_before[bit == 0].sum())
+
+        sizes = np.diff(np.append(starts, n))
+        zeros_total = sizes - np.add.reduceat(bit, starts)
+        target = np.where(bit == 0, group_start + zeros_before, group_start + zeros_total[group] + ones_before)
+        sorted_y = np.empty_like(y)
+        sorted_y[target] = y
+        y = sorted_y
+    return inversions
+
+def kendall_tau(a, b) -> float:
+    """Kendall's tau-b of two rankings (rows with a NaN rank are left out), O(n log n)."""
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    valid = ~(np.isnan(a) | np.isnan(b))
+    x, y = _codes(a[valid]), _codes(b[valid])
+    n = len(x)
+    if n < 2:
+        return float("nan")
+    order = np.lexsort((y, x))
+    x, y = x[order], y[order]
+
+    pairs = n * (n - 1) / 2
+    x_ties = _tied_pairs(np.bincount(x))
+    y_ties = _tied_pairs(np.bincount(y))
+    joint_start = np.ones(n, dtype=bool)
+    joint_start[1:] = (x[1:] != x[:-1]) | (y[1:] != y[:-1])
+    joint_ties = _tied_pairs(np.diff(np.append(np.flatnonzero(joint_start), n)))
+
+    discordant = _inversions(y)
+    denominator = np.sqrt((pairs - x_ties) * (pairs - y_ties))
+    if denominator == 0:
+        return float("nan")
+    return float((pairs - x_ties - y_ties + joint_ties - 2 * discordant) / denominator)
+
+def _average_ranks(values: np.ndarray) -> np.ndarray:
+    """Ascending ranks with ties sharing their average rank."""
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    first = np.cumsum(counts) - counts
+    return (first + (counts + 1) / 2)[inverse]
+
+def spearman_rho(a, b) -> float:
+    """Spearman's rho of two rankings (rows with a NaN rank are left out)."""
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    valid = ~(np.isnan(a) | np.isnan(b))
+    if valid.sum() < 2:
+        return float("nan")
+    x, y = _average_ranks(a[valid]), _average_ranks(b[valid])
+    x, y = x - x.mean(), y - y.mean()
+    denominator = np.sqrt((x @ x) * (y @ y))
+    return float(x @ y / denominator) if denominator > 0 else float("nan")
+
+def agreement(ranks, methods: Sequence[str]) -> pd.DataFrame:
+    """Kendall's tau-b and Spearman's rho for every pair of methods (one row per pair)."""
+    ranks = as_rank_matrix(ranks)
+    if ranks.shape[1] != len(methods):
+        raise ValueError(f"Got {len(methods)} method names for {ranks.shape[1]} rank columns")
+    rows: Dict[str, list] = {"Method A": [], "Method B": [], "Kendall_tau": [], "Spearman_rho": []}
+    for i, j in combinations(range(len(methods)), 2):
+        rows["Method A"].append(methods[i])
+        rows["Method B"].append(methods[j])
+        rows["Kendall_tau"].append(kendall_tau(ranks[:, i], ranks[:, j]))
+        rows["Spearman_rho"].append(spearman_rho(ranks[:, i], ranks[:, j]))
+    return pd.DataFrame(rows)
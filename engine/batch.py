@@ -0,0 +1,162 @@
+# engine/batch.py
+"""
+Batch scenario scoring: many weight profiles in a few matrix products.
+
+Flow:
+1. Stack the weight profiles into a (profiles × criteria) matrix W, e.g. from
+   data/weight/weight_default.csv, weight_custom.csv and ad-hoc variants.
+2. Gather the column normalizers once; each row block's WP log matrix is
+   built once and shared by all profiles.
+3. Score every profile at once (cost criteria and the normalization of a
+   ScoringScheme are folded into the coefficients, as in score_all):
+    • SAW    → X @ C.T + shift, C = W / max for the default scheme
+    • WP     → exp(log(X) @ (W·signs).T)
+    • TOPSIS → squared distances expanded into X² @ A².T − 2·X @ (A·P).T + ΣP²
+4. Rank each profile column (rank 1 is best, ties share the minimum rank).
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.kernels import (
+    DEFAULT_BLOCK_ROWS,
+    METHODS,
+    WP_ZERO_REPLACEMENT,
+    ColumnStats,
+    ScoringScheme,
+    as_scoring_matrix,
+    normalized_coefficients,
+    row_blocks,
+)
+from engine.ranking import rank_desc
+
+# ---------- Constants ----------
+PROFILE_METHODS = ("SAW", "WP", "TOPSIS")  # methods with a many-profiles-at-once kernel here
+
+# ---------- Helper Functions ----------
+
+def as_weight_matrix(weight_profiles, n_criteria: int) -> np.ndarray:
+    """Return weight profiles as a float64 (profiles × criteria) matrix."""
+    w = np.atleast_2d(np.asarray(weight_profiles, dtype=np.float64))
+    if w.ndim != 2 or w.shape[1] != n_criteria:
+        raise ValueError(f"Expected a (profiles × {n_criteria}) weight matrix, got shape {w.shape}")
+    return w
+
+def load_weight_profiles(paths: Iterable[Path], criteria: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Read weight CSVs (one profile per row) into a (profiles × criteria) matrix.
+
+    Profiles are named after the file stem, with a row suffix when a file holds
+    more than one row.
+    """
+    names: List[str] = []
+    rows: List[np.ndarray] = []
+    for path in paths:
+        path = Path(path)
+        df = pd.read_csv(path, encoding="utf-8-sig")
+        missing = [c for c in criteria if c not in df.columns]
+        if missing:
+            raise ValueError(f"{path.name} is missing weights for: {', '.join(missing)}")
+        values = df[list(criteria)].to_numpy(dtype=np.float64)
+        for i, row in enumerate(values):
+            names.append(path.stem if len(values) == 1 else f"{path.stem}[{i}]")
+            rows.append(row)
+    return names, np.vstack(rows) if rows else np.empty((0, len(criteria)))
+
+@dataclass
+class ProfileScores:
+    """Scores and ranks per method, each shaped (applicants × profiles)."""
+
+    profile_names: List[str]
+    scores: Dict[str, np.ndarray] = field(default_factory=dict)
+    ranks: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def to_frame(self, method: str, ids: Optional[Sequence] = None, ranks: bool = False) -> pd.DataFrame:
+        """One method's score (or rank) matrix as a DataFrame with profile columns."""
+        values = self.ranks[method] if ranks else self.scores[method]
+        index = pd.Index(ids, name="ID") if ids is not None else None
+        return pd.DataFrame(values, columns=self.profile_names, index=index)
+
+# ---------- Batch Scoring ----------
+
+def score_profiles(
+    matrix: np.ndarray,
+    weight_profiles,
+    methods: Iterable[str] = METHODS,
+    profile_names: Optional[Sequence[str]] = None,
+    stats: Optional[ColumnStats] = None,
+    with_ranks: bool = True,
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+    scheme: Optional[ScoringScheme] = None,
+) -> ProfileScores:
+    """
+    Score every weight profile for every applicant (scheme as for score_all).
+
+    Row blocks bound the temporaries; the outputs themselves are dense
+    (applicants × profiles) float64 matrices per method. Compact matrices are
+    decoded block by block in float64: the expanded TOPSIS distances cancel
+    too much for float32.
+    """
+    matrix = as_scoring_matrix(matrix)
+    if matrix.dtype != np.float64:
+        matrix = matrix.astype(np.float64)
+    n_rows, n_criteria = matrix.shape
+    W = as_weight_matrix(weight_profiles, n_criteria)
+    n_profiles = W.shape[0]
+    methods = [m.upper() for m in methods]
+    unknown = set(methods) - set(PROFILE_METHODS)
+    if unknown:
+        raise ValueError(f"Batch profile scoring supports {', '.join(PROFILE_METHODS)}, not {', '.join(sorted(unknown))}")
+
+    if profile_names is None:
+        profile_names = [f"profile_{i}" for i in range(n_profiles)]
+    if len(profile_names) != n_profiles:
+        raise ValueError(f"Got {len(profile_names)} profile names for {n_profiles} profiles")
+
+    scheme = scheme or ScoringScheme()
+    signs = scheme.signs(n_criteria)
+    if stats is None and ("SAW" in methods or "TOPSIS" in methods):
+        stats = ColumnStats.from_matrix(matrix)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if "SAW" in methods:
+            saw_coef, saw_shift = normalized_coefficients(stats, W, signs, scheme.normalization or "max")
+            saw_coef = saw_coef.T  # criteria × profiles
+        if "WP" in methods:
+            wp_coef = (W * signs).T
+        if "TOPSIS" in methods:
+            scale, _ = normalized_coefficients(stats, W, signs, scheme.normalization or "vector")  # profiles × criteria
+            hi, lo = scale * stats.col_max, scale * stats.col_min
+            ideal_pos, ideal_neg = np.maximum(hi, lo), np.minimum(hi, lo)
+            scale_sq = np.square(scale).T
+            pos_cross, neg_cross = (scale * ideal_pos).T, (scale * ideal_neg).T
+            pos_const, neg_const = np.square(ideal_pos).sum(axis=1), np.square(ideal_neg).sum(axis=1)
+
+    result = ProfileScores(profile_names=list(profile_names))
+    for m in methods:
+        result.scores[m] = np.empty((n_rows, n_profiles), dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for rows in row_blocks(n_rows, block_rows):
+            block = matrix[rows]
+            if "SAW" in methods:
+                np.matmul(block, saw_coef, out=result.scores["SAW"][rows])
+                if np.any(saw_shift):
+                    result.scores["SAW"][rows] += saw_shift
+            if "WP" in methods:
+                log_block = np.log(np.where(block == 0, WP_ZERO_REPLACEMENT, block))
+                result.scores["WP"][rows] = np.exp(log_block @ wp_coef)
+            if "TOPSIS" in methods:
+                sq_term = np.square(block) @ scale_sq
+                dist_pos = np.sqrt(np.maximum(sq_term - 2.0 * (block @ pos_cross) + pos_const, 0.0))
+                dist_neg = np.sqrt(np.maximum(sq_term - 2.0 * (block @ neg_cross) + neg_const, 0.0))
+                result.scores["TOPSIS"][rows] = dist_neg / (dist_pos + dist_neg)
+
+    if with_ranks:
+        for m in methods:
+            result.ranks[m] = rank_desc(result.scores[m])
+    return result
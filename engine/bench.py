@@ -0,0 +1,241 @@
+# engine/bench.py
+"""
+Benchmark suite: time and memory of every pipeline stage at scale.
+
+Usage:
+    python -m engine.bench --sizes 100000,1000000 --criteria 10,20 --output bench.json
+    python -m engine.bench --sizes 1000000 --compare bench.json   # regression check
+
+Flow:
+1. For every dataset size, write a synthetic applicant CSV (engine.synthetic)
+   to a temporary directory.
+2. Time each stage and record its peak traced allocation (tracemalloc):
+    • ingest      – streaming CSV → columnar table (validation + banding)
+    • band        – income parsing and banding of one in-memory frame
+    • saw/wp/topsis – each scoring kernel alone
+    • score_all   – all three kernels in one blocked pass (row blocks on
+                    every core)
+    • serial      – score_all on one thread
+    • rank        – rank_desc of one score vector
+    • borda       – ranks of all methods + BORDA table
+    • top_k       – shortlist of the best 1% by partial selection
+   Scoring stages are repeated for every criteria count (extra 1-to-5 columns).
+3. Write the records as JSON (with environment details) and print a table.
+4. With --compare, flag stages slower than the baseline by more than the
+   tolerance; the exit status is non-zero if any regressed.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.ingest import ingest_csv
+from engine.kernels import METHODS, as_matrix, compute_saw, compute_topsis, compute_wp, score_all
+from engine.pipeline import ScoringRun
+from engine.preprocess import band_income
+from engine.ranking import rank_desc, top_k
+from engine.schema import CRITERIA_COLUMNS, ID_COLUMN
+from engine.storage import open_table
+from engine.synthetic import criteria_columns, generate_applicants, write_applicants_csv
+
+# ---------- Constants ----------
+DEFAULT_SIZES = (100_000, 1_000_000)
+DEFAULT_CRITERIA = (len(CRITERIA_COLUMNS),)
+DEFAULT_TOLERANCE = 0.25
+MB = 1024 * 1024
+
+# ---------- Measurement ----------
+
+@dataclass
+class StageResult:
+    """One timed stage at one dataset size and criteria count."""
+
+    stage: str
+    rows: int
+    criteria: int
+    seconds: float
+    peak_mb: Optional[float]
+
+    @property
+    def key(self) -> Tuple[str, int, int]:
+        return (self.stage, self.rows, self.criteria)
+
+def measure(fn: Callable[[], object], repeat: int = 1, memory: bool = True) -> Tuple[float, Optional[float]]:
+    """
+    Best wall time over `repeat` untraced runs, plus the peak traced allocation
+    (MB) of one extra run under tracemalloc (tracing slows Python code down,
+    so it never overlaps the timed runs).
+    """
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1] / MB
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+def environment() -> Dict[str, object]:
+    """Machine and library details stored with every result file."""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+# ---------- Stages ----------
+
+def bench_size(
+    rows: int,
+    criteria_counts: Sequence[int],
+    workdir: Path,
+    repeat: int = 1,
+    memory: bool = True,
+    seed: int = 0,
+    on_result: Optional[Callable[[StageResult], None]] = None,
+) -> List[StageResult]:
+    """Run every stage for one dataset size."""
+    results: List[StageResult] = []
+
+    def record(stage: str, n_criteria: int, fn: Callable[[], object]) -> None:
+        seconds, peak = measure(fn, repeat, memory)
+        result = StageResult(stage, rows, n_criteria, seconds, peak)
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+
+    # Ingestion and banding work on the schema's 10 criteria
+    csv_path = write_applicants_csv(workdir / f"applicants_{rows}.csv", rows, seed=seed)
+    table_dir = workdir / f"applicants_{rows}.cols"
+    record("ingest", len(CRITERIA_COLUMNS), lambda: ingest_csv(csv_path, table_dir=table_dir))
+    raw = generate_applicants(rows, seed=seed)
+    record("band", len(CRITERIA_COLUMNS), lambda: band_income(raw.copy()))
+    ids = open_table(table_dir).column(ID_COLUMN)
+    del raw
+
+    for n_criteria in criteria_counts:
+        if n_criteria == len(CRITERIA_COLUMNS):
+            matrix = open_table(table_dir).matrix  # compact int8/int16 codes
+        else:
+            frame = band_income(generate_applicants(rows, n_criteria, seed=seed))
+            matrix = as_matrix(frame[criteria_columns(n_criteria)])
+            del frame
+        weights = np.full(n_criteria, 1.0 / n_criteria)
+
+        record("saw", n_criteria, lambda: compute_saw(matrix, weights))
+        record("wp", n_criteria, lambda: compute_wp(matrix, weights))
+        record("topsis", n_criteria, lambda: compute_topsis(matrix, weights))
+        record("score_all", n_criteria, lambda: score_all(matrix, weights, METHODS))
+        record("serial", n_criteria, lambda: score_all(matrix, weights, METHODS, threads=1))
+
+        run = ScoringRun(ids=ids, scores=score_all(matrix, weights, METHODS))
+        record("rank", n_criteria, lambda: rank_desc(run.scores["SAW"]))
+        record("borda", n_criteria, lambda: ScoringRun(ids=ids, scores=run.scores).borda_frame(METHODS))
+        record("top_k", n_criteria, lambda: top_k(run.scores["SAW"], max(1, rows // 100)))
+        del matrix, run
+    return results
+
+def run_suite(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    criteria_counts: Sequence[int] = DEFAULT_CRITERIA,
+    repeat: int = 1,
+    memory: bool = True,
+    seed: int = 0,
+    on_result: Optional[Callable[[StageResult], None]] = None,
+) -> List[StageResult]:
+    """Benchmark every size; synthetic files live in a temporary directory."""
+    results: List[StageResult] = []
+    with tempfile.TemporaryDirectory(prefix="dss-bench-") as tmp:
+        for rows in sizes:
+            results.extend(bench_size(int(rows), criteria_counts, Path(tmp), repeat, memory, seed, on_result))
+    return results
+
+# ---------- Results ----------
+
+def save_results(path: Path, results: Sequence[StageResult]) -> None:
+    payload = {"environment": environment(), "results": [asdict(r) for r in results]}
+    Path(path).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+def load_results(path: Path) -> List[StageResult]:
+    payload = json.loads(Path(path).read_text(encoding="utf-8"))
+    return [StageResult(**r) for r in payload["results"]]
+
+def compare(
+    results: Sequence[StageResult], baseline: Sequence[StageResult], tolerance: float = DEFAULT_TOLERANCE
+) -> List[Tuple[StageResult, float]]:
+    """(result, slowdown ratio) for every stage slower than its baseline by more than tolerance."""
+    base = {r.key: r for r in baseline}
+    regressions = []
+    for r in results:
+        ref = base.get(r.key)
+        if ref is not None and ref.seconds > 0:
+            ratio = r.seconds / ref.seconds
+            if ratio > 1 + tolerance:
+                regressions.append((r, ratio))
+    return regressions
+
+def format_result(r: StageResult) -> str:
+    peak = f"{r.peak_mb:9.1f} MB" if r.peak_mb is not None else "        – MB"
+    rate = r.rows / r.seconds if r.seconds > 0 else float("inf")
+    return f"{r.stage:<10} {r.rows:>11,} rows {r.criteria:>3} crit {r.seconds:9.4f}s {peak} {rate:>14,.0f} rows/s"
+
+# ---------- Command Line ----------
+
+def _int_list(text: str) -> List[int]:
+    return [int(float(v)) for v in text.split(",") if v.strip()]
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m engine.bench", description="Benchmark the scoring pipeline stages.")
+    parser.add_argument("--sizes", type=_int_list, default=list(DEFAULT_SIZES), help="comma-separated row counts")
+    parser.add_argument("--criteria", type=_int_list, default=list(DEFAULT_CRITERIA), help="comma-separated criteria counts (≥ 10)")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per stage (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run per stage")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic data")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, default=None, help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown (0.25 = 25%%)")
+    return parser
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    results = run_suite(
+        args.sizes, args.criteria, args.repeat, not args.no_memory, args.seed, lambda r: print(format_result(r))
+    )
+    if args.output is not None:
+        save_results(args.output, results)
+        print(f"Results written to {args.output}")
+    if args.compare is not None:
+        regressions = compare(results, load_results(args.compare), args.tolerance)
+        for r, ratio in regressions:
+            print(f"⚠️ {r.stage} at {r.rows:,} rows / {r.criteria} criteria is {ratio:.2f}× slower", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+# engine/cache.py
+"""
+Content-hash keyed memoization for preprocessing, scoring and Borda results.
+
+Flow:
+1. Fingerprint inputs by content: arrays by their bytes, files and columnar
+   tables by a hash of their contents (memoized per path, size and mtime, so
+   an unchanged file is hashed once per process).
+2. Build a cache key from (dataset fingerprint, weights, method, parameters).
+3. Look the key up in RESULT_CACHE, a process-wide LRU with a byte budget.
+   Streamlit runs every session in one server process, so all sessions on a
+   server share it; identical requests return the cached arrays instantly.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ---------- Constants ----------
+HASH_BUFFER_BYTES = 16 * 1024 * 1024
+DEFAULT_CACHE_MB = float(os.environ.get("DSS_CACHE_MB", 512))
+DEFAULT_CACHE_ITEMS = 256
+
+_file_digests: Dict[Tuple[str, int, int], str] = {}
+_file_digests_lock = threading.Lock()
+
+# ---------- Fingerprints ----------
+
+def _hasher():
+    return hashlib.blake2b(digest_size=16)
+
+def fingerprint_array(values) -> str:
+    """Content hash of an array (dtype, shape and bytes)."""
+    arr = np.ascontiguousarray(values)
+    h = _hasher()
+    h.update(f"{arr.dtype.str}{arr.shape}".encode())
+    h.update(memoryview(arr).cast("B") if arr.size else b"")
+    return h.hexdigest()
+
+def fingerprint_stream(fileobj) -> str:
+    """Content hash of a file-like object (e.g. an uploaded file), read in buffers."""
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    h = _hasher()
+    for block in iter(lambda: fileobj.read(HASH_BUFFER_BYTES), b""):
+        h.update(block)
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    return h.hexdigest()
+
+def fingerprint_file(path: Path) -> str:
+    """Content hash of a file; re-hashed only when its size or mtime changes."""
+    path = Path(path)
+    st = path.stat()
+    memo_key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+    with _file_digests_lock:
+        digest = _file_digests.get(memo_key)
+    if digest is None:
+        with open(path, "rb") as f:
+            digest = fingerprint_stream(f)
+        with _file_digests_lock:
+            _file_digests[memo_key] = digest
+    return digest
+
+def fingerprint_table(table) -> str:
+    """Content hash of a columnar table (every file in its directory)."""
+    files = sorted(p for p in Path(table.table_dir).iterdir() if p.is_file())
+    return cache_key(*[(p.name, fingerprint_file(p)) for p in files])
+
+def _normalize(part: Any) -> Any:
+    """Turn a key part into something JSON can hash deterministically."""
+    if isinstance(part, np.ndarray):
+        return {"array": fingerprint_array(part)}
+    if isinstance(part, dict):
+        return {str(k): _normalize(v) for k, v in sorted(part.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(part, (list, tuple)):
+        return [_normalize(p) for p in part]
+    if isinstance(part, Path):
+        return str(part)
+    if isinstance(part, (np.integer, np.floating)):
+        return part.item()
+    return part
+
+def cache_key(*parts: Any) -> str:
+    """Stable key from strings, numbers, lists, dicts and arrays."""
+    payload = json.dumps([_normalize(p) for p in parts], sort_keys=True, default=repr)
+    h = _hasher()
+    h.update(payload.encode("utf-8"))
+    return h.hexdigest()
+
+# ---------- LRU Cache ----------
+
+def value_nbytes(value: Any) -> int:
+    """Approximate memory held by a cached value."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=False))
+    if isinstance(value, dict):
+        return sum(value_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(value_nbytes(v) for v in value)
+    nbytes = getattr(value, "nbytes", None)  # e.g. ResultView
+    return nbytes if isinstance(nbytes, int) else 64
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by total bytes and item count."""
+
+    def __init__(self, max_mb: float = DEFAULT_CACHE_MB, max_items: int = DEFAULT_CACHE_ITEMS):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_items = max_items
+        self._items: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key][0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = value_nbytes(value)
+        if size > self.max_bytes:
+            return  # larger than the whole budget: not worth evicting everything
+        with self._lock:
+            if key in self._items:
+                self._bytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._items and (self._bytes > self.max_bytes or len(self._items) > self.max_items):
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and storing it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+# Shared by every session in this server process
+RESULT_CACHE = LRUCache()
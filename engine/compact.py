@@ -0,0 +1,215 @@
+# engine/compact.py
+"""
+Compact storage for the criteria matrix: small integers on disk, floats per block.
+
+Flow:
+1. Every criterion declares its value range and decimals (CriterionSpec);
+   the range picks the narrowest integer type for its codes
+   (e.g. 1-to-5 scores → int8, GPA 0.00–4.00 at 2 decimals → int16).
+2. Ingestion encodes each chunk into those codes and storage keeps one code
+   column per criterion: about 11 bytes per applicant instead of 80 for a
+   float64 matrix. The declared range is a storage hint, not a validity
+   check: a column whose values do not fit (a 4.5 interview score, 200
+   certificates) is widened (CriterionSpec.widened) to a wider integer type,
+   a finer decimal grid or, failing that, float64 codes.
+3. CompactMatrix stands in for the (rows × criteria) matrix: slicing a row
+   block decodes just that block into SCORING_DTYPE, column_stats()
+   gathers every normalizer from the codes in one float64 pass, and
+   column_levels() counts distinct values on the narrow codes rather than
+   decoded floats.
+4. SCORING_DTYPE is float64 by default, so scores match a float64 matrix
+   to rounding (~1e-14) and ranks are unchanged. DSS_SCORING_DTYPE=float32 (or CompactMatrix.astype)
+   scores in float32: about 1.7× faster, but near-equal scores (within
+   ~1e-7) can swap or tie, which moves a few percent of ranks on large
+   cohorts.
+"""
+
+import os
+from dataclasses import dataclass, replace
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from engine.kernels import DEFAULT_BLOCK_ROWS, ColumnStats, map_blocks
+from engine.schema import INCOME_COLUMN
+
+# ---------- Constants ----------
+SCORING_DTYPE = np.dtype(os.environ.get("DSS_SCORING_DTYPE", "float64"))
+MAX_DECIMALS = 4  # finest decimal grid tried before widening a column to float64 codes
+
+# ---------- Criterion Specifications ----------
+
+@dataclass(frozen=True)
+class CriterionSpec:
+    """
+    Declared value range of one criterion (after banding).
+
+    Values are stored as integer codes round(value × 10**decimals) in the
+    narrowest signed integer type that holds the whole range; decimals=None
+    stores the values themselves as float64 codes (scale 1).
+    """
+
+    column: str
+    low: float
+    high: float
+    decimals: Optional[int] = 0
+
+    def __post_init__(self):
+        if self.high < self.low:
+            raise ValueError(f"{self.column}: high must not be below low")
+
+    @property
+    def scale(self) -> int:
+        return 1 if self.decimals is None else 10 ** self.decimals
+
+    @property
+    def dtype(self) -> np.dtype:
+        if self.decimals is None:
+            return np.dtype(np.float64)
+        lo, hi = round(self.low * self.scale), round(self.high * self.scale)
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if info.min <= lo and hi <= info.max:
+                return np.dtype(dtype)
+        return np.dtype(np.int64)
+
+    def _on_grid(self, values: np.ndarray) -> bool:
+        scaled = values * self.scale
+        return bool(np.allclose(np.rint(scaled), scaled, rtol=0, atol=1e-6))
+
+    def encode(self, values) -> np.ndarray:
+        """Values → codes; raises ValueError outside the range or grid (see widened)."""
+        values = np.asarray(values, dtype=np.float64)
+        if self.decimals is None:
+            return values
+        bad = ~((values >= self.low) & (values <= self.high))
+        if bad.any():
+            raise ValueError(
+                f"{self.column} must lie between {self.low:g} and {self.high:g} "
+                f"(found {values[bad][0]:g})"
+            )
+        if not self._on_grid(values):
+            raise ValueError(f"{self.column} allows at most {self.decimals} decimals")
+        return np.rint(values * self.scale).astype(self.dtype)
+
+    def widened(self, values) -> "CriterionSpec":
+        """
+        This spec if it can encode values, otherwise the narrowest one that
+        can: the range stretched over them, more decimals (up to MAX_DECIMALS)
+        for values off the grid, and float64 codes when integer codes would
+        need more than 32 bits (or values are not finite).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if self.decimals is None or not len(values):
+            return self
+        if not np.isfinite(values).all():
+            return replace(self, decimals=None)
+        low, high = min(self.low, float(values.min())), max(self.high, float(values.max()))
+        if (low, high) == (self.low, self.high) and self._on_grid(values):
+            return self
+        for decimals in range(self.decimals, MAX_DECIMALS + 1):
+            spec = replace(self, low=low, high=high, decimals=decimals)
+            if spec.dtype.itemsize <= 4 and spec._on_grid(values):
+                return spec
+        return replace(self, low=low, high=high, decimals=None)
+
+CRITERIA_SPECS = (
+    CriterionSpec("C1_GPA", 0.0, 4.0, decimals=2),
+    CriterionSpec("C2_Certificates", 0, 127),
+    CriterionSpec(INCOME_COLUMN, 1, 5),  # income band score
+    CriterionSpec("C4_Dependents", 0, 127),
+    CriterionSpec("C5_OrgScore", 0, 10),
+    CriterionSpec("C6_VolunteerEvents", 0, 127),
+    CriterionSpec("C7_LetterScore", 0, 10),
+    CriterionSpec("C8_InterviewScore", 0, 10),
+    CriterionSpec("C9_DocComplete", 0, 10),
+    CriterionSpec("C10_OnTime", 0, 10),
+)
+
+# ---------- Compact Matrix ----------
+
+class CompactMatrix:
+    """
+    (rows × criteria) matrix kept as one integer code array per criterion.
+
+    Indexing with a row slice (or index array) returns that block decoded
+    into a C-contiguous float matrix; nothing is decoded up front.
+    """
+
+    ndim = 2
+
+    def __init__(self, codes: Sequence[np.ndarray], scales: Sequence[int], dtype=SCORING_DTYPE):
+        if len(codes) != len(scales):
+            raise ValueError("Need one scale per code column")
+        self.codes: List[np.ndarray] = list(codes)
+        self.scales = np.asarray(scales, dtype=np.float64)
+        self.dtype = np.dtype(dtype)
+        self.shape = (len(self.codes[0]) if self.codes else 0, len(self.codes))
+
+    @classmethod
+    def from_values(cls, values, specs: Sequence[CriterionSpec], dtype=SCORING_DTYPE) -> "CompactMatrix":
+        """Encode a dense (rows × criteria) array with one spec per column."""
+        values = np.asarray(values, dtype=np.float64)
+        return cls([s.encode(values[:, j]) for j, s in enumerate(specs)], [s.scale for s in specs], dtype)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self.codes)
+
+    def astype(self, dtype) -> "CompactMatrix":
+        """Same codes, decoded into another float type (e.g. float64 accumulation)."""
+        return CompactMatrix(self.codes, self.scales, dtype)
+
+    def __getitem__(self, rows) -> np.ndarray:
+        if isinstance(rows, tuple):
+            rows, cols = rows
+            return self[rows][:, cols]
+        first = self.codes[0][rows] if self.codes else np.empty(0)
+        block = np.empty((len(first), self.shape[1]), dtype=self.dtype)
+        for j, (codes, scale) in enumerate(zip(self.codes, self.scales)):
+            block[:, j] = codes[rows]
+            if scale != 1:
+                block[:, j] /= scale
+        return block
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        dense = self[:]
+        return dense if dtype is None else dense.astype(dtype, copy=False)
+
+    def column_stats(self, block_rows: int = DEFAULT_BLOCK_ROWS, threads: Optional[int] = None) -> ColumnStats:
+        """
+        Max, min, sum and sum of squares per criterion in one blocked pass
+        over the codes (accumulated in float64, then decoded; blocks spread
+        over threads as in kernels.map_blocks).
+        """
+        k = self.shape[1]
+        if self.shape[0] == 0:
+            return ColumnStats.empty(k)
+
+        def partial(rows: slice) -> Tuple[np.ndarray, ...]:
+            out = np.empty((4, k))
+            for j, codes in enumerate(self.codes):
+                block = codes[rows].astype(np.float64)
+                out[:, j] = block.max(), block.min(), block.sum(), block @ block
+            return tuple(out)
+
+        raw = ColumnStats.fold(map_blocks(partial, self.shape[0], block_rows, threads), k, self.shape[0])
+        return ColumnStats(
+            raw.col_max / self.scales, raw.col_min / self.scales, raw.col_sumsq / np.square(self.scales),
+            raw.col_sum / self.scales, self.shape[0],
+        )
+
+    def column_levels(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Distinct values (ascending, decoded exactly like a block) and their counts, per criterion."""
+        levels = []
+        for codes, scale in zip(self.codes, self.scales):
+            distinct, counts = np.unique(codes, return_counts=True)
+            values = np.empty(len(distinct), dtype=self.dtype)
+            values[:] = distinct
+            if scale != 1:
+                values /= scale
+            levels.append((values, counts))
+        return levels
@@ -0,0 +1,341 @@
+# engine/incremental.py
+"""
+Incremental re-scoring for late applicants and corrected rows.
+
+Flow:
+1. IncrementalScorer scores the dataset once and keeps, per method, the
+   scores, their ranks and a RankIndex (sorted copy of the scores).
+2. RunningStats keeps the column normalizers (max, min, sum, sum of squares,
+   row count) and how many rows sit on each max/min, so an edit or append
+   updates them in
+   O(changed rows); a column is only rescanned when its last max/min row is
+   edited away.
+3. On update()/append():
+    • WP has no normalizer: only the changed rows are rescored.
+    • SAW depends on the column max: changed rows only, unless a max shifted.
+    • TOPSIS depends on every column norm and ideal point: any change that
+      moves them rescores the whole method (one vectorized pass).
+    • In general a method is rescored in full when a statistic it reads
+      under the scheme (MethodKernel.reads: e.g. a z-score normalization
+      reads the sum, sum of squares and row count) moved, or always when it
+      is not row-local
+      (VIKOR, EDAS, CODAS, PROMETHEE_II depend on the whole cohort).
+4. Ranks of incrementally rescored methods are maintained, not re-sorted:
+   for an unchanged row, rank = 1 + #scores above it, and only the changed
+   scores can move that count, so each rank is patched by comparing against
+   the m old and new scores (O(n·m) for a handful, O(n log m) via binary
+   search beyond that); changed rows get their rank from the RankIndex
+   (O(m log n)).
+"""
+
+from dataclasses import astuple, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from engine.kernels import METHODS, ColumnStats, ScoringScheme, as_matrix, as_weights, get_method, score_all
+from engine.pipeline import ScoringRun
+from engine.ranking import rank_desc
+from engine.schema import ID_COLUMN
+
+# ---------- Constants ----------
+SMALL_UPDATE = 32  # changed scores up to which ranks are patched by direct comparison
+
+# ---------- Running Column Statistics ----------
+
+@dataclass
+class StatsShift:
+    """Which normalizers moved in one update."""
+
+    col_max: bool = False
+    col_min: bool = False
+    col_sumsq: bool = False
+    col_sum: bool = False
+    rows: bool = False
+
+    @property
+    def any(self) -> bool:
+        return any(astuple(self))
+
+    def __or__(self, other: "StatsShift") -> "StatsShift":
+        return StatsShift(*(a or b for a, b in zip(astuple(self), astuple(other))))
+
+class RunningStats:
+    """Column max/min (with multiplicities), sum and sum of squares, updated in place."""
+
+    def __init__(self, matrix: np.ndarray):
+        self.rescan(matrix)
+
+    def rescan(self, matrix: np.ndarray, columns: Optional[Sequence[int]] = None) -> None:
+        """Recompute every statistic of the given columns (all by default) from the matrix."""
+        if columns is None:
+            stats = ColumnStats.from_matrix(matrix)
+            self.col_max, self.col_min, self.col_sumsq = stats.col_max.copy(), stats.col_min.copy(), stats.col_sumsq.copy()
+            self.col_sum, self.rows = stats.col_sum.copy(), stats.rows
+            self.max_count = (matrix == self.col_max).sum(axis=0)
+            self.min_count = (matrix == self.col_min).sum(axis=0)
+            return
+        for j in columns:
+            values = matrix[:, j]
+            self.col_max[j], self.col_min[j] = values.max(), values.min()
+            self.max_count[j] = (values == self.col_max[j]).sum()
+            self.min_count[j] = (values == self.col_min[j]).sum()
+
+    def to_column_stats(self) -> ColumnStats:
+        return ColumnStats(self.col_max.copy(), self.col_min.copy(), self.col_sumsq.copy(), self.col_sum.copy(), self.rows)
+
+    def update(self, old: Optional[np.ndarray], new: np.ndarray, matrix: np.ndarray) -> StatsShift:
+        """
+        Account for rows changing from old to new (old is None for appends).
+
+        matrix must already hold the new values; it is only read when a
+        column loses its last max/min row and has to be rescanned.
+        """
+        before = (self.col_max.copy(), self.col_min.copy())
+
+        # Only columns whose sums really moved are touched, so a no-op edit
+        # cannot shift a normalizer through rounding
+        sumsq_delta = np.einsum("ij,ij->j", new, new)
+        sum_delta = new.sum(axis=0)
+        if old is not None and len(old):
+            sumsq_delta = sumsq_delta - np.einsum("ij,ij->j", old, old)
+            sum_delta = sum_delta - old.sum(axis=0)
+        self.col_sumsq = self.col_sumsq + sumsq_delta
+        self.col_sum = self.col_sum + sum_delta
+        rows_before = self.rows
+        self.rows = len(matrix)
+
+        if old is not None and len(old):
+            self.max_count -= (old == self.col_max).sum(axis=0)
+            self.min_count -= (old == self.col_min).sum(axis=0)
+        if len(new):
+            new_max, new_min = new.max(axis=0), new.min(axis=0)
+            raised, lowered = new_max > self.col_max, new_min < self.col_min
+            self.col_max = np.where(raised, new_max, self.col_max)
+            self.col_min = np.where(lowered, new_min, self.col_min)
+            self.max_count = np.where(raised, 0, self.max_count) + (new == self.col_max).sum(axis=0)
+            self.min_count = np.where(lowered, 0, self.min_count) + (new == self.col_min).sum(axis=0)
+
+        rescan = np.flatnonzero((self.max_count <= 0) | (self.min_count <= 0)).tolist()
+        if rescan:
+            self.rescan(matrix, rescan)
+
+        return StatsShift(
+            col_max=not np.array_equal(before[0], self.col_max),
+            col_min=not np.array_equal(before[1], self.col_min),
+            col_sumsq=bool(np.any(sumsq_delta != 0)),
+            col_sum=bool(np.any(sum_delta != 0)),
+            rows=self.rows != rows_before,
+        )
+
+# ---------- Order Statistics ----------
+
+class RankIndex:
+    """
+    Ranks of one score vector, kept up to date under small changes.
+
+    `sorted` holds every score in ascending order; the rank of a score s is
+    1 + #{scores > s} (min ranks, rank 1 is best), found by binary search.
+    """
+
+    def __init__(self, scores: np.ndarray):
+        self.rebuild(scores)
+
+    def rebuild(self, scores: np.ndarray) -> None:
+        self.sorted = np.sort(scores)
+        self.ranks = rank_desc(scores)
+        self.has_nan = bool(np.isnan(scores).any())
+
+    def rank_of(self, values: np.ndarray) -> np.ndarray:
+        """Rank each value would have among the current scores."""
+        return len(self.sorted) - np.searchsorted(self.sorted, values, side="right") + 1.0
+
+    def _remove(self, values: np.ndarray) -> None:
+        values = np.sort(values)
+        first = np.searchsorted(values, values, side="left")
+        positions = np.searchsorted(self.sorted, values, side="left") + (np.arange(len(values)) - first)
+        self.sorted = np.delete(self.sorted, positions)
+
+    def _insert(self, values: np.ndarray) -> None:
+        values = np.sort(values)
+        self.sorted = np.insert(self.sorted, np.searchsorted(self.sorted, values), values)
+
+    def replace(self, scores: np.ndarray, rows: np.ndarray, old: np.ndarray) -> None:
+        """
+        Scores of `rows` changed from `old` to scores[rows] (scores is the full,
+        already updated vector); rows beyond the old length are appended rows.
+        """
+        new = scores[rows]
+        if self.has_nan or np.isnan(new).any():
+            self.rebuild(scores)
+            return
+
+        # Unchanged rows: the count of scores above them changes only through the m changed scores
+        n_old = len(self.ranks)
+        existing = scores[:n_old]
+        ranks = np.empty(len(scores), dtype=np.float64)
+        ranks[:n_old] = self.ranks
+        if len(old) + len(new) <= SMALL_UPDATE:
+            # A few comparisons over the scores beat n binary searches
+            for value in new:
+                ranks[:n_old] += existing < value
+            for value in old:
+                ranks[:n_old] -= existing < value
+        else:
+            old_sorted, new_sorted = np.sort(old), np.sort(new)
+            ranks[:n_old] += len(new_sorted) - np.searchsorted(new_sorted, existing, side="right")
+            ranks[:n_old] -= len(old_sorted) - np.searchsorted(old_sorted, existing, side="right")
+
+        self._remove(old)
+        self._insert(new)
+        ranks[rows] = self.rank_of(new)
+        self.ranks = ranks
+
+# ---------- Frames ----------
+
+def upsert_rows(df: pd.DataFrame, changes: pd.DataFrame, id_column: str = ID_COLUMN) -> pd.DataFrame:
+    """
+    New frame with rows of changes replacing those with the same ID (in place)
+    and the rest appended in order, the row order IncrementalScorer.upsert uses.
+    """
+    if changes[id_column].duplicated().any():
+        raise ValueError(f"Duplicate {id_column} values in the changes")
+    changes = changes[list(df.columns)]
+    position = pd.Index(df[id_column]).get_indexer(changes[id_column])
+    known = position >= 0
+    out = df.copy()
+    if known.any():
+        for col in df.columns:
+            values = changes[col].to_numpy()[known]
+            column = out[col].to_numpy(copy=True)
+            if not np.can_cast(np.asarray(values).dtype, column.dtype, casting="same_kind"):
+                column = column.astype(np.result_type(column.dtype, np.asarray(values).dtype))
+            column[position[known]] = values
+            out[col] = column
+    if (~known).any():
+        out = pd.concat([out, changes[~known]], ignore_index=True)
+    return out
+
+# ---------- Scorer ----------
+
+@dataclass
+class UpdateReport:
+    """What one incremental update did."""
+
+    rows_changed: int = 0
+    rows_appended: int = 0
+    shift: StatsShift = field(default_factory=StatsShift)
+    full_rescore: List[str] = field(default_factory=list)
+    incremental: List[str] = field(default_factory=list)
+
+class IncrementalScorer:
+    """Scores, ranks and normalizers of one dataset, kept current under edits and appends."""
+
+    def __init__(
+        self,
+        ids,
+        matrix,
+        weights,
+        methods: Sequence[str] = METHODS,
+        scores: Optional[Dict[str, np.ndarray]] = None,
+        scheme: Optional[ScoringScheme] = None,
+    ):
+        """
+        scores, if given (e.g. ScoringRun.scores for the same data, weights
+        and scheme), skips the first scoring pass.
+        """
+        self.ids = np.asarray(ids, dtype=object).copy()
+        self.matrix = np.array(as_matrix(matrix), dtype=np.float64)  # own, writable copy
+        self.weights = as_weights(weights, self.matrix.shape[1])
+        self.methods = [m.upper() for m in methods]
+        self.scheme = scheme or ScoringScheme()
+        self.stats = RunningStats(self.matrix)
+        if scores is not None and all(m in scores for m in self.methods):
+            self.scores = {m: np.array(scores[m], dtype=np.float64) for m in self.methods}
+        else:
+            self.scores = score_all(self.matrix, self.weights, self.methods, stats=self.stats.to_column_stats(), scheme=self.scheme)
+        self.index = {m: RankIndex(s) for m, s in self.scores.items()}
+        self._positions = {i: p for p, i in enumerate(self.ids.tolist())}
+
+    # ----- helpers -----
+
+    def _needs_full(self, method: str, shift: StatsShift) -> bool:
+        """Whole-cohort methods always; row-local ones when a statistic they read moved."""
+        kernel = get_method(method)
+        return not kernel.row_local or any(getattr(shift, f) for f in kernel.reads(self.scheme))
+
+    def _apply(self, rows: np.ndarray, old_block: Optional[np.ndarray], report: UpdateReport) -> UpdateReport:
+        report.shift = self.stats.update(old_block, self.matrix[rows], self.matrix)
+        stats = self.stats.to_column_stats()
+        for m in self.methods:
+            if self._needs_full(m, report.shift):
+                self.scores[m] = score_all(self.matrix, self.weights, [m], stats=stats, scheme=self.scheme)[m]
+                self.index[m].rebuild(self.scores[m])
+                report.full_rescore.append(m)
+            else:
+                old_scores = self.scores[m][rows[rows < len(self.scores[m])]]
+                scores = self.scores[m]
+                if len(scores) < len(self.matrix):
+                    scores = np.concatenate([scores, np.empty(len(self.matrix) - len(scores))])
+                scores[rows] = score_all(self.matrix[rows], self.weights, [m], stats=stats, scheme=self.scheme)[m]
+                self.scores[m] = scores
+                self.index[m].replace(scores, rows, old_scores)
+                report.incremental.append(m)
+        return report
+
+    # ----- public API -----
+
+    def positions(self, ids: Sequence) -> np.ndarray:
+        """Row positions of the given IDs (raises KeyError for unknown IDs)."""
+        return np.array([self._positions[i] for i in ids], dtype=np.int64)
+
+    def update(self, rows: Sequence[int], values) -> UpdateReport:
+        """Replace the criteria of existing rows (by position)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        values = as_matrix(values).reshape(len(rows), self.matrix.shape[1])
+        if len(np.unique(rows)) != len(rows):
+            raise ValueError("Each row may only be updated once per call")
+        if len(rows) and (rows.min() < 0 or rows.max() >= len(self.matrix)):
+            raise IndexError("Row position out of range")
+        old_block = self.matrix[rows].copy()
+        self.matrix[rows] = values
+        return self._apply(rows, old_block, UpdateReport(rows_changed=len(rows)))
+
+    def append(self, ids: Sequence, values) -> UpdateReport:
+        """Add new applicants at the end."""
+        ids = np.asarray(ids, dtype=object)
+        values = as_matrix(values).reshape(len(ids), self.matrix.shape[1])
+        duplicates = [i for i in ids.tolist() if i in self._positions]
+        if duplicates or len(set(ids.tolist())) != len(ids):
+            raise ValueError(f"IDs already present: {', '.join(map(str, duplicates[:5])) or 'repeated in input'}")
+        start = len(self.matrix)
+        self.matrix = np.concatenate([self.matrix, values])
+        self.ids = np.concatenate([self.ids, ids])
+        self._positions.update({i: start + p for p, i in enumerate(ids.tolist())})
+        rows = np.arange(start, len(self.matrix))
+        return self._apply(rows, None, UpdateReport(rows_appended=len(rows)))
+
+    def upsert(self, ids: Sequence, values) -> UpdateReport:
+        """Update rows whose ID exists and append the rest."""
+        ids = list(ids)
+        values = as_matrix(values).reshape(len(ids), self.matrix.shape[1])
+        known = np.array([i in self._positions for i in ids], dtype=bool)
+        report = UpdateReport()
+        if known.any():
+            edit = self.update(self.positions([i for i, k in zip(ids, known) if k]), values[known])
+            report.rows_changed, report.shift = edit.rows_changed, edit.shift
+            report.full_rescore, report.incremental = edit.full_rescore, edit.incremental
+        if (~known).any():
+            added = self.append([i for i, k in zip(ids, known) if not k], values[~known])
+            report.rows_appended = added.rows_appended
+            report.shift = report.shift | added.shift
+            report.full_rescore = sorted(set(report.full_rescore) | set(added.full_rescore))
+            report.incremental = [m for m in self.methods if m not in report.full_rescore]
+        return report
+
+    def to_run(self, keys: Optional[Dict[str, str]] = None) -> ScoringRun:
+        """Current scores as a ScoringRun, with the maintained ranks filled in."""
+        run = ScoringRun(ids=self.ids, scores=dict(self.scores), keys=dict(keys or {}))
+        run._ranks.update({m: idx.ranks for m, idx in self.index.items()})
+        return run
@@ -0,0 +1,294 @@
+# engine/ingest.py
+"""
+Streaming CSV ingestion for applicant datasets of any size.
+
+Flow:
+1. Read the source CSV in fixed-size chunks (pd.read_csv(chunksize=...)),
+   IDs as text (numeric-looking IDs such as 007 keep their form).
+2. Per chunk: check the schema (required columns), then validate every row
+   against the declarative rules (engine.validation: missing, non-numeric,
+   out-of-range values, too many decimals, duplicate IDs) in bulk.
+   on_invalid="reject" fails the file with a report of every problem in
+   the chunk; on_invalid="quarantine" drops the invalid rows, keeps the
+   rest and writes the dropped rows with their problems to rejected.csv
+   inside the table (or next to the CSV export).
+3. Band the declared criteria (by default C3_ParentIncomeIDR → 1-to-5 score).
+4. Append the chunk to a temporary columnar table (engine.storage; criteria
+   stored as compact int8/int16 codes, see engine.compact) and/or a
+   temporary CSV; once every chunk has passed, move them over the final
+   paths, so a failed upload never leaves a half-written dataset behind.
+
+Only one chunk is held in memory at a time, so peak memory depends on
+chunk_rows, not on the size of the file.
+"""
+
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+from engine.cache import cache_key
+from engine.compact import CRITERIA_SPECS, CriterionSpec
+from engine.metrics import StageRecorder, maybe_stage, timed_chunks
+from engine.preprocess import DEFAULT_BANDS, BandSpec, apply_bands
+from engine.schema import CRITERIA_COLUMNS, EXPECTED_COLUMNS, ID_COLUMN
+from engine.storage import ColumnarWriter, is_fresh, open_table, temp_path
+from engine.validation import DEFAULT_RULES, NUMBER, ColumnRule, RowValidator, summarize_errors
+
+# ---------- Constants ----------
+DEFAULT_CHUNK_ROWS = 100_000
+COPY_BUFFER_BYTES = 16 * 1024 * 1024
+PREVIEW_ROWS = 1_000
+MAX_REPORTED_ERRORS = 10_000  # problems kept in IngestReport.errors; rejected.csv has them all
+REJECTED_FILE = "rejected.csv"
+REJECT, QUARANTINE = "reject", "quarantine"
+
+# ---------- Errors & Results ----------
+
+class IngestError(ValueError):
+    """Raised when a chunk fails validation or preprocessing (errors: the row-level problems, if any)."""
+
+    def __init__(self, message: str, errors: Optional[pd.DataFrame] = None):
+        super().__init__(message)
+        self.errors = errors
+
+@dataclass
+class IngestReport:
+    """Summary of one streaming ingestion run."""
+
+    output_path: Optional[Path] = None
+    table_dir: Optional[Path] = None
+    rows: int = 0
+    chunks: int = 0
+    columns: List[str] = field(default_factory=list)
+    preview: Optional[pd.DataFrame] = None
+    rejected: int = 0  # invalid rows quarantined
+    rejected_path: Optional[Path] = None  # those rows with their problems (CSV)
+    errors: Optional[pd.DataFrame] = None  # first MAX_REPORTED_ERRORS problems
+
+# ---------- Helper Functions ----------
+
+def check_columns(chunk: pd.DataFrame, expected_columns: Sequence[str] = EXPECTED_COLUMNS) -> None:
+    """Raise IngestError if required columns are missing (a file-level problem, never quarantined)."""
+    missing_cols = [col for col in expected_columns if col not in chunk.columns]
+    if missing_cols:
+        raise IngestError(f"Missing required columns: {', '.join(missing_cols)}")
+
+def validate_chunk(
+    chunk: pd.DataFrame,
+    first_row: int,
+    expected_columns: Sequence[str] = EXPECTED_COLUMNS,
+    rules: Sequence[ColumnRule] = DEFAULT_RULES,
+) -> None:
+    """Check one standalone chunk: required columns, then every row; raises IngestError listing all problems."""
+    check_columns(chunk, expected_columns)
+    result = RowValidator([r for r in rules if r.column in expected_columns]).check(chunk, first_row)
+    if len(result.invalid):
+        raise IngestError(result.summary(), errors=result.errors)
+
+def source_key(content_hash: str, bands: Iterable[BandSpec] = DEFAULT_BANDS, rules: Sequence[ColumnRule] = DEFAULT_RULES) -> str:
+    """Shared-cache key of a source's preprocessed table: its content and everything that shapes the table."""
+    return cache_key(content_hash, tuple(bands), CRITERIA_SPECS, tuple(rules))
+
+def cached_report(table_dir: Path, key: str, on_invalid: str = REJECT) -> Optional[IngestReport]:
+    """
+    Report for a table already ingested from the same source (None if there is none).
+
+    Tables are shared between both policies: a clean source gives the same
+    table either way, and a source with invalid rows is only ever published
+    by quarantining, so under on_invalid="reject" such a table raises.
+    """
+    if not is_fresh(table_dir):
+        return None
+    table = open_table(table_dir)
+    if table.extra.get("source_key") != key:
+        return None
+    rejected = int(table.extra.get("rejected_rows", 0))
+    rejected_path = Path(table_dir) / REJECTED_FILE if rejected else None
+    if rejected and on_invalid == REJECT:
+        errors = pd.read_csv(rejected_path, nrows=MAX_REPORTED_ERRORS)
+        raise IngestError(f"Invalid rows: {rejected:,} (first: data row {errors['Row'].iloc[0]}: {errors['Errors'].iloc[0]})")
+    return IngestReport(
+        table_dir=Path(table_dir),
+        rows=table.rows,
+        columns=table.columns,
+        preview=table.to_frame(rows=slice(0, PREVIEW_ROWS)),
+        rejected=rejected,
+        rejected_path=rejected_path,
+    )
+
+def _rejected_rows(chunk: pd.DataFrame, result) -> pd.DataFrame:
+    """The invalid rows as read, with their data row number and problems."""
+    messages = result.row_messages()
+    rows = chunk.iloc[result.invalid]
+    return rows.assign(Row=messages.index.to_numpy(), Errors=messages.to_numpy())[["Row"] + list(chunk.columns) + ["Errors"]]
+
+def _as_numbers(chunk: pd.DataFrame, rules: Sequence[ColumnRule]) -> pd.DataFrame:
+    """Number columns read as text because of an (now dropped) invalid value → numeric again."""
+    for rule in rules:
+        if rule.kind == NUMBER and rule.column in chunk.columns and not pd.api.types.is_numeric_dtype(chunk[rule.column].dtype):
+            chunk[rule.column] = pd.to_numeric(chunk[rule.column])
+    return chunk
+
+def copy_stream(source, target_path: Path) -> None:
+    """Copy a file-like object to disk in fixed-size buffers (renamed into place when complete)."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    tmp = temp_path(target_path)
+    try:
+        with open(tmp, "wb") as f:
+            shutil.copyfileobj(source, f, COPY_BUFFER_BYTES)
+        os.replace(tmp, target_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+# ---------- Main Function ----------
+
+def ingest_csv(
+    source,
+    output_path: Optional[Path] = None,
+    table_dir: Optional[Path] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    preview_rows: int = PREVIEW_ROWS,
+    on_chunk: Optional[Callable[[int], None]] = None,
+    bands: Iterable[BandSpec] = DEFAULT_BANDS,
+    extra: Optional[dict] = None,
+    recorder: Optional[StageRecorder] = None,
+    matrix_specs: Optional[Sequence[CriterionSpec]] = CRITERIA_SPECS,
+    replace: bool = True,
+    on_invalid: str = REJECT,
+    rules: Sequence[ColumnRule] = DEFAULT_RULES,
+) -> IngestReport:
+    """
+    Validate, band and write a CSV (path or file object) chunk by chunk.
+
+    The result goes to a columnar table (table_dir, criteria stored as the
+    scoring matrix, compactly unless matrix_specs is None) and/or a CSV
+    export (output_path). on_chunk, if given, is
+    called with the running row count after each chunk (used by the upload tab
+    for progress); extra is stored in the table metadata. With a recorder,
+    parsing, validation, banding and writing are timed as ingest.* stages.
+    replace=False keeps an existing table at table_dir (shared cache entries).
+    Rows that break the rules raise IngestError (on_invalid="reject", with
+    every problem of the first invalid chunk in .errors) or are quarantined
+    (on_invalid="quarantine"; IngestError only if no valid row is left).
+    On error, previous outputs, if any, are left untouched.
+    """
+    if output_path is None and table_dir is None:
+        raise ValueError("Give an output_path, a table_dir or both")
+    if on_invalid not in (REJECT, QUARANTINE):
+        raise ValueError(f"on_invalid must be {REJECT!r} or {QUARANTINE!r}")
+    bands = tuple(bands)
+    report = IngestReport(
+        output_path=Path(output_path) if output_path is not None else None,
+        table_dir=Path(table_dir) if table_dir is not None else None,
+    )
+    tmp_path = temp_path(report.output_path) if report.output_path else None
+    preview_parts: List[pd.DataFrame] = []
+    error_parts: List[pd.DataFrame] = []
+    validator = RowValidator(rules)
+    writer: Optional[ColumnarWriter] = None
+    out = None
+    rejected_out = None
+    rejected_tmp: Optional[Path] = None
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+    try:
+        reader = pd.read_csv(source, chunksize=chunk_rows, dtype={ID_COLUMN: str})
+        if report.table_dir is not None:
+            writer = ColumnarWriter(
+                report.table_dir, matrix_columns=CRITERIA_COLUMNS, extra=extra, matrix_specs=matrix_specs, replace=replace
+            )
+        if tmp_path is not None:
+            out = open(tmp_path, "w", newline="", encoding="utf-8")
+
+        for chunk in timed_chunks(recorder, "ingest.parse", reader):
+            with maybe_stage(recorder, "ingest.validate", len(chunk)):
+                check_columns(chunk)
+                result = validator.check(chunk, report.rows + report.rejected)
+            if len(result.invalid):
+                if on_invalid == REJECT:
+                    raise IngestError(result.summary(), errors=result.errors)
+                with maybe_stage(recorder, "ingest.quarantine", len(result.invalid)):
+                    if rejected_out is None:
+                        if writer is not None:
+                            rejected_out = writer.attach(REJECTED_FILE)
+                        else:
+                            rejected_tmp = temp_path(report.output_path.with_suffix(".rejected.csv"))
+                            rejected_out = open(rejected_tmp, "wb")
+                    rejected_out.write(_rejected_rows(chunk, result).to_csv(index=False, header=report.rejected == 0).encode("utf-8"))
+                    if sum(len(e) for e in error_parts) < MAX_REPORTED_ERRORS:
+                        error_parts.append(result.errors)
+                    report.rejected += len(result.invalid)
+                    chunk = _as_numbers(chunk[result.valid_mask].reset_index(drop=True), rules)
+                if chunk.empty:
+                    continue
+            with maybe_stage(recorder, "ingest.band", len(chunk)):
+                try:
+                    chunk = apply_bands(chunk, bands)
+                except (ValueError, TypeError) as e:
+                    raise IngestError(f"Failed to band criteria: {e}") from e
+
+            with maybe_stage(recorder, "ingest.write", len(chunk)):
+                if writer is not None:
+                    try:
+                        writer.append(chunk)
+                    except ValueError as e:
+                        raise IngestError(f"Failed to store criteria: {e}") from e
+                if out is not None:
+                    chunk.to_csv(out, index=False, header=report.chunks == 0)
+
+            if report.chunks == 0:
+                report.columns = chunk.columns.tolist()
+            kept = sum(len(p) for p in preview_parts)
+            if kept < preview_rows:
+                preview_parts.append(chunk.head(preview_rows - kept))
+
+            report.rows += len(chunk)
+            report.chunks += 1
+            if on_chunk is not None:
+                on_chunk(report.rows)
+
+        if error_parts:
+            report.errors = pd.concat(error_parts, ignore_index=True).head(MAX_REPORTED_ERRORS)
+        if report.chunks == 0 and report.rejected:
+            raise IngestError(
+                f"No valid rows: {summarize_errors(report.rejected, report.errors)}", errors=report.errors
+            )
+        if report.chunks == 0:
+            raise IngestError("Dataset is empty.")
+        if rejected_out is not None:
+            rejected_out.close()
+            if writer is not None:
+                report.rejected_path = report.table_dir / REJECTED_FILE
+            else:
+                report.rejected_path = report.output_path.with_suffix(".rejected.csv")
+                os.replace(rejected_tmp, report.rejected_path)
+        if out is not None:
+            out.close()
+            os.replace(tmp_path, report.output_path)
+        if writer is not None:
+            writer.extra["rejected_rows"] = report.rejected
+            writer.close()
+            writer = None
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise IngestError(f"Unable to read CSV: {e}") from e
+    finally:
+        if out is not None and not out.closed:
+            out.close()
+        if tmp_path is not None and tmp_path.exists():
+            tmp_path.unlink()
+        if rejected_tmp is not None:
+            if not rejected_out.closed:
+                rejected_out.close()
+            rejected_tmp.unlink(missing_ok=True)
+        if writer is not None:
+            writer.abort()
+
+    report.preview = pd.concat(preview_parts, ignore_index=True)
+    return report
@@ -0,0 +1,525 @@
+# engine/kernels.py
+"""
+Array kernels and the scoring-method registry (SAW, WP, TOPSIS built in).
+
+Flow:
+1. Convert the criteria columns into one contiguous float matrix (as_matrix),
+   or keep a block-decoded compact matrix (engine.compact) as it is.
+2. Every method is a MethodKernel in METHOD_REGISTRY: prepare() turns the
+   weights, the dataset's normalizations and the ScoringScheme into
+   coefficients, score() maps a row block to scores (or per-row partials),
+   and an optional finalize() applies cohort-wide aggregates (e.g. VIKOR's
+   Q). More methods register the same way (engine.methods).
+3. ScoringScheme says which criteria are cost criteria (lower is better)
+   and, optionally, which normalization (max, minmax, vector, zscore) the
+   normalizing methods use instead of their own. Every normalization is an
+   affine map per criterion (normalized_coefficients), so it folds into the
+   method's coefficients: SAW stays one matrix-vector product per block, and
+   no method makes an extra pass over the data for it.
+4. Normalizations holds the column-level precomputations of one dataset
+   (ColumnStats: max, min, sum and sum of squares, gathered in a single
+   blocked pass, from which the L2 norm, mean and standard deviation follow;
+   distinct levels per column), each computed on first use and shared by
+   every method, normalization and criterion type; ScoringPipeline keeps it
+   per dataset across weight changes.
+5. Score every requested method in a single blocked pass over the rows
+   (score_all): each block is read once, and derived block matrices (the
+   WP log matrix) are built once per block for all methods.
+6. Large matrices are sharded by row block over a thread pool (map_blocks):
+   NumPy releases the GIL inside its kernels, every thread reads the same
+   matrix in place (nothing is copied or pickled), and each block is
+   computed exactly as the serial loop would, with the ColumnStats partials
+   folded in block order, so results are bit-identical for any thread
+   count. DSS_SCORING_THREADS caps the threads (default: every core);
+   process pools give each worker its share (set_scoring_threads).
+
+Nothing in this module imports Streamlit; the tabs in pages/ are thin callers.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ---------- Constants ----------
+METHODS = ("SAW", "WP", "TOPSIS")  # default selection; every registered method is accepted
+WP_ZERO_REPLACEMENT = 1e-6  # same guard the original compute_wp used for log(0)
+DEFAULT_BLOCK_ROWS = 65_536  # rows per block; keeps temporaries cache-sized
+SCORING_THREADS = int(os.environ.get("DSS_SCORING_THREADS", 0)) or os.cpu_count() or 1
+
+BENEFIT, COST = "benefit", "cost"
+NORMALIZATIONS = ("max", "minmax", "vector", "zscore")
+# ColumnStats fields each normalization reads (incremental updates rescore when one moves)
+NORMALIZATION_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "max": ("col_max",),
+    "minmax": ("col_max", "col_min"),
+    "vector": ("col_sumsq",),
+    "zscore": ("col_sum", "col_sumsq", "rows"),
+}
+
+# ---------- Helper Functions ----------
+
+def as_matrix(features, dtype=np.float64) -> np.ndarray:
+    """Return criteria values as a C-contiguous float matrix (rows = applicants)."""
+    if hasattr(features, "to_numpy"):
+        features = features.to_numpy(dtype=dtype)
+    return np.ascontiguousarray(features, dtype=dtype)
+
+def as_scoring_matrix(matrix):
+    """
+    Matrix for the kernels: block-decoded matrices (anything with a
+    column_stats() method, e.g. engine.compact.CompactMatrix) pass through,
+    everything else becomes a float64 matrix.
+    """
+    return matrix if hasattr(matrix, "column_stats") else as_matrix(matrix)
+
+def safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator, 0 where the denominator is 0 (a constant criterion)."""
+    out = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+def as_weights(weights, n_criteria: int) -> np.ndarray:
+    """Return weights as a float64 vector and check it matches the criteria count."""
+    if isinstance(weights, dict):
+        weights = list(weights.values())
+    w = np.asarray(weights, dtype=np.float64)
+    if w.ndim != 1 or w.shape[0] != n_criteria:
+        raise ValueError(f"Expected {n_criteria} weights, got shape {w.shape}")
+    return w
+
+def row_blocks(n_rows: int, block_rows: int) -> Iterable[slice]:
+    """Yield consecutive row slices of at most block_rows rows."""
+    for start in range(0, n_rows, block_rows):
+        yield slice(start, min(start + block_rows, n_rows))
+
+def set_scoring_threads(threads: int) -> None:
+    """Threads a blocked pass may use in this process (also a process-pool initializer)."""
+    global SCORING_THREADS
+    SCORING_THREADS = max(1, int(threads))
+
+def threads_per_worker(workers: int) -> int:
+    """Each worker's share of the cores when a process pool runs `workers` passes at once."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def map_blocks(
+    func: Callable[[slice], Any], n_rows: int, block_rows: int = DEFAULT_BLOCK_ROWS, threads: Optional[int] = None
+) -> List[Any]:
+    """
+    func(rows) for every row block, results in block order.
+
+    With several blocks and threads the blocks run on a thread pool; the
+    block boundaries are those of the serial loop, so each result is the
+    same to the bit.
+    """
+    blocks = list(row_blocks(n_rows, block_rows))
+    threads = min(threads or SCORING_THREADS, len(blocks))
+    if threads <= 1:
+        return [func(rows) for rows in blocks]
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="dss-score") as pool:
+        return list(pool.map(func, blocks))
+
+@dataclass(frozen=True)
+class ColumnStats:
+    """Per-criterion statistics shared by every method and normalization."""
+
+    col_max: np.ndarray
+    col_min: np.ndarray
+    col_sumsq: np.ndarray
+    col_sum: np.ndarray
+    rows: int
+
+    @classmethod
+    def empty(cls, n_criteria: int) -> "ColumnStats":
+        nan = np.full(n_criteria, np.nan)
+        return cls(nan, nan.copy(), np.zeros(n_criteria), np.zeros(n_criteria), 0)
+
+    @classmethod
+    def from_matrix(
+        cls, matrix: np.ndarray, block_rows: int = DEFAULT_BLOCK_ROWS, threads: Optional[int] = None
+    ) -> "ColumnStats":
+        """Gather max, min, sum and sum of squares column-wise in one pass over the row blocks."""
+        if hasattr(matrix, "column_stats"):
+            return matrix.column_stats(block_rows, threads)
+        n_rows, n_criteria = matrix.shape
+        if n_rows == 0:
+            return cls.empty(n_criteria)
+
+        def partial(rows: slice) -> Tuple[np.ndarray, ...]:
+            block = np.asarray(matrix[rows], dtype=np.float64)
+            return block.max(axis=0), block.min(axis=0), block.sum(axis=0), np.einsum("ij,ij->j", block, block)
+
+        return cls.fold(map_blocks(partial, n_rows, block_rows, threads), n_criteria, n_rows)
+
+    @classmethod
+    def fold(cls, partials: Iterable[Tuple[np.ndarray, ...]], n_criteria: int, n_rows: int) -> "ColumnStats":
+        """Combine per-block (max, min, sum, sum of squares), in block order (sums are order-sensitive)."""
+        col_max = np.full(n_criteria, -np.inf)
+        col_min = np.full(n_criteria, np.inf)
+        col_sum = np.zeros(n_criteria)
+        col_sumsq = np.zeros(n_criteria)
+        for block_max, block_min, block_sum, block_sumsq in partials:
+            np.maximum(col_max, block_max, out=col_max)
+            np.minimum(col_min, block_min, out=col_min)
+            col_sum += block_sum
+            col_sumsq += block_sumsq
+        return cls(col_max, col_min, col_sumsq, col_sum, n_rows)
+
+    @property
+    def col_norm(self) -> np.ndarray:
+        """Euclidean (vector) norm of each column, used by TOPSIS."""
+        return np.sqrt(self.col_sumsq)
+
+    @property
+    def col_mean(self) -> np.ndarray:
+        return self.col_sum / max(self.rows, 1)
+
+    @property
+    def col_std(self) -> np.ndarray:
+        """Population standard deviation of each column (exactly 0 for a constant column)."""
+        mean = self.col_mean
+        std = np.sqrt(np.maximum(self.col_sumsq / max(self.rows, 1) - mean * mean, 0.0))
+        return np.where(self.col_max == self.col_min, 0.0, std)
+
+    @property
+    def nbytes(self) -> int:
+        return self.col_max.nbytes + self.col_min.nbytes + self.col_sumsq.nbytes + self.col_sum.nbytes
+
+# ---------- Criterion Types & Normalizations ----------
+
+@dataclass(frozen=True)
+class ScoringScheme:
+    """
+    How the criteria are read for one scoring call.
+
+    cost flags the cost criteria (lower is better; empty = all benefit).
+    normalization, if set, replaces the own normalization of every method
+    that normalizes (SAW and CODAS: max, TOPSIS and MOORA: vector).
+    """
+
+    cost: Tuple[bool, ...] = ()
+    normalization: Optional[str] = None
+
+    def __post_init__(self):
+        object.__setattr__(self, "cost", tuple(bool(c) for c in self.cost))
+        if self.normalization is not None and self.normalization not in NORMALIZATIONS:
+            raise ValueError(f"Unknown normalization {self.normalization!r} (choose from {', '.join(NORMALIZATIONS)})")
+
+    @classmethod
+    def from_types(cls, types: Sequence[str], normalization: Optional[str] = None) -> "ScoringScheme":
+        """Scheme from one "benefit"/"cost" label per criterion (case-insensitive)."""
+        labels = [str(t).strip().lower() for t in types]
+        unknown = sorted({t for t in labels if t not in (BENEFIT, COST)})
+        if unknown:
+            raise ValueError(f"Criterion types must be {BENEFIT!r} or {COST!r}, got {', '.join(unknown)}")
+        return cls(tuple(t == COST for t in labels), normalization)
+
+    @property
+    def is_default(self) -> bool:
+        return not any(self.cost) and self.normalization is None
+
+    def signs(self, n_criteria: int) -> np.ndarray:
+        """+1 per benefit criterion, −1 per cost criterion."""
+        if not any(self.cost):
+            return np.ones(n_criteria)
+        if len(self.cost) != n_criteria:
+            raise ValueError(f"Expected {n_criteria} criterion types, got {len(self.cost)}")
+        return np.where(self.cost, -1.0, 1.0)
+
+    def normalization_for(self, kernel: "MethodKernel") -> Optional[str]:
+        """The normalization a method uses under this scheme (None if it does not normalize)."""
+        if kernel.normalization is None:
+            return None
+        return self.normalization or kernel.normalization
+
+    def key(self) -> list:
+        """Cache-key part (empty for the default scheme, so default keys stay unchanged)."""
+        return [] if self.is_default else [list(self.cost), self.normalization]
+
+DEFAULT_SCHEME = ScoringScheme()
+
+def normalized_coefficients(
+    stats: ColumnStats, weights: np.ndarray, signs: np.ndarray, normalization: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Weighted normalization as one multiply-add per value: w·n(x) = x·coef + shift.
+
+    A benefit criterion is read as (x − offset) / divisor, a cost criterion
+    as 1 − (x − offset) / divisor (z-score: (offset − x) / divisor):
+        max      offset 0      divisor max
+        minmax   offset min    divisor max − min
+        vector   offset 0      divisor ‖x‖
+        zscore   offset mean   divisor std
+    A constant column (divisor 0) adds the same amount to every row.
+    weights may be one vector or a (profiles × criteria) matrix; shift is
+    summed per profile.
+    """
+    if normalization == "max":
+        offset, divisor = 0.0, stats.col_max
+    elif normalization == "minmax":
+        offset, divisor = stats.col_min, stats.col_max - stats.col_min
+    elif normalization == "vector":
+        offset, divisor = 0.0, stats.col_norm
+    elif normalization == "zscore":
+        offset, divisor = stats.col_mean, stats.col_std
+    else:
+        raise ValueError(f"Unknown normalization {normalization!r}")
+    scale = safe_ratio(weights, divisor)
+    coef = signs * scale if np.any(signs < 0) else scale
+    flipped = (signs < 0) & (normalization != "zscore")
+    shift_per_weight = np.where(flipped, 1.0, 0.0)
+    if np.any(np.asarray(offset) != 0):
+        shift_per_weight = shift_per_weight - signs * safe_ratio(np.broadcast_to(offset, divisor.shape), divisor)
+    shift = (weights * shift_per_weight).sum(axis=-1)
+    return coef, shift
+
+# ---------- Shared Precomputations ----------
+
+class Normalizations:
+    """
+    Column-level precomputations of one dataset, shared by every method.
+
+    Each is computed on first use only, so scoring WP alone never gathers
+    ColumnStats, and only PROMETHEE II pays for the column levels.
+    precomputed() hands them out without the matrix, for caching; pass
+    them back (stats=, column_levels=) to skip the work.
+    """
+
+    def __init__(
+        self,
+        matrix,
+        stats: Optional[ColumnStats] = None,
+        threads: Optional[int] = None,
+        column_levels: Optional[List[Tuple[np.ndarray, np.ndarray]]] = None,
+    ):
+        self.matrix = as_scoring_matrix(matrix)
+        self.threads = threads
+        if stats is not None:
+            self.__dict__["stats"] = stats
+        if column_levels is not None:
+            self.__dict__["column_levels"] = column_levels
+
+    @property
+    def rows(self) -> int:
+        return self.matrix.shape[0]
+
+    @cached_property
+    def stats(self) -> ColumnStats:
+        return ColumnStats.from_matrix(self.matrix, threads=self.threads)
+
+    @property
+    def col_mean(self) -> np.ndarray:
+        """Mean of each column (from the same pass as the other ColumnStats)."""
+        return self.stats.col_mean
+
+    @cached_property
+    def column_levels(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Distinct values of each column (ascending, in the matrix's float type)
+        and how many rows hold each; criteria on a small grid (scores, bands)
+        have only a handful of levels.
+        """
+        if hasattr(self.matrix, "column_levels"):
+            return self.matrix.column_levels()
+        return [np.unique(self.matrix[:, j], return_counts=True) for j in range(self.matrix.shape[1])]
+
+    def precomputed(self) -> Dict[str, object]:
+        """The precomputations made so far (stats, column_levels), without the matrix."""
+        return {name: self.__dict__[name] for name in ("stats", "column_levels") if name in self.__dict__}
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the precomputations made so far (not the matrix)."""
+        total = self.stats.nbytes if "stats" in self.__dict__ else 0
+        if "column_levels" in self.__dict__:
+            total += sum(a.nbytes for level in self.column_levels for a in level)
+        return total
+
+class Block:
+    """One row block plus derived matrices, each built once for every method scoring it."""
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @cached_property
+    def log(self) -> np.ndarray:
+        """Log of the block with zeros replaced by WP_ZERO_REPLACEMENT."""
+        return np.log(np.where(self.values == 0, WP_ZERO_REPLACEMENT, self.values))
+
+# ---------- Method Registry ----------
+
+@dataclass(frozen=True)
+class MethodKernel:
+    """
+    One scoring method (higher score = better).
+
+    prepare(weights, norms, dtype, scheme) returns the per-call coefficients,
+    with cost criteria and the normalization (ScoringScheme) already folded
+    in; score(block, coef) returns one value per block row, or a
+    (rows × width) array of partials that finalize(partials, coef) turns
+    into scores once every block is done. row_local methods score a row
+    from ColumnStats alone (reads() lists the statistics they use), so they
+    also work block by block out of core and under incremental updates.
+    normalization is the method's own normalization (None if it has none
+    to choose, e.g. WP).
+    """
+
+    name: str
+    label: str
+    prepare: Callable[[np.ndarray, Normalizations, np.dtype, "ScoringScheme"], Any]
+    score: Callable[[Block, Any], np.ndarray]
+    finalize: Optional[Callable[[np.ndarray, Any], np.ndarray]] = None
+    width: int = 1
+    row_local: bool = True
+    stats_fields: Tuple[str, ...] = ()
+    normalization: Optional[str] = None
+
+    def reads(self, scheme: "ScoringScheme" = None) -> Tuple[str, ...]:
+        """ColumnStats fields the scores depend on under a scheme."""
+        normalization = (scheme or DEFAULT_SCHEME).normalization_for(self)
+        return self.stats_fields + (NORMALIZATION_FIELDS[normalization] if normalization else ())
+
+METHOD_REGISTRY: Dict[str, MethodKernel] = {}
+
+def register_method(kernel: MethodKernel, replace: bool = False) -> MethodKernel:
+    """Add a method to the registry (name is case-insensitive, stored upper-case)."""
+    name = kernel.name.upper()
+    if name in METHOD_REGISTRY and not replace:
+        raise ValueError(f"Scoring method {name} is already registered")
+    METHOD_REGISTRY[name] = kernel
+    return kernel
+
+def get_method(name: str) -> MethodKernel:
+    try:
+        return METHOD_REGISTRY[name.upper()]
+    except KeyError:
+        raise ValueError(f"Unknown scoring method: {name}") from None
+
+def registered_methods() -> List[str]:
+    """Names of every registered method, in registration order."""
+    return list(METHOD_REGISTRY)
+
+# ---------- Built-in Kernels ----------
+
+def _linear_prepare(w: np.ndarray, norms: Normalizations, dtype, scheme: ScoringScheme, normalization: str):
+    """Σ w·n(x) as block @ coef + shift (the shift is 0 unless a criterion is flipped or offset)."""
+    coef, shift = normalized_coefficients(norms.stats, w, scheme.signs(len(w)), normalization)
+    return coef.astype(dtype), float(shift)
+
+def _linear_score(block: Block, coef) -> np.ndarray:
+    coef, shift = coef
+    scores = block.values @ coef
+    return scores + shift if shift else scores
+
+def _saw_prepare(w: np.ndarray, norms: Normalizations, dtype, scheme: ScoringScheme):
+    return _linear_prepare(w, norms, dtype, scheme, scheme.normalization or "max")
+
+def _wp_prepare(w: np.ndarray, norms: Normalizations, dtype, scheme: ScoringScheme) -> np.ndarray:
+    """Exponents: +w for benefit, −w for cost criteria (WP needs no normalization)."""
+    return (w * scheme.signs(len(w)) if any(scheme.cost) else w).astype(dtype)
+
+def _topsis_prepare(w: np.ndarray, norms: Normalizations, dtype, scheme: ScoringScheme):
+    """
+    Scale factors and ideal points of the weighted, normalized matrix.
+
+    Distances do not change under the normalization's shift, so only the
+    scale is applied per block; the ideal points are the column extremes.
+    """
+    stats = norms.stats
+    scale, _ = normalized_coefficients(stats, w, scheme.signs(len(w)), scheme.normalization or "vector")
+    hi = stats.col_max * scale
+    lo = stats.col_min * scale
+    return tuple(c.astype(dtype) for c in (scale, np.maximum(hi, lo), np.minimum(hi, lo)))
+
+def _topsis_score(block: Block, coef) -> np.ndarray:
+    scale, ideal_pos, ideal_neg = coef
+    weighted = block.values * scale
+    dist_pos = np.sqrt(np.square(weighted - ideal_pos).sum(axis=1))
+    dist_neg = np.sqrt(np.square(weighted - ideal_neg).sum(axis=1))
+    return dist_neg / (dist_pos + dist_neg)
+
+register_method(MethodKernel(
+    "SAW", "SAW (Simple Additive Weighting)", _saw_prepare, _linear_score, normalization="max",
+))
+register_method(MethodKernel(
+    "WP", "WP (Weighted Product)", _wp_prepare, lambda block, coef: np.exp(block.log @ coef),
+))
+register_method(MethodKernel(
+    "TOPSIS", "TOPSIS", _topsis_prepare, _topsis_score, stats_fields=("col_max", "col_min"), normalization="vector",
+))
+
+# ---------- Kernels ----------
+
+def compute_saw(matrix: np.ndarray, weights, stats: Optional[ColumnStats] = None) -> np.ndarray:
+    """Compute SAW scores (max-normalized weighted sum)."""
+    return score_all(matrix, weights, ("SAW",), stats=stats)["SAW"]
+
+def compute_wp(matrix: np.ndarray, weights) -> np.ndarray:
+    """Compute WP scores (weighted product, zeros replaced by 1e-6)."""
+    return score_all(matrix, weights, ("WP",))["WP"]
+
+def compute_topsis(matrix: np.ndarray, weights, stats: Optional[ColumnStats] = None) -> np.ndarray:
+    """Compute TOPSIS scores (relative closeness to the ideal solution)."""
+    return score_all(matrix, weights, ("TOPSIS",), stats=stats)["TOPSIS"]
+
+def score_all(
+    matrix: np.ndarray,
+    weights,
+    methods: Iterable[str] = METHODS,
+    stats: Optional[ColumnStats] = None,
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+    norms: Optional[Normalizations] = None,
+    scheme: Optional[ScoringScheme] = None,
+    threads: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Score all requested methods in one blocked pass.
+
+    scheme gives the cost criteria and normalization (default: all benefit,
+    each method's own normalization). threads caps the threads the row
+    blocks are spread over (default SCORING_THREADS); the scores do not
+    depend on it.
+
+    The normalizations are computed once (or passed in: stats alone, or a
+    dataset's whole Normalizations) and every row block is read once for
+    all methods, so peak extra memory is a few block-sized temporaries
+    instead of one full DataFrame copy per method. Blocks are computed in
+    the matrix's float type (e.g. a float32 CompactMatrix); results are
+    always returned as float64.
+    """
+    matrix = as_scoring_matrix(matrix)
+    n_rows, n_criteria = matrix.shape
+    w = as_weights(weights, n_criteria)
+    methods = [m.upper() for m in methods]  # once: methods may be a generator
+    unknown = [m for m in methods if m not in METHOD_REGISTRY]
+    if unknown:
+        raise ValueError(f"Unknown scoring methods: {', '.join(sorted(unknown))}")
+    kernels = [METHOD_REGISTRY[m] for m in methods]
+    scheme = scheme or DEFAULT_SCHEME
+    scheme.signs(n_criteria)  # checks the criterion types match the criteria
+
+    if norms is None:
+        norms = Normalizations(matrix, stats, threads)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coefs = [k.prepare(w, norms, matrix.dtype, scheme) for k in kernels]
+    partials = [np.empty(n_rows if k.width == 1 else (n_rows, k.width), dtype=np.float64) for k in kernels]
+
+    def score_block(rows: slice) -> None:
+        # errstate is per thread; each block writes its own rows of the outputs
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block = Block(matrix[rows])
+            for kernel, coef, out in zip(kernels, coefs, partials):
+                out[rows] = kernel.score(block, coef)
+
+    map_blocks(score_block, n_rows, block_rows, threads)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            k.name: k.finalize(out, coef) if k.finalize is not None else out
+            for k, coef, out in zip(kernels, coefs, partials)
+        }
@@ -0,0 +1,185 @@
+# engine/methods.py
+"""
+Additional MCDM methods, registered as kernels (engine.kernels.METHOD_REGISTRY).
+
+Flow:
+1. Each method is a MethodKernel: prepare() derives its coefficients from the
+   weights, the dataset's shared Normalizations (ColumnStats with the column
+   means, column levels — computed once per dataset, whichever method asks
+   first) and the ScoringScheme, score() works on one row block, finalize()
+   applies cohort-wide aggregates.
+2. Cost criteria (ScoringScheme.cost) are folded into the coefficients, as
+   for SAW/WP/TOPSIS, and every method returns "higher score = better" so
+   ranking and BORDA treat all methods alike:
+    • VIKOR        → 1 − Q (v = 0.5); S and R per row, Q from their ranges
+                     (the best value of a cost criterion is its minimum)
+    • MOORA        → ratio system: Σ w·n(x), vector-normalized by default
+    • EDAS         → appraisal score from positive/negative distance to the
+                     column means (sign flipped for cost criteria)
+    • CODAS        → assessment score from Euclidean/taxicab distance to the
+                     negative-ideal point, max-normalized by default; the
+                     pairwise sum is evaluated in O(n log n) over the
+                     sorted Euclidean distances
+    • PROMETHEE_II → net outranking flow with the usual preference function;
+                     the pairwise comparison per criterion becomes a lookup
+                     of the row's value among that column's distinct levels
+                     (counted once per dataset), O(n log n); a cost
+                     criterion's flow counts with a negative weight
+3. MOORA only reads ColumnStats per row, so like SAW/WP/TOPSIS it also runs
+   out of core and under incremental updates; the others need the whole
+   cohort and are rescored in full.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from engine.kernels import (
+    Block,
+    MethodKernel,
+    Normalizations,
+    ScoringScheme,
+    normalized_coefficients,
+    register_method,
+    safe_ratio,
+)
+
+# ---------- Constants ----------
+VIKOR_V = 0.5  # weight of group utility (S) against individual regret (R)
+CODAS_TAU = 0.02  # Euclidean distances closer than this count as equal
+
+# ---------- Helper Functions ----------
+
+def _rescale(values: np.ndarray) -> np.ndarray:
+    """(values − min) / (max − min); all zeros when every value is equal."""
+    if len(values) == 0:
+        return values
+    low, high = values.min(), values.max()
+    if not high > low:
+        return np.zeros_like(values)
+    return (values - low) / (high - low)
+
+# ---------- VIKOR ----------
+
+def _vikor_prepare(w: np.ndarray, norms: Normalizations, dtype, scheme: ScoringScheme) -> Tuple[np.ndarray, np.ndarray]:
+    """Best value per criterion and the weight over its best − worst range."""
+    stats = norms.stats
+    cost = np.asarray(scheme.cost, dtype=bool) if any(scheme.cost) else np.zeros(len(w), dtype=bool)
+    best = np.where(cost, stats.col_min, stats.col_max)
+    worst = np.where(cost, stats.col_max, stats.col_min)
+    return best.astype(dtype), safe_ratio(w, best - worst).astype(dtype)
+
+def _vikor_score(block: Block, coef) -> np.ndarray:
+    best, scale = coef
+    regret = (best - block.values) * scale
+    return np.column_stack((regret.sum(axis=1), regret.max(axis=1)))
+
+def _vikor_finalize(partials: np.ndarray, coef) -> np.ndarray:
+    q = VIKOR_V * _rescale(partials[:, 0]) + (1 - VIKOR_V) * _rescale(partials[:, 1])
+    return 1.0 - q
+
+# ---------- MOORA ----------
+
+def _moora_prepare(w: np.ndarray, norms: Normalizations, dtype, scheme: ScoringScheme) -> Tuple[np.ndarray, float]:
+    coef, shift = normalized_coefficients(norms.stats, w, scheme.signs(len(w)), scheme.normalization or "vector")
+    return coef.astype(dtype), float(shift)
+
+def _moora_score(block: Block, coef) -> np.ndarray:
+    coef, shift = coef
+    scores = block.values @ coef
+    return scores + shift if shift else scores
+
+# ---------- EDAS ----------
+
+def _edas_prepare(w: np.ndarray, norms: Normalizations, dtype, scheme: ScoringScheme):
+    mean = norms.col_mean
+    signs = scheme.signs(len(w)).astype(dtype) if any(scheme.cost) else None
+    return mean.astype(dtype), safe_ratio(w, np.abs(mean)).astype(dtype), signs
+
+def _edas_score(block: Block, coef) -> np.ndarray:
+    mean, scale, signs = coef
+    diff = block.values - mean
+    if signs is not None:
+        diff *= signs  # a cost criterion is better below the mean
+    return np.column_stack((np.maximum(diff, 0) @ scale, np.maximum(-diff, 0) @ scale))
+
+def _edas_finalize(partials: np.ndarray, coef) -> np.ndarray:
+    sp, sn = partials[:, 0], partials[:, 1]
+    nsp = safe_ratio(sp, sp.max()) if len(sp) else sp
+    nsn = 1.0 - (safe_ratio(sn, sn.max()) if len(sn) else sn)
+    return (nsp + nsn) / 2
+
+# ---------- CODAS ----------
+
+def _codas_prepare(w: np.ndarray, norms: Normalizations, dtype, scheme: ScoringScheme) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scale factors and the negative-ideal point of the weighted, normalized
+    matrix (distances ignore the normalization's shift).
+    """
+    stats = norms.stats
+    scale, _ = normalized_coefficients(stats, w, scheme.signs(len(w)), scheme.normalization or "max")
+    return scale.astype(dtype), np.minimum(stats.col_min * scale, stats.col_max * scale).astype(dtype)
+
+def _codas_score(block: Block, coef) -> np.ndarray:
+    scale, negative_ideal = coef
+    dist = block.values * scale - negative_ideal
+    return np.column_stack((np.sqrt(np.square(dist).sum(axis=1)), np.abs(dist).sum(axis=1)))
+
+def _codas_finalize(partials: np.ndarray, coef) -> np.ndarray:
+    """
+    H_i = Σ_k (E_i − E_k) + ψ(E_i − E_k)·(T_i − T_k), ψ(x) = 1 if |x| ≥ τ else 0.
+
+    The pairs with |E_i − E_k| < τ form one contiguous run of the sorted
+    distances, so their count and taxicab sum come from two binary searches
+    and a prefix sum instead of an n × n matrix.
+    """
+    euclid, taxicab = partials[:, 0], partials[:, 1]
+    n = len(euclid)
+    order = np.argsort(euclid, kind="stable")
+    sorted_euclid = euclid[order]
+    taxicab_prefix = np.concatenate(([0.0], np.cumsum(taxicab[order])))
+    low = np.searchsorted(sorted_euclid, euclid - CODAS_TAU, side="right")
+    high = np.searchsorted(sorted_euclid, euclid + CODAS_TAU, side="left")
+    near_count = high - low
+    near_taxicab = taxicab_prefix[high] - taxicab_prefix[low]
+    return (n * euclid - euclid.sum()) + (n - near_count) * taxicab - (taxicab_prefix[-1] - near_taxicab)
+
+# ---------- PROMETHEE II ----------
+
+def _promethee_prepare(
+    w: np.ndarray, norms: Normalizations, dtype, scheme: ScoringScheme
+) -> Tuple[np.ndarray, List[Tuple[np.ndarray, np.ndarray]]]:
+    """Per criterion: its levels and each level's net count (rows below it − rows above it)."""
+    n = norms.rows
+    nets = []
+    for values, counts in norms.column_levels:
+        at_or_below = np.cumsum(counts)
+        nets.append((values, (at_or_below - counts) - (n - at_or_below)))
+    return w * scheme.signs(len(w)) / max(n - 1, 1), nets
+
+def _promethee_score(block: Block, coef) -> np.ndarray:
+    """Net flow: per criterion, (rows this one beats − rows that beat it), weighted."""
+    w, nets = coef
+    flows = np.zeros(len(block))
+    for j, (values, net) in enumerate(nets):
+        flows += w[j] * net[np.searchsorted(values, block.values[:, j])]
+    return flows
+
+# ---------- Registration ----------
+
+register_method(MethodKernel(
+    "VIKOR", "VIKOR (compromise ranking)", _vikor_prepare, _vikor_score, _vikor_finalize, width=2, row_local=False,
+))
+register_method(MethodKernel(
+    "MOORA", "MOORA (ratio system)", _moora_prepare, _moora_score, normalization="vector",
+))
+register_method(MethodKernel(
+    "EDAS", "EDAS (distance from average)", _edas_prepare, _edas_score, _edas_finalize, width=2, row_local=False,
+))
+register_method(MethodKernel(
+    "CODAS", "CODAS (distance from negative ideal)", _codas_prepare, _codas_score, _codas_finalize,
+    width=2, row_local=False, normalization="max",
+))
+register_method(MethodKernel(
+    "PROMETHEE_II", "PROMETHEE II (net outranking flow)", _promethee_prepare, _promethee_score, row_local=False,
+))
@@ -0,0 +1,178 @@
+# engine/metrics.py
+"""
+Lightweight per-stage instrumentation: wall time, RSS and row counts.
+
+Flow:
+1. One StageRecorder per script run (or batch job) collects stage records.
+2. `with recorder.stage("scoring.score", rows=n):` times a block. Entering
+   the same stage again (e.g. once per CSV chunk) adds to the same record,
+   so chunked work shows up as one line with a call count.
+3. Each record keeps the wall time, the change in resident memory (current
+   RSS) and the change in peak RSS over the stage. Both are read from the OS
+   (/proc/self/statm and getrusage), which costs microseconds, so the
+   recorder can stay on in production. RSS is per process: on a server with
+   several sessions, concurrent work shows up in every session's numbers.
+4. flush() emits every record as one JSON log line on the "dss.metrics"
+   logger and, if DSS_METRICS_FILE is set, appends it to that JSON-lines file
+   for monitoring. Stages that finish after the flush (background writes)
+   are emitted, one line per call, as soon as they end.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ---------- Constants ----------
+LOGGER = logging.getLogger("dss.metrics")
+METRICS_FILE = os.environ.get("DSS_METRICS_FILE")
+MB = 1024 * 1024
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_file_lock = threading.Lock()
+
+# ---------- Memory Probes ----------
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (None where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of this process in bytes (None without the resource module)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+def _delta_mb(before: Optional[int], after: Optional[int]) -> Optional[float]:
+    if before is None or after is None:
+        return None
+    return (after - before) / MB
+
+# ---------- Records ----------
+
+@dataclass
+class StageRecord:
+    """Accumulated measurements of one named stage."""
+
+    stage: str
+    seconds: float = 0.0
+    rss_delta_mb: Optional[float] = None
+    peak_rss_delta_mb: Optional[float] = None
+    rows: Optional[int] = None
+    calls: int = 0
+
+    def add(self, seconds: float, rss_delta: Optional[float], peak_delta: Optional[float], rows: Optional[int]) -> None:
+        self.seconds += seconds
+        self.calls += 1
+        if rss_delta is not None:
+            self.rss_delta_mb = (self.rss_delta_mb or 0.0) + rss_delta
+        if peak_delta is not None:
+            self.peak_rss_delta_mb = (self.peak_rss_delta_mb or 0.0) + peak_delta
+        if rows is not None:
+            self.rows = (self.rows or 0) + rows
+
+class StageRecorder:
+    """Collects stage records for one run; safe to use from background threads."""
+
+    def __init__(self, context: Optional[Dict[str, object]] = None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.context = dict(context or {})
+        self.started = time.time()
+        self._records: Dict[str, StageRecord] = {}
+        self._lock = threading.Lock()
+        self._flushed = False
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None) -> Iterator[StageRecord]:
+        """
+        Time the enclosed block as stage `name`.
+
+        Yields a scratch record whose `rows` may be set inside the block when
+        the row count is only known afterwards.
+        """
+        scratch = StageRecord(stage=name, rows=rows)
+        rss_before, peak_before = current_rss(), peak_rss()
+        start = time.perf_counter()
+        try:
+            yield scratch
+        finally:
+            seconds = time.perf_counter() - start
+            rss_delta = _delta_mb(rss_before, current_rss())
+            peak_delta = _delta_mb(peak_before, peak_rss())
+            with self._lock:
+                self._records.setdefault(name, StageRecord(stage=name)).add(seconds, rss_delta, peak_delta, scratch.rows)
+                late = self._flushed
+            if late:
+                call = StageRecord(stage=name)
+                call.add(seconds, rss_delta, peak_delta, scratch.rows)
+                self._emit([call])
+
+    def wrap(self, name: str, fn: Callable, rows: Optional[int] = None) -> Callable:
+        """fn wrapped so every call is timed as stage `name` (e.g. for persist_async)."""
+        def timed(*args, **kwargs):
+            with self.stage(name, rows):
+                return fn(*args, **kwargs)
+        return timed
+
+    @property
+    def records(self) -> List[StageRecord]:
+        with self._lock:
+            return [StageRecord(**asdict(r)) for r in self._records.values()]
+
+    def to_rows(self) -> List[Dict[str, object]]:
+        return [asdict(r) for r in self.records]
+
+    def _emit(self, records: List[StageRecord]) -> None:
+        lines = [
+            json.dumps({"run_id": self.run_id, **self.context, **asdict(r)}, default=str)
+            for r in records
+        ]
+        for line in lines:
+            LOGGER.info(line)
+        if METRICS_FILE and lines:
+            with _file_lock, open(Path(METRICS_FILE), "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    def flush(self) -> None:
+        """Emit every record (log lines + metrics file); later stages are emitted as they end."""
+        with self._lock:
+            records = list(self._records.values())
+            self._flushed = True
+        self._emit(records)
+
+# ---------- Helpers ----------
+
+def maybe_stage(recorder: Optional[StageRecorder], name: str, rows: Optional[int] = None):
+    """recorder.stage(...) when a recorder is given, otherwise a no-op context."""
+    if recorder is None:
+        return nullcontext(StageRecord(stage=name, rows=rows))
+    return recorder.stage(name, rows)
+
+def timed_chunks(recorder: Optional[StageRecorder], name: str, chunks: Iterable) -> Iterator:
+    """Yield from chunks, timing each fetch (e.g. CSV parsing) as stage `name`."""
+    it = iter(chunks)
+    while True:
+        with maybe_stage(recorder, name) as record:
+            chunk = next(it, None)
+            if chunk is not None:
+                record.rows = len(chunk)
+        if chunk is None:
+            return
+        yield chunk
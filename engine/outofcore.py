@@ -0,0 +1,264 @@
+# engine/outofcore.py
+"""
+Out-of-core scoring and ranking for datasets larger than RAM.
+
+Flow:
+1. Pass one streams the memory-mapped criteria matrix (a table's
+   CompactMatrix, or any array) block by block and gathers the column normalizers.
+2. Pass two streams the blocks again and writes every method's scores to a
+   memory-mapped .npy file; only one block of rows is in memory at a time.
+3. Ranking is an external merge sort:
+    • runs of run_rows scores are sorted in memory and spilled to disk,
+    • the runs are merged block-wise (vectorized, no per-row Python), and
+    • the merged order streams to an order file while min ranks (ties share
+      the smallest rank, as pandas method="min") go to a ranks file.
+   NaN scores are ranked last with a NaN rank.
+4. BORDA sums the per-method rank files block by block and is ranked with
+   the same external sort.
+
+Peak memory is about block_rows × criteria plus run_rows × 16 bytes, no
+matter how many applicants there are.
+"""
+
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from engine.kernels import (
+    DEFAULT_BLOCK_ROWS,
+    METHODS,
+    ColumnStats,
+    ScoringScheme,
+    as_weights,
+    get_method,
+    row_blocks,
+    score_all,
+)
+from engine.ranking import BORDA
+
+# ---------- Constants ----------
+DEFAULT_RUN_ROWS = 4_000_000     # scores sorted in memory per run (~64 MB with row indices)
+DEFAULT_MERGE_ROWS = 262_144     # rows read from each run per merge step
+
+# ---------- Helper Functions ----------
+
+def _open_output(path: Path, n_rows: int, dtype) -> np.memmap:
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n_rows,))
+
+def _open_input(path: Path) -> np.ndarray:
+    return np.load(path, mmap_mode="r")
+
+def column_stats_blocked(matrix, block_rows: int = DEFAULT_BLOCK_ROWS) -> ColumnStats:
+    """Pass one: every ColumnStats field, reading one row block at a time."""
+    return ColumnStats.from_matrix(matrix, block_rows)
+
+def table_matrix(table, criteria: Optional[Sequence[str]] = None):
+    """A columnar table's criteria as a memory-mapped matrix, without materializing it."""
+    criteria = table.matrix_columns if criteria is None else list(criteria)
+    if criteria == table.matrix_columns:
+        return table.matrix
+    if table.is_compact and set(criteria) <= set(table.matrix_columns):
+        return table.compact_matrix(columns=criteria)
+    raise ValueError("Out-of-core scoring needs the weighted criteria to be stored matrix columns")
+
+# ---------- External Sort ----------
+
+def _sorted_runs(scores: np.ndarray, tmp_dir: Path, run_rows: int) -> Tuple[List[Tuple[np.ndarray, np.ndarray]], np.ndarray]:
+    """
+    Sort runs of the scores (descending, ties in row order) and spill them to disk.
+
+    Returns the (keys, rows) memory maps of every run and the NaN row indices.
+    """
+    runs = []
+    nan_rows = []
+    for i, rows in enumerate(row_blocks(len(scores), run_rows)):
+        keys = -np.asarray(scores[rows], dtype=np.float64)
+        index = np.arange(rows.start, rows.stop, dtype=np.int64)
+        nan = np.isnan(keys)
+        if nan.any():
+            nan_rows.append(index[nan])
+            keys, index = keys[~nan], index[~nan]
+        order = np.argsort(keys, kind="stable")
+        key_path, row_path = tmp_dir / f"run{i}.keys.npy", tmp_dir / f"run{i}.rows.npy"
+        np.save(key_path, keys[order])
+        np.save(row_path, index[order])
+        runs.append((_open_input(key_path), _open_input(row_path)))
+    nan_index = np.concatenate(nan_rows) if nan_rows else np.empty(0, dtype=np.int64)
+    return runs, nan_index
+
+def _merge_runs(runs: List[Tuple[np.ndarray, np.ndarray]], merge_rows: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Vectorized k-way merge: yields (keys, rows) blocks in ascending (key, row) order.
+
+    Each step reads up to merge_rows from every run and emits everything up to
+    the smallest (key, row) among the runs' last read entries: nothing still
+    unread can sort before it. Comparing rows too keeps ties in row order even
+    when a tie spans several steps.
+    """
+    positions = [0] * len(runs)
+    while True:
+        blocks = []
+        for r, (keys, rows) in enumerate(runs):
+            start = positions[r]
+            stop = min(start + merge_rows, len(keys))
+            if start < stop:
+                blocks.append((r, np.asarray(keys[start:stop]), np.asarray(rows[start:stop]), stop == len(keys)))
+        if not blocks:
+            return
+        open_ends = [(k[-1], i[-1]) for _, k, i, exhausted in blocks if not exhausted]
+        bound_key, bound_row = min(open_ends) if open_ends else (np.inf, np.iinfo(np.int64).max)
+        take_keys, take_rows = [], []
+        for r, k, i, _ in blocks:
+            # Entries with key < bound_key, then equal keys (rows ascending) up to bound_row
+            lo = int(np.searchsorted(k, bound_key, side="left"))
+            hi = int(np.searchsorted(k, bound_key, side="right"))
+            n_take = lo + int(np.searchsorted(i[lo:hi], bound_row, side="right"))
+            if n_take:
+                take_keys.append(k[:n_take])
+                take_rows.append(i[:n_take])
+                positions[r] += n_take
+        keys = np.concatenate(take_keys)
+        rows = np.concatenate(take_rows)
+        order = np.lexsort((rows, keys))
+        yield keys[order], rows[order]
+
+def external_rank(
+    scores: np.ndarray,
+    out_dir: Path,
+    name: str,
+    run_rows: int = DEFAULT_RUN_ROWS,
+    merge_rows: int = DEFAULT_MERGE_ROWS,
+) -> Tuple[Path, Path]:
+    """
+    Rank a (memory-mapped) score vector without holding it in memory.
+
+    Writes {name}.order.npy (row indices, best first) and {name}.ranks.npy
+    (min rank per row, aligned with the input) and returns their paths.
+    """
+    out_dir = Path(out_dir)
+    n_rows = len(scores)
+    order_path, ranks_path = out_dir / f"{name}.order.npy", out_dir / f"{name}.ranks.npy"
+    order_out = _open_output(order_path, n_rows, np.int64)
+    ranks_out = _open_output(ranks_path, n_rows, np.float64)
+
+    tmp_dir = out_dir / f"{name}.runs"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        runs, nan_rows = _sorted_runs(scores, tmp_dir, run_rows)
+        written = 0
+        last_key, last_rank = np.nan, 0.0
+        for keys, rows in _merge_runs(runs, merge_rows):
+            n = len(keys)
+            order_out[written:written + n] = rows
+            # Min ranks: a new key starts at its position; ties carry the first rank,
+            # including across merge steps
+            positions = np.arange(written + 1, written + n + 1, dtype=np.float64)
+            if keys[0] == last_key:
+                positions[0] = last_rank
+            new_value = np.ones(n, dtype=bool)
+            new_value[1:] = keys[1:] != keys[:-1]
+            block_ranks = np.maximum.accumulate(np.where(new_value, positions, 0.0))
+            ranks_out[rows] = block_ranks
+            last_key, last_rank = keys[-1], block_ranks[-1]
+            written += n
+        order_out[written:] = nan_rows
+        ranks_out[nan_rows] = np.nan
+        del runs
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    order_out.flush()
+    ranks_out.flush()
+    return order_path, ranks_path
+
+# ---------- Scoring ----------
+
+@dataclass
+class OutOfCoreResult:
+    """Memory-mapped score, order and rank files of one out-of-core run."""
+
+    out_dir: Path
+    rows: int
+    methods: List[str]
+    files: Dict[str, Dict[str, Path]] = field(default_factory=dict)
+
+    def scores(self, method: str) -> np.ndarray:
+        return _open_input(self.files[method]["scores"])
+
+    def order(self, method: str) -> np.ndarray:
+        """Row indices best first (NaN scores last)."""
+        return _open_input(self.files[method]["order"])
+
+    def ranks(self, method: str) -> np.ndarray:
+        return _open_input(self.files[method]["ranks"])
+
+    def top(self, method: str, k: int) -> np.ndarray:
+        """Row indices of the k best applicants (no ties beyond k)."""
+        return np.asarray(self.order(method)[:k])
+
+def score_out_of_core(
+    matrix,
+    weights,
+    out_dir: Path,
+    methods: Sequence[str] = METHODS,
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+    run_rows: int = DEFAULT_RUN_ROWS,
+    merge_rows: int = DEFAULT_MERGE_ROWS,
+    with_ranks: bool = True,
+    with_borda: bool = False,
+    scheme: Optional[ScoringScheme] = None,
+) -> OutOfCoreResult:
+    """
+    Two-pass scoring of a memory-mapped matrix into memory-mapped outputs.
+
+    Scores match score_all on the same matrix (to rounding); with_ranks adds the
+    external-sort order and ranks per method, with_borda a BORDA score
+    (Σ n − rank over the methods) ranked the same way; scheme sets the cost
+    criteria and normalization as for score_all. Only row-local
+    methods (scored from ColumnStats alone) can be streamed like this.
+    """
+    methods = [m.upper() for m in methods]
+    whole_cohort = [m for m in methods if not get_method(m).row_local]
+    if whole_cohort:
+        raise ValueError(f"Out-of-core scoring supports row-local methods only, not {', '.join(whole_cohort)}")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n_rows, n_criteria = matrix.shape
+    w = as_weights(weights, n_criteria)
+    result = OutOfCoreResult(out_dir=out_dir, rows=n_rows, methods=list(methods))
+
+    # Pass one: normalizers
+    stats = column_stats_blocked(matrix, block_rows)
+
+    # Pass two: scores streamed to disk
+    outputs = {}
+    for m in methods:
+        path = out_dir / f"{m.lower()}.scores.npy"
+        outputs[m] = _open_output(path, n_rows, np.float64)
+        result.files[m] = {"scores": path}
+    for rows in row_blocks(n_rows, block_rows):
+        for m, values in score_all(matrix[rows], w, methods, stats=stats, block_rows=block_rows, scheme=scheme).items():
+            outputs[m][rows] = values
+    for out in outputs.values():
+        out.flush()
+    del outputs
+
+    if with_ranks or with_borda:
+        for m in methods:
+            order, ranks = external_rank(result.scores(m), out_dir, m.lower(), run_rows, merge_rows)
+            result.files[m].update(order=order, ranks=ranks)
+
+    if with_borda:
+        path = out_dir / "borda.scores.npy"
+        borda = _open_output(path, n_rows, np.float64)
+        rank_maps = [result.ranks(m) for m in methods]
+        for rows in row_blocks(n_rows, block_rows):
+            borda[rows] = sum(n_rows - np.asarray(r[rows]) for r in rank_maps)
+        borda.flush()
+        del borda
+        order, ranks = external_rank(_open_input(path), out_dir, "borda", run_rows, merge_rows)
+        result.files[BORDA] = {"scores": path, "order": order, "ranks": ranks}
+        result.methods.append(BORDA)
+    return result
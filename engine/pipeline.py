@@ -0,0 +1,271 @@
+# engine/pipeline.py
+"""
+In-memory scoring pipeline: dataset → per-method scores → ranks → BORDA.
+
+Flow:
+1. ScoringPipeline holds one dataset: applicant IDs plus the criteria matrix
+   (usually memory-mapped from a columnar table).
+2. score() returns a ScoringRun whose score arrays all share the dataset's
+   row order, so methods line up by position; no merge on ID is needed.
+   Any registered method can be scored (engine.kernels.METHOD_REGISTRY),
+   with cost criteria and a normalization chosen by a ScoringScheme.
+   Scores are memoized per method in the shared RESULT_CACHE, and so are
+   the dataset's normalizations, which every method and weight vector reuse.
+3. ScoringRun ranks each method with the vectorized rank_desc and computes
+   BORDA straight from those arrays (or another rank aggregation, optionally
+   with method weights: engine.aggregation); shortlists use partial selection
+   (top_k) so only the top of the ranking is ever sorted. view() gives the
+   same ranking as a ResultView for paged display (engine.views).
+4. Writing results to disk is optional and runs in a background thread
+   (persist_async), so the UI does not wait for it.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from engine.aggregation import SCORE_COLUMNS, aggregate_ranks, as_method_weights
+from engine.cache import RESULT_CACHE, LRUCache, cache_key, fingerprint_array, fingerprint_table
+from engine.kernels import METHODS, Normalizations, ScoringScheme, as_scoring_matrix, score_all
+from engine.ranking import BORDA, borda_scores, rank_desc, top_k
+from engine.schema import ID_COLUMN
+from engine.views import ResultView
+
+# ---------- Background Persistence ----------
+
+# One writer thread: writes happen in submission order and never in parallel
+PERSIST_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dss-persist")
+
+def persist_async(write: Callable, *args, **kwargs) -> Future:
+    """Run a write (e.g. storage.write_table) in the background writer thread."""
+    return PERSIST_EXECUTOR.submit(write, *args, **kwargs)
+
+# ---------- Scoring Run ----------
+
+@dataclass
+class ScoringRun:
+    """Scores of one dataset, all arrays aligned with ids by position."""
+
+    ids: np.ndarray
+    scores: Dict[str, np.ndarray]
+    keys: Dict[str, str] = field(default_factory=dict)
+    _ranks: Dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+
+    @property
+    def methods(self) -> List[str]:
+        return list(self.scores)
+
+    @property
+    def key(self) -> str:
+        """Key of the whole run (its methods and their result keys), saved with each result table."""
+        return cache_key("run", [[m, self.keys.get(m)] for m in self.methods])
+
+    def rank(self, method: str) -> np.ndarray:
+        """Rank of every applicant for one method (1 is best, ties share the minimum rank)."""
+        if method not in self._ranks:
+            self._ranks[method] = rank_desc(self.scores[method])
+        return self._ranks[method]
+
+    def rank_matrix(self, methods: Optional[Sequence[str]] = None) -> np.ndarray:
+        """(applicants × methods) rank matrix."""
+        methods = self.methods if methods is None else list(methods)
+        return np.column_stack([self.rank(m) for m in methods])
+
+    def borda(self, methods: Optional[Sequence[str]] = None) -> np.ndarray:
+        """BORDA score per applicant: Σ (n − rank) over the methods, higher is better."""
+        return borda_scores(self.rank_matrix(methods))
+
+    def borda_key(self, methods: Optional[Sequence[str]] = None) -> str:
+        """Cache key of the BORDA result, derived from the per-method result keys."""
+        methods = self.methods if methods is None else list(methods)
+        return cache_key("borda", [self.keys.get(m) for m in methods])
+
+    def aggregate(self, methods: Optional[Sequence[str]] = None, aggregation: str = BORDA, weights=None) -> np.ndarray:
+        """
+        Aggregate score per applicant, higher is better: BORDA, COPELAND or
+        KEMENY over the methods' ranks, weighted per method when weights
+        (aligned with methods) are given.
+        """
+        if aggregation.upper() == BORDA and weights is None:
+            return self.borda(methods)
+        return aggregate_ranks(self.rank_matrix(methods), aggregation, weights)
+
+    def aggregate_key(self, methods: Optional[Sequence[str]] = None, aggregation: str = BORDA, weights=None) -> str:
+        """Cache key of an aggregate result (the BORDA key for unweighted BORDA)."""
+        methods = self.methods if methods is None else list(methods)
+        if aggregation.upper() == BORDA and weights is None:
+            return self.borda_key(methods)
+        weights = None if weights is None else as_method_weights(weights, len(methods)).tolist()
+        return cache_key(aggregation.lower(), [self.keys.get(m) for m in methods], weights)
+
+    def borda_frame(self, methods: Optional[Sequence[str]] = None, k: Optional[int] = None) -> pd.DataFrame:
+        """
+        ID, per-method ranks and BORDA score, best first (same layout as borda_result).
+
+        With k, only the top-k BORDA scores (plus boundary ties) are returned.
+        """
+        return self.aggregate_frame(methods, k)
+
+    def aggregate_frame(
+        self,
+        methods: Optional[Sequence[str]] = None,
+        k: Optional[int] = None,
+        aggregation: str = BORDA,
+        weights=None,
+        scores: Optional[np.ndarray] = None,
+    ) -> pd.DataFrame:
+        """
+        borda_frame for any aggregation; the score column is named after it
+        (e.g. Copeland_Score). scores are the aggregate scores when the
+        caller already has them (no recomputation).
+        """
+        methods = self.methods if methods is None else list(methods)
+        if scores is None:
+            scores = self.aggregate(methods, aggregation, weights)
+        order = top_k(scores, k)[0] if k else np.argsort(-scores, kind="stable")
+        data = {ID_COLUMN: self.ids[order]}
+        for m in methods:
+            data[f"Rank_{m}"] = self.rank(m)[order]
+        data[SCORE_COLUMNS[aggregation.upper()]] = scores[order]
+        return pd.DataFrame(data)
+
+    def view(self, method: str, k: Optional[int] = None) -> ResultView:
+        """One method's ranking for paged display: the top-k shortlist (with boundary ties) or everyone."""
+        if k:
+            return ResultView(*top_k(self.scores[method], k))
+        order = self.order(method)
+        return ResultView(order, self.rank(method)[order])
+
+    def borda_view(self, methods: Optional[Sequence[str]] = None, k: Optional[int] = None) -> ResultView:
+        """BORDA ranking as a ResultView (same order as borda_frame)."""
+        return self.aggregate_view(methods, k)
+
+    def aggregate_view(
+        self, methods: Optional[Sequence[str]] = None, k: Optional[int] = None, aggregation: str = BORDA, weights=None
+    ) -> ResultView:
+        """Aggregate ranking as a ResultView (same order as aggregate_frame)."""
+        return ResultView.from_scores(self.aggregate(methods, aggregation, weights), k)
+
+    def order(self, method: str) -> np.ndarray:
+        """Row indices of the full ranking for one method, best first."""
+        return np.argsort(-self.scores[method], kind="stable")
+
+    def method_frame(self, method: str) -> pd.DataFrame:
+        """ID and score of one method, best first (full ranking)."""
+        order = self.order(method)
+        return pd.DataFrame({ID_COLUMN: self.ids[order], f"{method}_Score": self.scores[method][order]})
+
+    def shortlist(self, method: str, k: int) -> pd.DataFrame:
+        """
+        Rank, ID and score of the top-k applicants for one method.
+
+        Uses partial selection (ranking.top_k), so only the shortlist is sorted;
+        ranks match the full ranking, and boundary ties are all included.
+        """
+        order, ranks = top_k(self.scores[method], k)
+        return pd.DataFrame({
+            f"Rank_{method}": ranks,
+            ID_COLUMN: self.ids[order],
+            f"{method}_Score": self.scores[method][order],
+        })
+
+    def result_frame(self, method: str) -> pd.DataFrame:
+        """ID and score of one method in dataset order (what gets persisted)."""
+        return pd.DataFrame({ID_COLUMN: self.ids, f"{method}_Score": self.scores[method]})
+
+    @classmethod
+    def from_tables(cls, tables: Dict[str, object]) -> "ScoringRun":
+        """
+        Rebuild a run from saved per-method result tables.
+
+        Rows are aligned to the first table's IDs with one hash lookup per
+        table (Index.get_indexer) instead of chained merges.
+        """
+        ids: Optional[pd.Index] = None
+        scores: Dict[str, np.ndarray] = {}
+        keys: Dict[str, str] = {}
+        for method, table in tables.items():
+            table_ids = pd.Index(table.column(ID_COLUMN))
+            values = np.asarray(table.column(f"{method}_Score"), dtype=np.float64)
+            if ids is None:
+                ids = table_ids
+                scores[method] = values
+            else:
+                position = table_ids.get_indexer(ids)
+                if (position < 0).any():
+                    raise ValueError(f"{method} result does not cover the same applicants")
+                scores[method] = values[position]
+            keys[method] = table.extra.get("result_key") or fingerprint_table(table)
+        return cls(ids=np.asarray(ids, dtype=object), scores=scores, keys=keys)
+
+# ---------- Pipeline ----------
+
+class ScoringPipeline:
+    """Scores one dataset for any weights and methods, keeping results in memory."""
+
+    def __init__(
+        self,
+        ids,
+        matrix: np.ndarray,
+        criteria: Sequence[str],
+        dataset_key: Optional[str] = None,
+        cache: Optional[LRUCache] = RESULT_CACHE,
+    ):
+        self.ids = np.asarray(ids, dtype=object)
+        self.matrix = matrix if isinstance(matrix, np.memmap) else as_scoring_matrix(matrix)
+        self.criteria = list(criteria)
+        self.dataset_key = dataset_key or fingerprint_array(self.matrix)
+        self.cache = cache
+        self._norms: Optional[Normalizations] = None
+
+    @classmethod
+    def from_table(cls, table, criteria: Optional[Sequence[str]] = None, **kwargs) -> "ScoringPipeline":
+        """Pipeline over a columnar table; the matrix stays memory-mapped when criteria match."""
+        criteria = table.matrix_columns if criteria is None else list(criteria)
+        if criteria == table.matrix_columns:
+            matrix = table.matrix
+        else:
+            matrix = np.column_stack([table.column(c) for c in criteria])
+        return cls(table.column(ID_COLUMN), matrix, criteria, dataset_key=fingerprint_table(table), **kwargs)
+
+    def normalizations(self) -> Normalizations:
+        """
+        Column-level precomputations of this dataset, shared by every method
+        and weight vector (and, through the cache, by every pipeline over the
+        same dataset and criteria). The cache holds only the precomputed
+        arrays, never the matrix, so its byte budget sees everything it pins.
+        """
+        if self._norms is None:
+            key = cache_key("normalizations", self.dataset_key, self.criteria)
+            precomputed = self.cache.get(key) if self.cache is not None else None
+            self._norms = Normalizations(self.matrix, **(precomputed or {}))
+        return self._norms
+
+    def result_key(self, weights, method: str, scheme: Optional[ScoringScheme] = None) -> str:
+        scheme_key = scheme.key() if scheme is not None else []
+        return cache_key("score", self.dataset_key, self.criteria, list(weights), method, *scheme_key)
+
+    def score(self, weights, methods: Iterable[str] = METHODS, scheme: Optional[ScoringScheme] = None) -> ScoringRun:
+        """
+        Score the requested methods; cached methods are reused, the rest run in one pass.
+
+        Every scheme shares the dataset's normalizations (one ColumnStats pass).
+        """
+        weights = [float(w) for w in weights]
+        methods = [m.upper() for m in methods]
+        keys = {m: self.result_key(weights, m, scheme) for m in methods}
+        scores = {m: self.cache.get(k) if self.cache is not None else None for m, k in keys.items()}
+        missing = [m for m, v in scores.items() if v is None]
+        if missing:
+            norms = self.normalizations()
+            for m, values in score_all(self.matrix, weights, missing, norms=norms, scheme=scheme).items():
+                if self.cache is not None:
+                    self.cache.put(keys[m], values)
+                scores[m] = values
+            if self.cache is not None:
+                # (re)stored after scoring so the cache accounts for what was just computed
+                self.cache.put(cache_key("normalizations", self.dataset_key, self.criteria), norms.precomputed())
+        return ScoringRun(ids=self.ids, scores={m: scores[m] for m in methods}, keys=keys)
@@ -0,0 +1,111 @@
+# engine/preprocess.py
+"""
+Preprocessing of raw applicant data: criteria → band scores.
+
+Any criterion can declare a BandSpec (ascending thresholds + one score per
+band). Banding is vectorized: values are parsed in bulk and bucketed with a
+binary search (np.searchsorted) instead of one Python call per applicant.
+By default only C3_ParentIncomeIDR is banded into its 1-to-5 score.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from engine.schema import INCOME_COLUMN
+
+# ---------- Constants ----------
+# Currency cleanup: a trailing 1–2 digit group after "." or "," is the decimal
+# part; every other separator, symbol or letter is dropped
+# ("Rp 8.000.000", "8,000,000", "Rp 4.000.000,00" → 8000000 / 4000000.00).
+_DECIMAL_PART = r"[.,](\d{1,2})\D*$"
+_NON_NUMERIC = r"[^\d_\-]"
+
+# ---------- Band Specifications ----------
+
+@dataclass(frozen=True)
+class BandSpec:
+    """
+    Band definition for one criterion.
+
+    A value v gets scores[i] where i is the number of thresholds ≤ v, i.e.
+    thresholds split the number line into len(thresholds) + 1 bands.
+    """
+
+    column: str
+    thresholds: Sequence[float]
+    scores: Sequence[int]
+
+    def __post_init__(self):
+        if len(self.scores) != len(self.thresholds) + 1:
+            raise ValueError(f"{self.column}: need {len(self.thresholds) + 1} scores, got {len(self.scores)}")
+        if np.any(np.diff(np.asarray(self.thresholds, dtype=np.float64)) <= 0):
+            raise ValueError(f"{self.column}: thresholds must be strictly increasing")
+
+    def band(self, values: np.ndarray) -> np.ndarray:
+        """Band an array of numeric values (binary search over the thresholds)."""
+        idx = np.searchsorted(np.asarray(self.thresholds, dtype=np.float64), values, side="right")
+        return np.asarray(self.scores)[idx]
+
+INCOME_BANDS = BandSpec(
+    column=INCOME_COLUMN,
+    thresholds=(4_000_000, 6_000_000, 10_000_000, 20_000_000),
+    scores=(4, 5, 3, 2, 1),
+)
+
+DEFAULT_BANDS = (INCOME_BANDS,)
+
+# ---------- Helper Functions ----------
+
+def map_income_to_score(idr: float) -> int:
+    """
+    Map Indonesian Rupiah income value to a score band:
+    - <4M   : 4
+    - 4-6M  : 5
+    - 6-10M : 3
+    - 10-20M: 2
+    - >=20M : 1
+    """
+    return int(INCOME_BANDS.band(np.array([idr], dtype=np.float64))[0])
+
+def _clean_numeric_strings(values: pd.Series) -> np.ndarray:
+    """Strip currency symbols and thousands separators, then parse to float (NaN if unparseable)."""
+    cleaned = (
+        values.astype(str)
+        .str.replace(_DECIMAL_PART, r"_\1", regex=True)
+        .str.replace(_NON_NUMERIC, "", regex=True)
+        .str.replace("_", ".", regex=False)
+    )
+    return pd.to_numeric(cleaned, errors="coerce").to_numpy(dtype=np.float64)
+
+def coerce_numeric(series: pd.Series) -> np.ndarray:
+    """
+    Parse a column of numbers or currency strings into float64, NaN where empty or unparseable.
+
+    Numeric columns pass straight through. Text columns are factorized first so
+    the string cleanup runs once per distinct value.
+    """
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    codes, uniques = pd.factorize(series)  # missing values get code -1
+    parsed = _clean_numeric_strings(pd.Series(uniques))
+    return np.append(parsed, np.nan)[codes]
+
+def parse_numeric(series: pd.Series) -> np.ndarray:
+    """Like coerce_numeric, but raises ValueError on missing or unparseable values."""
+    values = coerce_numeric(series)
+    if np.isnan(values).any():
+        raise ValueError(f"{series.name} contains empty or non-numeric values")
+    return values
+
+def apply_bands(df: pd.DataFrame, bands: Iterable[BandSpec] = DEFAULT_BANDS) -> pd.DataFrame:
+    """Replace every banded column with its band score (raises ValueError on bad values)."""
+    for spec in bands:
+        df[spec.column] = spec.band(parse_numeric(df[spec.column]))
+    return df
+
+def band_income(df: pd.DataFrame) -> pd.DataFrame:
+    """Replace C3_ParentIncomeIDR with its income score band (raises ValueError on bad values)."""
+    return apply_bands(df, (INCOME_BANDS,))
@@ -0,0 +1,93 @@
+# engine/ranking.py
+"""
+Vectorized ranking helpers (per-method ranks, top-K shortlists and Borda
+aggregation).
+
+rank_desc matches pandas ``Series.rank(ascending=False, method="min")``:
+the highest score gets rank 1, ties share the smallest rank and NaN scores
+keep a NaN rank. It works on 1-D score vectors and column-wise on 2-D
+(applicants × profiles) score matrices.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+# ---------- Constants ----------
+BORDA = "BORDA"  # method name under which BORDA results are stored
+
+# ---------- Ranking ----------
+
+def rank_desc(scores: np.ndarray) -> np.ndarray:
+    """Rank scores in descending order with min tie handling (rank 1 is best)."""
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.ndim == 1:
+        return _rank_desc_2d(scores[:, None])[:, 0]
+    if scores.ndim != 2:
+        raise ValueError(f"Expected a 1-D or 2-D score array, got {scores.ndim}-D")
+    return _rank_desc_2d(scores)
+
+def _rank_desc_2d(scores: np.ndarray) -> np.ndarray:
+    n_rows, n_cols = scores.shape
+    if n_rows == 0:
+        return np.empty((n_rows, n_cols), dtype=np.float64)
+
+    # Work on one contiguous row per score column; sorting along strided
+    # columns is several times slower. Tie order does not matter for min ranks,
+    # and argsort puts NaN last, which is where pandas leaves unranked rows too.
+    negated = np.ascontiguousarray(-scores.T)
+    order = np.argsort(negated, axis=1)
+    ordered = np.take_along_axis(negated, order, axis=1)
+
+    positions = np.arange(n_rows, dtype=np.float64)
+    new_value = np.ones((n_cols, n_rows), dtype=bool)
+    new_value[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    first_of_group = np.where(new_value, positions, 0.0)
+    min_rank = np.maximum.accumulate(first_of_group, axis=1) + 1.0
+    min_rank[np.isnan(ordered)] = np.nan
+
+    ranks = np.empty((n_cols, n_rows), dtype=np.float64)
+    np.put_along_axis(ranks, order, min_rank, axis=1)
+    return ranks.T
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Shortlist of the best k applicants without sorting everyone.
+
+    np.partition finds the k-th best score in O(n); only applicants at or above
+    it are sorted. Ties on the boundary are all kept, so the shortlist can be
+    longer than k, and every rank equals rank(ascending=False, method="min")
+    over the full data. NaN scores are never shortlisted. Returns the row
+    indices (best first, ties in row order) and their ranks.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    valid = ~np.isnan(scores)
+    n_valid = int(valid.sum())
+    if k <= 0 or n_valid == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    if k >= n_valid:
+        candidates = np.flatnonzero(valid)
+    else:
+        negated = -scores  # NaN stays NaN and partitions to the end
+        kth = np.partition(negated, k - 1)[k - 1]
+        candidates = np.flatnonzero(negated <= kth)
+
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    ordered = scores[order]
+    positions = np.arange(len(order), dtype=np.float64)
+    new_value = np.ones(len(order), dtype=bool)
+    new_value[1:] = ordered[1:] != ordered[:-1]
+    ranks = np.maximum.accumulate(np.where(new_value, positions, 0.0)) + 1.0
+    return order, ranks
+
+def borda_scores(ranks: np.ndarray) -> np.ndarray:
+    """
+    Borda score from an (applicants × methods) rank matrix.
+
+    Same formula as the ranking tab: Σ (n − rank) over methods, higher is better.
+    """
+    ranks = np.asarray(ranks, dtype=np.float64)
+    if ranks.ndim == 1:
+        ranks = ranks[:, None]
+    return (ranks.shape[0] - ranks).sum(axis=1)
@@ -0,0 +1,353 @@
+# engine/runner.py
+"""
+Command-line batch runner: score many cohorts without the Streamlit UI.
+
+Usage:
+    python -m engine.runner data/input/ --weights data/weight/weight_default.csv
+    python -m engine.runner a.csv b.csv --methods SAW,TOPSIS --workers 4
+    python -m engine.runner national.csv --out-of-core   # larger than RAM
+    python -m engine.runner data/input/ --store data/result/results.sqlite
+    python -m engine.runner data/input/ --quarantine   # skip invalid rows
+    python -m engine.runner data/input/ --cost C4_Dependents --normalization minmax
+
+Flow:
+1. Collect the input CSVs (files and/or every *.csv in the given directories).
+2. Read one weight profile (first row of the weight CSV, criteria = its columns);
+   --cost names the cost criteria and --normalization overrides the methods'
+   own normalization (engine.kernels.ScoringScheme).
+3. Farm the cohorts out to a process pool, one worker per core by default
+   (at most one per cohort; the cores left over score each cohort's row
+   blocks on threads, engine.kernels.map_blocks). Each worker, per cohort:
+    • streams the CSV into a temporary columnar table (validation + banding);
+      with --quarantine, invalid rows are skipped and written with their
+      problems to rejected_rows.csv instead of failing the cohort
+    • scores the selected methods in one pass (ScoringPipeline)
+    • ranks every method and computes BORDA over them
+    • writes {method}_result.csv and borda_result.csv to <output>/<cohort>/
+    • with --store, records the run in the SQLite results store (engine.store)
+   With --out-of-core, scores, orders and ranks stay in memory-mapped files
+   (engine.outofcore) and the result CSVs are written in rank order chunk
+   by chunk, so no step holds the whole cohort in memory.
+4. Print one line per finished cohort; a failed cohort does not stop the rest,
+   but makes the exit status non-zero.
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.cache import fingerprint_file
+from engine.ingest import DEFAULT_CHUNK_ROWS, QUARANTINE, REJECT, IngestError, ingest_csv
+from engine.kernels import (
+    BENEFIT,
+    COST,
+    METHODS,
+    NORMALIZATIONS,
+    ScoringScheme,
+    get_method,
+    registered_methods,
+    set_scoring_threads,
+    threads_per_worker,
+)
+from engine.outofcore import score_out_of_core, table_matrix
+from engine.pipeline import ScoringPipeline
+from engine.ranking import BORDA
+from engine.schema import ID_COLUMN
+from engine.storage import atomic_write_csv, open_table, temp_path
+from engine.store import ResultStore
+
+# ---------- Constants ----------
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_OUTPUT_DIR = BASE_DIR / "data" / "result"
+DEFAULT_WEIGHT_PATH = BASE_DIR / "data" / "weight" / "weight_default.csv"
+CSV_CHUNK_ROWS = 250_000  # rows per written chunk in out-of-core mode
+
+# ---------- Results ----------
+
+@dataclass
+class CohortResult:
+    """Outcome of scoring one cohort."""
+
+    name: str
+    source: Path
+    output_dir: Path
+    rows: int = 0
+    rejected: int = 0  # invalid rows quarantined
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+# ---------- Helper Functions ----------
+
+def collect_inputs(paths: Iterable[Path]) -> List[Path]:
+    """Expand directories into their *.csv files (sorted); files are kept as given."""
+    inputs: List[Path] = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            inputs.extend(sorted(p for p in path.glob("*.csv") if p.is_file()))
+        elif path.is_file():
+            inputs.append(path)
+        else:
+            raise FileNotFoundError(f"No such file or directory: {path}")
+    return inputs
+
+def cohort_names(inputs: Sequence[Path]) -> List[str]:
+    """Output folder name per input (file stem); raises ValueError on duplicates."""
+    names = [p.stem for p in inputs]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"Several inputs share the cohort name: {', '.join(duplicates)}")
+    return names
+
+def load_weights(path: Path) -> Tuple[List[str], List[float]]:
+    """Criteria and weights from the first row of a weight CSV."""
+    df = pd.read_csv(path, encoding="utf-8-sig")
+    if df.empty:
+        raise ValueError(f"{Path(path).name} has no weight row")
+    row = df.iloc[0]
+    return list(df.columns), [float(v) for v in row.to_numpy()]
+
+def parse_methods(text: str) -> List[str]:
+    """Comma-separated method list (case-insensitive) → validated upper-case names."""
+    methods = [m.strip().upper() for m in text.split(",") if m.strip()]
+    available = registered_methods()
+    unknown = [m for m in methods if m not in available]
+    if not methods or unknown:
+        raise ValueError(f"Methods must be a comma-separated subset of {', '.join(available)}")
+    return methods
+
+def write_csv(df: pd.DataFrame, path: Path) -> None:
+    """Write a CSV through a temporary file so readers never see half a result."""
+    atomic_write_csv(df, path, index=False)
+
+def write_csv_chunks(chunks: Iterable[pd.DataFrame], path: Path) -> None:
+    """write_csv for a result produced chunk by chunk (header written once)."""
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=i == 0)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+def _ranked_chunks(order: np.ndarray, frame_of, chunk_rows: int = CSV_CHUNK_ROWS) -> Iterable[pd.DataFrame]:
+    for start in range(0, max(len(order), 1), chunk_rows):
+        yield frame_of(np.asarray(order[start:start + chunk_rows]))
+
+# ---------- Cohort Scoring ----------
+
+def score_cohort(
+    source: Path,
+    output_dir: Path,
+    criteria: Sequence[str],
+    weights: Sequence[float],
+    methods: Sequence[str] = METHODS,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    out_of_core: bool = False,
+    store_path: Optional[Path] = None,
+    on_invalid: str = REJECT,
+    scheme: Optional[ScoringScheme] = None,
+) -> CohortResult:
+    """Preprocess, score, rank and BORDA one cohort; errors are returned, not raised."""
+    source, output_dir = Path(source), Path(output_dir)
+    result = CohortResult(name=output_dir.name, source=source, output_dir=output_dir)
+    start = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory(prefix="dss-cohort-") as tmp:
+            report = ingest_csv(
+                source, table_dir=Path(tmp) / "preprocessed.cols", chunk_rows=chunk_rows, on_invalid=on_invalid
+            )
+            table = open_table(report.table_dir)
+            missing = [c for c in criteria if c not in table.columns]
+            if missing:
+                raise IngestError(f"Weights name criteria not in data: {', '.join(missing)}")
+
+            output_dir.mkdir(parents=True, exist_ok=True)
+            if report.rejected:
+                shutil.copyfile(report.rejected_path, output_dir / "rejected_rows.csv")
+            if out_of_core:
+                write_out_of_core(table, criteria, weights, methods, output_dir, Path(tmp) / "scores", scheme)
+            else:
+                run = ScoringPipeline.from_table(table, criteria, cache=None).score(weights, methods, scheme)
+                df = table.to_frame()
+                for method in methods:
+                    order = run.order(method)
+                    df_result = df.iloc[order].assign(**{f"{method}_Score": run.scores[method][order]})
+                    write_csv(df_result, output_dir / f"{method.lower()}_result.csv")
+                if len(methods) > 1:
+                    write_csv(run.borda_frame(methods), output_dir / "borda_result.csv")
+                if store_path is not None:
+                    ResultStore(store_path).record_run(
+                        run, fingerprint_file(source), criteria, weights, methods, label=result.name, scheme=scheme
+                    )
+        result.rows = report.rows
+        result.rejected = report.rejected
+    except (IngestError, ValueError, OSError, sqlite3.Error) as e:
+        result.error = str(e)
+    result.seconds = time.perf_counter() - start
+    return result
+
+def write_out_of_core(
+    table,
+    criteria: Sequence[str],
+    weights: Sequence[float],
+    methods: Sequence[str],
+    output_dir: Path,
+    work_dir: Path,
+    scheme: Optional[ScoringScheme] = None,
+) -> None:
+    """Same result CSVs as the in-memory path, scored and ranked through memory-mapped files."""
+    borda = len(methods) > 1
+    scored = score_out_of_core(table_matrix(table, criteria), weights, work_dir, methods, with_borda=borda, scheme=scheme)
+
+    for method in methods:
+        scores = scored.scores(method)
+
+        def method_rows(rows: np.ndarray, method=method, scores=scores) -> pd.DataFrame:
+            df = pd.DataFrame({name: np.asarray(table.take(name, rows)) for name in table.columns}, columns=table.columns)
+            return df.assign(**{f"{method}_Score": scores[rows]})
+
+        write_csv_chunks(_ranked_chunks(scored.order(method), method_rows), output_dir / f"{method.lower()}_result.csv")
+
+    if borda:
+        def borda_rows(rows: np.ndarray) -> pd.DataFrame:
+            data = {ID_COLUMN: table.take(ID_COLUMN, rows)}
+            for m in methods:
+                data[f"Rank_{m}"] = scored.ranks(m)[rows]
+            data["Borda_Score"] = scored.scores(BORDA)[rows]
+            return pd.DataFrame(data)
+
+        write_csv_chunks(_ranked_chunks(scored.order(BORDA), borda_rows), output_dir / "borda_result.csv")
+
+def run_batch(
+    inputs: Sequence[Path],
+    weight_path: Path = DEFAULT_WEIGHT_PATH,
+    methods: Sequence[str] = METHODS,
+    output_dir: Path = DEFAULT_OUTPUT_DIR,
+    workers: Optional[int] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    on_result=None,
+    out_of_core: bool = False,
+    store_path: Optional[Path] = None,
+    on_invalid: str = REJECT,
+    cost: Sequence[str] = (),
+    normalization: Optional[str] = None,
+) -> List[CohortResult]:
+    """
+    Score every input cohort in a process pool (one worker per core by default).
+
+    Results go to output_dir/<cohort>/. on_result, if given, is called with
+    each CohortResult as soon as that cohort finishes. cost names the cost
+    criteria (all others are benefit criteria).
+    """
+    inputs = [Path(p) for p in inputs]
+    names = cohort_names(inputs)
+    criteria, weights = load_weights(weight_path)
+    unknown = [c for c in cost if c not in criteria]
+    if unknown:
+        raise ValueError(f"Cost criteria not in the weights: {', '.join(unknown)}")
+    scheme = ScoringScheme.from_types([COST if c in cost else BENEFIT for c in criteria], normalization)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(inputs) or 1))
+    results: Dict[Path, CohortResult] = {}
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=set_scoring_threads, initargs=(threads_per_worker(workers),)
+    ) as pool:
+        futures = {
+            pool.submit(
+                score_cohort,
+                source, Path(output_dir) / name, criteria, weights, methods, chunk_rows, out_of_core, store_path,
+                on_invalid, scheme,
+            ): source
+            for source, name in zip(inputs, names)
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if on_result is not None:
+                on_result(result)
+    return [results[p] for p in inputs]
+
+# ---------- Command Line ----------
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m engine.runner",
+        description="Score scholarship cohorts (preprocessing → SAW/WP/TOPSIS → BORDA) without the UI.",
+    )
+    parser.add_argument("inputs", nargs="+", type=Path, help="input CSV files and/or directories of CSVs")
+    parser.add_argument("-w", "--weights", type=Path, default=DEFAULT_WEIGHT_PATH, help="weight CSV (first row is used)")
+    parser.add_argument(
+        "-m", "--methods", default=",".join(METHODS),
+        help=f"comma-separated methods out of {', '.join(registered_methods())} (default: {','.join(METHODS)})",
+    )
+    parser.add_argument("-o", "--output", type=Path, default=DEFAULT_OUTPUT_DIR, help="output directory")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="rows per ingestion chunk")
+    parser.add_argument(
+        "--out-of-core", action="store_true", help="score and rank through memory-mapped files (cohorts larger than RAM)"
+    )
+    parser.add_argument("--store", type=Path, default=None, help="also record every run in this SQLite results store")
+    parser.add_argument(
+        "--quarantine", action="store_true",
+        help="skip invalid rows (written to <cohort>/rejected_rows.csv) instead of failing the cohort",
+    )
+    parser.add_argument("--cost", default="", help="comma-separated cost criteria (lower is better; default: none)")
+    parser.add_argument(
+        "--normalization", choices=NORMALIZATIONS, default=None,
+        help="normalization for SAW/TOPSIS/MOORA/CODAS (default: each method's own)",
+    )
+    return parser
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        methods = parse_methods(args.methods)
+        inputs = collect_inputs(args.inputs)
+    except (ValueError, FileNotFoundError) as e:
+        parser.error(str(e))
+    if not inputs:
+        parser.error("no input CSV files found")
+    if args.out_of_core and not all(get_method(m).row_local for m in methods):
+        row_local = [m for m in registered_methods() if get_method(m).row_local]
+        parser.error(f"--out-of-core supports row-local methods only ({', '.join(row_local)})")
+    if args.store is not None and args.out_of_core:
+        parser.error("--store needs the in-memory scores; it cannot be combined with --out-of-core")
+
+    def report(result: CohortResult) -> None:
+        if result.ok:
+            skipped = f" (invalid rows quarantined: {result.rejected})" if result.rejected else ""
+            print(f"✅ {result.name}: {result.rows} rows{skipped} in {result.seconds:.2f}s → {result.output_dir}")
+        else:
+            print(f"❌ {result.name}: {result.error}", file=sys.stderr)
+
+    try:
+        results = run_batch(
+            inputs, args.weights, methods, args.output, args.workers, args.chunk_rows, report, args.out_of_core, args.store,
+            QUARANTINE if args.quarantine else REJECT, [c.strip() for c in args.cost.split(",") if c.strip()],
+            args.normalization,
+        )
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    failed = sum(not r.ok for r in results)
+    print(f"{len(results) - failed}/{len(results)} cohorts scored")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+# engine/schema.py
+"""
+Applicant dataset schema shared by ingestion, preprocessing and scoring.
+"""
+
+# ---------- Columns ----------
+ID_COLUMN = "ID"
+INCOME_COLUMN = "C3_ParentIncomeIDR"
+
+CRITERIA_COLUMNS = [
+    "C1_GPA", "C2_Certificates", "C3_ParentIncomeIDR",
+    "C4_Dependents", "C5_OrgScore", "C6_VolunteerEvents",
+    "C7_LetterScore", "C8_InterviewScore", "C9_DocComplete", "C10_OnTime"
+]
+
+# Expected CSV columns
+EXPECTED_COLUMNS = [ID_COLUMN] + CRITERIA_COLUMNS
@@ -0,0 +1,319 @@
+# engine/sensitivity.py
+"""
+Weight sensitivity: Monte Carlo rank stability under perturbed weights.
+
+Flow:
+1. Normalize the current weights and draw Dirichlet samples around them
+   (alpha = concentration × weights; higher concentration → smaller spread).
+2. Score the samples in chunks with score_profiles, so a chunk of samples is
+   a handful of matrix products over the applicant matrix.
+3. Turn each sample into a final rank: the method's own rank for a single
+   method, or the Borda rank (as in the ranking tab) for several methods.
+4. Fold every chunk into fixed-size per-applicant accumulators: award counts
+   (rank ≤ cutoff), rank sum, best / worst rank and a geometric rank histogram
+   used for the rank percentiles.
+5. Optionally run the chunks on a process pool (spawned: the Streamlit
+   server is threaded). Each worker folds all of its chunks into one
+   accumulator and returns it once. Every weight sample is drawn up front
+   from the run seed and all totals are exact sums, so results do not
+   depend on the chunk size or the number of workers.
+
+Memory is bounded by memory_budget_mb, which covers the chunk working sets
+and every accumulator (about applicants × rank_bins × 2 bytes each: the
+total plus one per worker). plan_chunks picks the workers and the chunk
+size to fit, using fewer workers when their accumulators would not.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.batch import score_profiles
+from engine.kernels import (
+    DEFAULT_BLOCK_ROWS,
+    METHODS,
+    ColumnStats,
+    ScoringScheme,
+    as_scoring_matrix,
+    as_weights,
+    row_blocks,
+)
+from engine.ranking import rank_desc
+
+# ---------- Constants ----------
+DEFAULT_CONCENTRATION = 200.0
+DEFAULT_PERCENTILES = (5, 50, 95)
+DEFAULT_RANK_BINS = 128  # histogram costs applicants × bins × 2 bytes below 65k samples
+DEFAULT_MEMORY_BUDGET_MB = 512
+BYTES_PER_CELL = 8 * 6  # per applicant, method and sample: scores, ranks, argsort indices and temporaries
+ACCUMULATOR_VECTORS = 4  # award counts, rank sum, best and worst rank (8 bytes per applicant each)
+MIN_ALPHA = 1e-6  # Dirichlet needs strictly positive concentrations
+
+# Matrix and normalizers installed once per worker process
+_WORKER_STATE: Dict[str, object] = {}
+
+# ---------- Helper Functions ----------
+
+def sample_weights(
+    base_weights,
+    n_samples: int,
+    concentration: float = DEFAULT_CONCENTRATION,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """Draw (n_samples × criteria) Dirichlet weights centred on the normalized base weights."""
+    w = np.asarray(base_weights, dtype=np.float64)
+    total = w.sum()
+    if total <= 0:
+        raise ValueError("Weights must have a positive sum")
+    rng = rng if rng is not None else np.random.default_rng()
+    alpha = np.maximum(concentration * w / total, MIN_ALPHA)
+    return rng.dirichlet(alpha, size=n_samples)
+
+def accumulator_bytes(n_rows: int, n_bins: int, n_samples: int) -> int:
+    """Memory of one _Accumulator (the rank histogram dominates)."""
+    return n_rows * (n_bins * _histogram_dtype(n_samples).itemsize + ACCUMULATOR_VECTORS * 8)
+
+def plan_chunks(
+    n_rows: int, n_methods: int, n_samples: int, n_bins: int, memory_budget_mb: float, n_workers: int = 1
+) -> Tuple[int, int]:
+    """
+    (workers, samples per chunk) whose working sets and accumulators fit the budget.
+
+    The parent holds the total; every worker holds its own accumulator and
+    one chunk at a time. A worker is only added while its accumulator and a
+    one-sample chunk still fit, and workers never outnumber the samples
+    (nor, in rank_stability, the chunks: a run that fits one chunk stays
+    in-process).
+    """
+    budget = memory_budget_mb * 1024 * 1024
+    per_sample = max(n_rows, 1) * max(n_methods, 1) * BYTES_PER_CELL
+    acc = accumulator_bytes(n_rows, n_bins, n_samples)
+    workers = max(1, min(n_workers, n_samples, int((budget - acc) // (acc + per_sample))))
+    if workers == 1:
+        chunk = (budget - acc) // per_sample  # serial: chunks fold straight into the total
+    else:
+        chunk = (budget - (workers + 1) * acc) // (workers * per_sample)
+    return workers, max(1, int(chunk))
+
+def rank_bin_edges(n_rows: int, n_bins: int) -> np.ndarray:
+    """
+    First rank of each histogram bin, spaced geometrically over 1..n.
+
+    Top ranks get one bin each (exact percentiles where awards are decided);
+    deeper ranks share bins whose width grows with the rank.
+    """
+    edges = np.unique(np.round(np.geomspace(1, n_rows + 1, max(n_bins, 1) + 1)))
+    edges[0], edges[-1] = 1, n_rows + 1
+    return edges
+
+def _final_ranks(
+    matrix: np.ndarray, weights: np.ndarray, methods: Sequence[str], stats: ColumnStats, scheme: Optional[ScoringScheme] = None
+) -> np.ndarray:
+    """(applicants × samples) final ranks for one chunk of weight samples."""
+    result = score_profiles(matrix, weights, methods, stats=stats, scheme=scheme)
+    if len(methods) == 1:
+        return result.ranks[methods[0]]
+    borda = sum(matrix.shape[0] - result.ranks[m] for m in methods)
+    return rank_desc(borda)
+
+def _histogram_dtype(n_samples: int) -> np.dtype:
+    return np.dtype(np.uint16 if n_samples < 2**16 else np.uint32)
+
+@dataclass
+class _Accumulator:
+    """Per-applicant running totals; merged across chunks and workers."""
+
+    award_count: np.ndarray
+    rank_sum: np.ndarray
+    best_rank: np.ndarray
+    worst_rank: np.ndarray
+    histogram: np.ndarray
+    n_samples: int = 0
+
+    @classmethod
+    def empty(cls, n_rows: int, n_bins: int, n_samples: int) -> "_Accumulator":
+        return cls(
+            award_count=np.zeros(n_rows, dtype=np.int64),
+            rank_sum=np.zeros(n_rows, dtype=np.float64),
+            best_rank=np.full(n_rows, np.inf),
+            worst_rank=np.full(n_rows, -np.inf),
+            histogram=np.zeros((n_rows, n_bins), dtype=_histogram_dtype(n_samples)),
+        )
+
+    def add(self, ranks: np.ndarray, cutoff: Optional[int], edges: np.ndarray) -> None:
+        n_rows = ranks.shape[0]
+        ranks = np.where(np.isnan(ranks), n_rows, ranks)  # unscorable rows count as last
+        if cutoff is not None:
+            self.award_count += (ranks <= cutoff).sum(axis=1)
+        self.rank_sum += ranks.sum(axis=1)
+        np.minimum(self.best_rank, ranks.min(axis=1), out=self.best_rank)
+        np.maximum(self.worst_rank, ranks.max(axis=1), out=self.worst_rank)
+        bins = np.searchsorted(edges, ranks, side="right") - 1
+        row_index = np.arange(n_rows)
+        for j in range(ranks.shape[1]):
+            # every applicant appears once per sample, so plain fancy-index += is safe
+            self.histogram[row_index, bins[:, j]] += 1
+        self.n_samples += ranks.shape[1]
+
+    def merge(self, other: "_Accumulator") -> None:
+        self.award_count += other.award_count
+        self.rank_sum += other.rank_sum
+        np.minimum(self.best_rank, other.best_rank, out=self.best_rank)
+        np.maximum(self.worst_rank, other.worst_rank, out=self.worst_rank)
+        self.histogram += other.histogram
+        self.n_samples += other.n_samples
+
+def _run_chunks(
+    acc: _Accumulator,
+    matrix: np.ndarray,
+    stats: ColumnStats,
+    weight_chunks: Sequence[np.ndarray],
+    methods: Sequence[str],
+    cutoff: Optional[int],
+    edges: np.ndarray,
+    scheme: Optional[ScoringScheme] = None,
+) -> _Accumulator:
+    """Fold every chunk of weight samples into acc."""
+    for weights in weight_chunks:
+        acc.add(_final_ranks(matrix, weights, methods, stats, scheme), cutoff, edges)
+    return acc
+
+def _init_worker(matrix: np.ndarray, stats: ColumnStats) -> None:
+    _WORKER_STATE["matrix"] = matrix
+    _WORKER_STATE["stats"] = stats
+
+def _run_chunks_in_worker(
+    weight_chunks: Sequence[np.ndarray],
+    methods: Sequence[str],
+    cutoff: Optional[int],
+    edges: np.ndarray,
+    n_samples: int,
+    scheme: Optional[ScoringScheme],
+) -> _Accumulator:
+    """One worker's share of the chunks, folded into a single accumulator returned once."""
+    matrix = _WORKER_STATE["matrix"]
+    acc = _Accumulator.empty(matrix.shape[0], len(edges) - 1, n_samples)
+    return _run_chunks(acc, matrix, _WORKER_STATE["stats"], weight_chunks, methods, cutoff, edges, scheme)
+
+# ---------- Report ----------
+
+@dataclass
+class StabilityReport:
+    """Per-applicant rank stability over all weight samples."""
+
+    n_samples: int
+    cutoff: Optional[int]
+    mean_rank: np.ndarray
+    best_rank: np.ndarray
+    worst_rank: np.ndarray
+    rank_percentiles: Dict[int, np.ndarray]
+    award_frequency: Optional[np.ndarray]
+
+    def to_frame(self, ids: Optional[Sequence] = None) -> pd.DataFrame:
+        """Report as a DataFrame, most stable award candidates first."""
+        data = {
+            "Mean_Rank": self.mean_rank,
+            "Best_Rank": self.best_rank,
+            "Worst_Rank": self.worst_rank,
+        }
+        for q, values in self.rank_percentiles.items():
+            data[f"Rank_P{q}"] = values
+        if self.award_frequency is not None:
+            data["Award_Frequency"] = self.award_frequency
+        df = pd.DataFrame(data)
+        if ids is not None:
+            df.insert(0, "ID", list(ids))
+        sort_by = ["Award_Frequency", "Mean_Rank"] if self.award_frequency is not None else ["Mean_Rank"]
+        ascending = [False, True] if self.award_frequency is not None else [True]
+        return df.sort_values(by=sort_by, ascending=ascending).reset_index(drop=True)
+
+def _percentiles_from_histogram(
+    histogram: np.ndarray, edges: np.ndarray, n_samples: int, percentiles: Iterable[int]
+) -> Dict[int, np.ndarray]:
+    """
+    Rank percentiles read off the per-applicant rank histogram.
+
+    Each estimate is the midpoint rank of its bin: exact for single-rank bins
+    at the top of the ranking and within the bin width further down.
+    """
+    n_rows, n_bins = histogram.shape
+    midpoints = (edges[:-1] + edges[1:] - 1) / 2
+    targets = {q: max(np.ceil(q / 100 * n_samples), 1) for q in percentiles}
+    out = {q: np.empty(n_rows, dtype=np.float64) for q in targets}
+    for rows in row_blocks(n_rows, DEFAULT_BLOCK_ROWS):
+        cumulative = np.cumsum(histogram[rows], axis=1, dtype=np.int64)
+        for q, target in targets.items():
+            bin_index = (cumulative < target).sum(axis=1)
+            out[q][rows] = midpoints[np.minimum(bin_index, n_bins - 1)]
+    return out
+
+# ---------- Main Function ----------
+
+def rank_stability(
+    matrix: np.ndarray,
+    weights,
+    n_samples: int = 1000,
+    methods: Iterable[str] = METHODS,
+    cutoff: Optional[int] = None,
+    concentration: float = DEFAULT_CONCENTRATION,
+    percentiles: Iterable[int] = DEFAULT_PERCENTILES,
+    rank_bins: int = DEFAULT_RANK_BINS,
+    memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+    n_workers: int = 1,
+    seed: Optional[int] = None,
+    scheme: Optional[ScoringScheme] = None,
+) -> StabilityReport:
+    """
+    Perturb the weights n_samples times and report how stable each applicant's rank is.
+
+    cutoff is the number of awards; when given, the report includes how often
+    each applicant ranks inside it. n_workers > 1 spreads chunks over a process
+    pool of at most n_workers (fewer when the memory budget cannot hold
+    their accumulators, see plan_chunks); each worker receives the matrix
+    once, at start-up, and returns one accumulator. scheme sets the cost
+    criteria and normalization as for score_all.
+    """
+    matrix = as_scoring_matrix(matrix)
+    n_rows, n_criteria = matrix.shape
+    base = as_weights(weights, n_criteria)
+    methods = [m.upper() for m in methods]
+    stats = ColumnStats.from_matrix(matrix)
+    edges = rank_bin_edges(n_rows, rank_bins)
+
+    workers, chunk = plan_chunks(n_rows, len(methods), n_samples, len(edges) - 1, memory_budget_mb, n_workers)
+    samples = sample_weights(base, n_samples, concentration, np.random.default_rng(seed))
+    chunks = [samples[start:start + chunk] for start in range(0, n_samples, chunk)]
+
+    total = _Accumulator.empty(n_rows, len(edges) - 1, n_samples)
+    if workers > 1 and len(chunks) > 1:
+        workers = min(workers, len(chunks))
+        shares = [chunks[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),  # no fork of the threaded Streamlit server
+            initializer=_init_worker,
+            initargs=(matrix, stats),
+        ) as pool:
+            futures = [
+                pool.submit(_run_chunks_in_worker, share, methods, cutoff, edges, n_samples, scheme)
+                for share in shares
+            ]
+            for future in futures:
+                total.merge(future.result())
+    else:
+        _run_chunks(total, matrix, stats, chunks, methods, cutoff, edges, scheme)
+
+    n = max(total.n_samples, 1)
+    return StabilityReport(
+        n_samples=total.n_samples,
+        cutoff=cutoff,
+        mean_rank=total.rank_sum / n,
+        best_rank=total.best_rank,
+        worst_rank=total.worst_rank,
+        rank_percentiles=_percentiles_from_histogram(total.histogram, edges, total.n_samples, percentiles),
+        award_frequency=total.award_count / n if cutoff is not None else None,
+    )
@@ -0,0 +1,428 @@
+# engine/service.py
+"""
+HTTP scoring service: batch scoring and ranking for other systems (e.g. the
+admissions portal), without the Streamlit UI.
+
+Usage:
+    python -m engine.service --host 127.0.0.1 --port 8600 --workers 4
+
+Endpoints (JSON in, JSON out; results are column-wise lists, best first):
+    GET  /health     liveness and worker count
+    POST /datasets   body: applicant CSV → {"dataset": key, "rows": n, "rejected": n}
+                     ?invalid=quarantine keeps the valid rows and lists the
+                     problems of the dropped ones (default: reject the file)
+    POST /score      per-method scores and ranks (plus the aggregate for several methods)
+    POST /rank       the aggregate ranking with every method's rank (borda_result layout)
+    POST /batch      {"requests": [{"kind": "score" | "rank", ...}, ...]}
+
+A score/rank request names its data either by "dataset" (a key returned by
+POST /datasets; uploads from the UI share the same content-addressed keys)
+or inline as "columns" ({"ID": [...], "C1_GPA": [...], ...}, raw applicant
+values, validated and banded like an upload). "weights" is {criterion:
+weight} or a list aligned with the default criteria; "methods" defaults to
+SAW, WP and TOPSIS (any registered method may be named); "top" limits each
+ranking to a top-k shortlist (boundary ties included). Optional "types"
+marks cost criteria ({criterion: "benefit" | "cost"}, unnamed criteria are
+benefit, or a list aligned with the criteria) and "normalization" picks
+max, minmax, vector or zscore for the normalizing methods. "aggregation"
+combines the methods' ranks by BORDA (default), COPELAND (exact up to
+COPELAND_EXACT_ROWS applicants; above that exact for the top
+COPELAND_EXACT_TOP and estimated below) or KEMENY (an approximation), with
+optional "method_weights" ({method: weight}, unnamed methods weigh 1, or a
+list aligned with the methods).
+
+Flow:
+1. Requests are handled on one asyncio event loop (Starlette on uvicorn), so
+   many calls can be in flight at once; parsing and validating the request
+   happens there.
+2. CPU-bound work (ingestion, scoring, ranking) goes to a process pool, one
+   worker per core by default, so the loop never waits on NumPy and several
+   requests score in parallel. /batch fans its items out to the pool at once.
+   With fewer workers than cores, each scores its row blocks on its share
+   of the cores (engine.kernels.map_blocks).
+3. Each worker keeps the datasets it has served open (memory-mapped tables
+   wrapped in a ScoringPipeline, LRU-bounded) and memoizes scores in its
+   RESULT_CACHE, so repeat requests on a warm dataset skip ingestion, table
+   opening and, for the same weights, scoring itself.
+4. Datasets live in the shared, read-only cache (engine.workspace), so every
+   worker and every app server sees the same uploads.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from engine.aggregation import AGGREGATIONS, SCORE_COLUMNS, as_method_weights
+from engine.cache import LRUCache, fingerprint_file
+from engine.ingest import QUARANTINE, REJECT, IngestError, cached_report, ingest_csv, source_key, validate_chunk
+from engine.kernels import (
+    BENEFIT,
+    METHODS,
+    ScoringScheme,
+    as_matrix,
+    registered_methods,
+    set_scoring_threads,
+    threads_per_worker,
+)
+from engine.pipeline import ScoringPipeline, ScoringRun
+from engine.preprocess import DEFAULT_BANDS, apply_bands
+from engine.ranking import BORDA
+from engine.schema import CRITERIA_COLUMNS, ID_COLUMN
+from engine.storage import is_fresh, open_table
+from engine.views import ResultView
+from engine.workspace import CACHE_ROOT, shared_table_dir
+
+# ---------- Constants ----------
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8600
+DATASET_CACHE_ITEMS = int(os.environ.get("DSS_SERVICE_DATASETS", 16))  # warm datasets per worker
+MAX_BATCH_REQUESTS = 256
+UPLOAD_DIR = CACHE_ROOT / "uploads"
+ERROR_RESPONSE_ROWS = 100  # row-level problems returned with an upload
+_DATASET_KEY = re.compile(r"[0-9a-f]{32}")
+
+# ---------- Errors & Requests ----------
+
+class DatasetNotFound(LookupError):
+    """Raised when a request names a dataset key that is not in the shared cache."""
+
+@dataclass(frozen=True)
+class ScoreRequest:
+    """One validated scoring request (picklable, sent to a worker)."""
+
+    criteria: List[str]
+    weights: List[float]
+    methods: List[str]
+    dataset: Optional[str] = None
+    columns: Optional[Dict[str, list]] = None
+    top: Optional[int] = None
+    kind: str = "score"
+    scheme: Optional[ScoringScheme] = None
+    aggregation: str = BORDA
+    method_weights: Optional[List[float]] = None
+
+def parse_request(payload, kind: str = "score") -> ScoreRequest:
+    """Validate a score/rank request body; raises ValueError with a message for the caller."""
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object")
+    kind = payload.get("kind", kind)
+    if kind not in ("score", "rank"):
+        raise ValueError('"kind" must be "score" or "rank"')
+
+    dataset, columns = payload.get("dataset"), payload.get("columns")
+    if (dataset is None) == (columns is None):
+        raise ValueError('Give either "dataset" or "columns"')
+    if dataset is not None and not (isinstance(dataset, str) and _DATASET_KEY.fullmatch(dataset)):
+        raise ValueError('"dataset" must be a key returned by POST /datasets')
+    if columns is not None and not (isinstance(columns, dict) and all(isinstance(v, list) for v in columns.values())):
+        raise ValueError('"columns" must map column names to lists of values')
+
+    weights = payload.get("weights")
+    if isinstance(weights, dict):
+        criteria = list(weights)
+        weights = list(weights.values())
+    elif isinstance(weights, list):
+        criteria = CRITERIA_COLUMNS
+    else:
+        raise ValueError('"weights" must be {criterion: weight} or a list of weights')
+    if len(weights) != len(criteria):
+        raise ValueError(f"Expected {len(criteria)} weights, got {len(weights)}")
+    try:
+        weights = [float(w) for w in weights]
+    except (TypeError, ValueError):
+        raise ValueError("Weights must be numbers") from None
+
+    methods = [str(m).upper() for m in payload.get("methods", METHODS)]
+    available = registered_methods()
+    unknown = [m for m in methods if m not in available]
+    if not methods or unknown:
+        raise ValueError(f'"methods" must be a subset of {", ".join(available)}')
+    if kind == "rank" and len(methods) < 2:
+        raise ValueError("An aggregate ranking needs at least two methods")
+
+    top = payload.get("top")
+    if top is not None and (isinstance(top, bool) or not isinstance(top, int) or top < 1):
+        raise ValueError('"top" must be a positive integer')
+    scheme = parse_scheme(payload, criteria)
+    aggregation, method_weights = parse_aggregation(payload, methods)
+    return ScoreRequest(list(criteria), weights, methods, dataset, columns, top, kind, scheme, aggregation, method_weights)
+
+def parse_scheme(payload: dict, criteria: Sequence[str]) -> Optional[ScoringScheme]:
+    """Criterion types and normalization of a request (None when neither is given)."""
+    types, normalization = payload.get("types"), payload.get("normalization")
+    if types is None and normalization is None:
+        return None
+    if types is None:
+        types = [BENEFIT] * len(criteria)
+    elif isinstance(types, dict):
+        unknown = [c for c in types if c not in criteria]
+        if unknown:
+            raise ValueError(f'"types" names unknown criteria: {", ".join(map(str, unknown))}')
+        types = [types.get(c, BENEFIT) for c in criteria]
+    elif not isinstance(types, list) or len(types) != len(criteria):
+        raise ValueError(f'"types" must be {{criterion: "benefit" | "cost"}} or a list of {len(criteria)} types')
+    if normalization is not None and not isinstance(normalization, str):
+        raise ValueError('"normalization" must be a string')
+    return ScoringScheme.from_types(types, normalization)
+
+def parse_aggregation(payload: dict, methods: Sequence[str]):
+    """(aggregation, method weights or None) of a request."""
+    aggregation = payload.get("aggregation", BORDA)
+    if not isinstance(aggregation, str) or aggregation.upper() not in AGGREGATIONS:
+        raise ValueError(f'"aggregation" must be one of {", ".join(AGGREGATIONS)}')
+    method_weights = payload.get("method_weights")
+    if method_weights is None:
+        return aggregation.upper(), None
+    if isinstance(method_weights, dict):
+        named = {str(m).upper(): w for m, w in method_weights.items()}
+        unknown = [m for m in named if m not in methods]
+        if unknown:
+            raise ValueError(f'"method_weights" names methods not requested: {", ".join(unknown)}')
+        method_weights = [named.get(m, 1.0) for m in methods]
+    elif not isinstance(method_weights, list):
+        raise ValueError('"method_weights" must be {method: weight} or a list of weights')
+    try:
+        method_weights = [float(w) for w in method_weights]
+    except (TypeError, ValueError):
+        raise ValueError("Method weights must be numbers") from None
+    as_method_weights(method_weights, len(methods))  # shape, sign and sum checks
+    return aggregation.upper(), method_weights
+
+# ---------- Worker Side ----------
+
+# Per worker process: open datasets, most recently used last
+_PIPELINES = LRUCache(max_items=DATASET_CACHE_ITEMS)
+
+def _json_list(values) -> list:
+    """Array → JSON-safe list (NaN becomes null)."""
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        return [None if v != v else v for v in values.tolist()]
+    return values.tolist()
+
+def dataset_pipeline(key: str, criteria: Sequence[str]) -> ScoringPipeline:
+    """Warm pipeline over a shared-cache dataset (opened once per worker and criteria set)."""
+    memo_key = (key, tuple(criteria))
+    pipeline = _PIPELINES.get(memo_key)
+    if pipeline is None:
+        table_dir = shared_table_dir(key)
+        if not is_fresh(table_dir):
+            raise DatasetNotFound(f"Unknown dataset: {key}")
+        table = open_table(table_dir)
+        missing = [c for c in criteria if c not in table.columns]
+        if missing:
+            raise ValueError(f"Weights name criteria not in data: {', '.join(missing)}")
+        pipeline = ScoringPipeline.from_table(table, criteria)
+        _PIPELINES.put(memo_key, pipeline)
+    return pipeline
+
+def inline_pipeline(columns: Dict[str, list], criteria: Sequence[str]) -> ScoringPipeline:
+    """Pipeline over raw applicant columns sent with the request (validated and banded)."""
+    try:
+        df = pd.DataFrame(columns)
+    except ValueError as e:
+        raise ValueError(f"Invalid columns: {e}") from e
+    validate_chunk(df, 0, [ID_COLUMN] + list(criteria))
+    try:
+        # only the banded columns the request scores (the others may be absent)
+        df = apply_bands(df, [band for band in DEFAULT_BANDS if band.column in criteria])
+    except (ValueError, TypeError) as e:
+        raise IngestError(f"Failed to band criteria: {e}") from e
+    # one-off data: keep its matrix and scores out of the worker's shared cache
+    return ScoringPipeline(df[ID_COLUMN], as_matrix(df[list(criteria)]), criteria, cache=None)
+
+def method_result(run: ScoringRun, method: str, top: Optional[int]) -> dict:
+    view = run.view(method, top)
+    return {
+        ID_COLUMN: _json_list(run.ids[view.order]),
+        "score": _json_list(run.scores[method][view.order]),
+        "rank": _json_list(view.ranks),
+    }
+
+def borda_result(run: ScoringRun, methods: Sequence[str], top: Optional[int], aggregation: str = BORDA, weights=None) -> dict:
+    scores = run.aggregate(methods, aggregation, weights)
+    view = ResultView.from_scores(scores, top)
+    result = {"Rank": _json_list(view.ranks), ID_COLUMN: _json_list(run.ids[view.order])}
+    for m in methods:
+        result[f"Rank_{m}"] = _json_list(run.rank(m)[view.order])
+    result[SCORE_COLUMNS[aggregation]] = _json_list(scores[view.order])
+    return result
+
+def score_job(request: ScoreRequest) -> dict:
+    """Score (and rank) one request; runs in a pool worker."""
+    if request.dataset is not None:
+        pipeline = dataset_pipeline(request.dataset, request.criteria)
+    else:
+        pipeline = inline_pipeline(request.columns, request.criteria)
+    run = pipeline.score(request.weights, request.methods, request.scheme)
+
+    response = {"rows": len(run.ids), "dataset": request.dataset, "methods": request.methods}
+    if request.kind == "rank":
+        response["ranking"] = borda_result(run, request.methods, request.top, request.aggregation, request.method_weights)
+        return response
+    results = {m: method_result(run, m, request.top) for m in request.methods}
+    if len(request.methods) > 1:
+        scores = run.aggregate(request.methods, request.aggregation, request.method_weights)
+        view = ResultView.from_scores(scores, request.top)
+        results[request.aggregation] = {
+            ID_COLUMN: _json_list(run.ids[view.order]),
+            "score": _json_list(scores[view.order]),
+            "rank": _json_list(view.ranks),
+        }
+    response["results"] = results
+    return response
+
+def _error_records(errors: Optional[pd.DataFrame]) -> list:
+    if errors is None:
+        return []
+    head = errors.head(ERROR_RESPONSE_ROWS)
+    return [
+        {"row": int(row), "id": None if pd.isna(id_) else str(id_), "column": column, "error": error, "value": None if pd.isna(value) else str(value)}
+        for row, id_, column, error, value in zip(head["Row"], head[ID_COLUMN], head["Column"], head["Error"], head["Value"])
+    ]
+
+def ingest_job(csv_path: str, on_invalid: str = REJECT) -> dict:
+    """Preprocess an uploaded CSV into the shared cache (once per distinct content)."""
+    key = source_key(fingerprint_file(csv_path))
+    table_dir = shared_table_dir(key)
+    report = cached_report(table_dir, key, on_invalid)
+    if report is None:
+        report = ingest_csv(csv_path, table_dir=table_dir, extra={"source_key": key}, replace=False, on_invalid=on_invalid)
+    response = {"dataset": key, "rows": report.rows, "rejected": report.rejected}
+    if report.errors is not None:
+        response["errors"] = _error_records(report.errors)
+    return response
+
+def _ready() -> int:
+    return os.getpid()
+
+# ---------- HTTP Handlers ----------
+
+def error_response(e: Exception) -> JSONResponse:
+    status = 404 if isinstance(e, DatasetNotFound) else 400
+    return JSONResponse({"error": str(e)}, status_code=status)
+
+async def run_job(request: Request, job, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(request.app.state.pool, job, *args)
+
+async def read_json(request: Request):
+    try:
+        return await request.json()
+    except ValueError:
+        raise ValueError("Request body is not valid JSON") from None
+
+async def health(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok", "workers": request.app.state.workers})
+
+async def upload_dataset(request: Request) -> JSONResponse:
+    """Stream the CSV body to a temporary file, then ingest it in a worker."""
+    on_invalid = request.query_params.get("invalid", REJECT)
+    if on_invalid not in (REJECT, QUARANTINE):
+        return error_response(ValueError(f'"invalid" must be "{REJECT}" or "{QUARANTINE}"'))
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix=".csv", dir=UPLOAD_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for block in request.stream():
+                f.write(block)
+        return JSONResponse(await run_job(request, ingest_job, tmp, on_invalid))
+    except IngestError as e:
+        return JSONResponse({"error": str(e), "errors": _error_records(e.errors)}, status_code=400)
+    finally:
+        os.unlink(tmp)
+
+async def score(request: Request, kind: str = "score") -> JSONResponse:
+    try:
+        parsed = parse_request(await read_json(request), kind)
+        return JSONResponse(await run_job(request, score_job, parsed))
+    except (ValueError, DatasetNotFound) as e:
+        return error_response(e)
+
+async def rank(request: Request) -> JSONResponse:
+    return await score(request, kind="rank")
+
+async def batch(request: Request) -> JSONResponse:
+    """Run every item concurrently in the pool; a failed item does not fail the rest."""
+    try:
+        payload = await read_json(request)
+        items = payload.get("requests") if isinstance(payload, dict) else None
+        if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH_REQUESTS:
+            raise ValueError(f'"requests" must be a list of 1 to {MAX_BATCH_REQUESTS} requests')
+    except ValueError as e:
+        return error_response(e)
+
+    async def one(item) -> dict:
+        try:
+            return await run_job(request, score_job, parse_request(item))
+        except (ValueError, DatasetNotFound) as e:
+            return {"error": str(e)}
+
+    return JSONResponse({"results": await asyncio.gather(*(one(item) for item in items))})
+
+# ---------- App ----------
+
+def create_app(workers: Optional[int] = None) -> Starlette:
+    """The ASGI app; its worker pool is started (and warmed) with the server."""
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        # spawn, not fork: the server process already runs threads (event loop, executors)
+        app.state.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=set_scoring_threads,
+            initargs=(threads_per_worker(workers),),
+        )
+        app.state.workers = workers
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(app.state.pool, _ready) for _ in range(workers)))
+        try:
+            yield
+        finally:
+            app.state.pool.shutdown(cancel_futures=True)
+
+    return Starlette(
+        routes=[
+            Route("/health", health, methods=["GET"]),
+            Route("/datasets", upload_dataset, methods=["POST"]),
+            Route("/score", score, methods=["POST"]),
+            Route("/rank", rank, methods=["POST"]),
+            Route("/batch", batch, methods=["POST"]),
+        ],
+        lifespan=lifespan,
+    )
+
+# ---------- Command Line ----------
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m engine.service", description="Serve batch scoring and ranking over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"interface to bind (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="scoring processes (default: one per core)")
+    return parser
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    uvicorn.run(create_app(args.workers), host=args.host, port=args.port)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
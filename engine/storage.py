@@ -0,0 +1,375 @@
+# engine/storage.py
+"""
+Columnar tables for preprocessed datasets and score results, stored as
+Arrow IPC files (Feather v2) through pyarrow.
+
+A table is a directory (``*.cols``) holding:
+    • table.arrow – every column, one uncompressed record batch per
+                    appended chunk. Matrix columns (e.g. the criteria for
+                    scoring) are float64, or in the compact layout
+                    int8/int16 codes (engine.compact); string columns
+                    (e.g. ID) are Arrow utf8.
+    • meta.json   – row count, column kinds, code scales and extra metadata,
+                    so freshness and result keys are checked without opening
+                    the data
+    • side files written with the table (e.g. ingestion's rejected rows)
+
+Flow:
+1. ColumnarWriter appends chunk by chunk, so a table never has to fit in
+   memory while it is written.
+2. open_table() memory-maps table.arrow (pa.memory_map): numeric columns are
+   read in place as read-only NumPy views, without parsing or copying; a
+   column spread over several batches is concatenated once, on first use.
+3. The matrix columns come back as a CompactMatrix (codes, or float64 with
+   scale 1), which decodes one row block at a time.
+4. Writes go to uniquely named temporary siblings (temp_path) and are renamed
+   into place, so concurrent writers never share a scratch file and readers
+   never see half a table or CSV. CSV stays an export format only.
+"""
+
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from engine.compact import SCORING_DTYPE, CompactMatrix, CriterionSpec
+
+# ---------- Constants ----------
+TABLE_SUFFIX = ".cols"
+META_FILE = "meta.json"
+DATA_FILE = "table.arrow"
+FORMAT_VERSION = 2
+
+# ---------- Helper Functions ----------
+
+def columnar_path(path: Path) -> Path:
+    """Columnar table directory that sits next to a CSV (foo.csv → foo.cols)."""
+    return Path(path).with_suffix(TABLE_SUFFIX)
+
+def is_fresh(table_dir: Path, csv_path: Optional[Path] = None) -> bool:
+    """True if the table exists (in the current format) and is at least as new as its CSV source."""
+    meta = Path(table_dir) / META_FILE
+    if not meta.exists() or not (Path(table_dir) / DATA_FILE).exists():
+        return False
+    if csv_path is None or not Path(csv_path).exists():
+        return True
+    return meta.stat().st_mtime >= Path(csv_path).stat().st_mtime
+
+def temp_path(path: Path) -> Path:
+    """Unique scratch sibling of path (same filesystem, so os.replace is atomic)."""
+    path = Path(path)
+    return path.with_name(f"{path.name}.{os.getpid()}-{uuid.uuid4().hex[:8]}.part")
+
+def atomic_write_csv(df: pd.DataFrame, path: Path, **kwargs) -> None:
+    """df.to_csv through a scratch file renamed into place."""
+    tmp = temp_path(path)
+    try:
+        df.to_csv(tmp, **kwargs)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+# ---------- Writer ----------
+
+class ColumnarWriter:
+    """
+    Append DataFrame chunks to a new columnar table.
+
+    The table is built in a temporary directory and moved into place by
+    close(), so readers never see a half-written table. With replace=False
+    an existing table is kept and the new copy dropped (for content-addressed
+    tables that are identical by construction). With matrix_specs,
+    the matrix columns are stored compactly (one integer code column each)
+    instead of as float64; a chunk that does not fit a column's spec widens
+    it (CriterionSpec.widened) and the batches already written are
+    re-encoded once, so no value is ever rejected for its storage type.
+    """
+
+    def __init__(
+        self,
+        table_dir: Path,
+        matrix_columns: Sequence[str] = (),
+        matrix_dtype=np.float64,
+        extra: Optional[Dict] = None,
+        matrix_specs: Optional[Sequence[CriterionSpec]] = None,
+        replace: bool = True,
+    ):
+        self.table_dir = Path(table_dir)
+        self.extra = dict(extra or {})
+        self.replace = replace
+        self.tmp_dir = temp_path(self.table_dir)
+        self.specs: Optional[Dict[str, CriterionSpec]] = None
+        if matrix_specs is not None:
+            self.specs = {s.column: s for s in matrix_specs}
+            matrix_columns = matrix_columns or list(self.specs)
+            missing = [c for c in matrix_columns if c not in self.specs]
+            if missing:
+                raise ValueError(f"No compact spec for: {', '.join(missing)}")
+        self.matrix_columns = list(matrix_columns)
+        self.matrix_dtype = np.dtype(matrix_dtype)
+        self.columns: List[Dict] = []
+        self.rows = 0
+        self._files: Dict[str, object] = {}
+        self.schema: Optional[pa.Schema] = None
+        self._sink: Optional[pa.OSFile] = None
+        self._batches: Optional[pa.ipc.RecordBatchFileWriter] = None
+
+        self.tmp_dir.mkdir(parents=True)
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def attach(self, name: str):
+        """Binary file stored inside the table (e.g. a side report); published or discarded with it."""
+        if name not in self._files:
+            self._files[name] = open(self.tmp_dir / name, "wb")
+        return self._files[name]
+
+    def _init_columns(self, chunk: pd.DataFrame) -> None:
+        missing = [c for c in self.matrix_columns if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"Matrix columns not in data: {', '.join(missing)}")
+        for name in chunk.columns:
+            if name in self.matrix_columns and self.specs is not None:
+                spec = self.specs[name]
+                self.columns.append({"name": name, "kind": "compact", "dtype": spec.dtype.str, "scale": spec.scale})
+                continue
+            if name in self.matrix_columns:
+                kind, dtype = "matrix", self.matrix_dtype.str
+            elif pd.api.types.is_numeric_dtype(chunk[name].dtype) and not pd.api.types.is_bool_dtype(chunk[name].dtype):
+                kind, dtype = "numeric", np.dtype(chunk[name].dtype).str
+            else:
+                kind, dtype = "string", "utf8"
+            self.columns.append({"name": name, "kind": kind, "dtype": dtype})
+        self._open_data()
+
+    def _open_data(self) -> None:
+        self.schema = pa.schema([
+            (c["name"], pa.string() if c["kind"] == "string" else pa.from_numpy_dtype(np.dtype(c["dtype"])))
+            for c in self.columns
+        ])
+        self._sink = pa.OSFile(str(self.tmp_dir / DATA_FILE), "wb")
+        self._batches = pa.ipc.new_file(self._sink, self.schema)
+
+    def _widen(self, specs: Dict[str, CriterionSpec]) -> None:
+        """Switch compact columns to wider specs, re-encoding the batches written so far."""
+        old_scales = {name: self.specs[name].scale for name in specs}
+        self.specs.update(specs)
+        for col in self.columns:
+            if col["name"] in specs:
+                col.update(dtype=specs[col["name"]].dtype.str, scale=specs[col["name"]].scale)
+        self._close_data()
+        previous = temp_path(self.tmp_dir / DATA_FILE)
+        os.replace(self.tmp_dir / DATA_FILE, previous)
+        self._open_data()
+        with pa.memory_map(str(previous)) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                arrays = [
+                    pa.array(specs[name].encode(batch.column(name).to_numpy() / old_scales[name]), type=self.schema.field(name).type)
+                    if name in specs else batch.column(name)
+                    for name in self.schema.names
+                ]
+                self._batches.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        previous.unlink()
+
+    def append(self, chunk: pd.DataFrame) -> None:
+        """Append one chunk as a record batch; every chunk must have the same columns."""
+        if not self.columns:
+            self._init_columns(chunk)
+        elif list(chunk.columns) != [c["name"] for c in self.columns]:
+            raise ValueError("Chunk columns differ from the first chunk")
+
+        codes: Dict[str, np.ndarray] = {}
+        if self.specs is not None:
+            numbers = {name: chunk[name].to_numpy(dtype=np.float64) for name in self.matrix_columns}
+            wider = {name: self.specs[name].widened(v) for name, v in numbers.items()}
+            wider = {name: spec for name, spec in wider.items() if spec != self.specs[name]}
+            if wider:
+                self._widen(wider)
+            codes = {name: self.specs[name].encode(v) for name, v in numbers.items()}
+
+        arrays = []
+        for col in self.columns:
+            name = col["name"]
+            if col["kind"] == "compact":
+                values = codes[name]
+            elif col["kind"] == "string":
+                values = [str(v) for v in chunk[name].tolist()]
+            else:
+                values = chunk[name].to_numpy(dtype=np.dtype(col["dtype"]))
+            arrays.append(pa.array(values, type=self.schema.field(name).type))
+        self._batches.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows += len(chunk)
+
+    def _close_data(self) -> None:
+        if self._batches is not None:
+            self._batches.close()
+            self._batches = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def _close_files(self) -> None:
+        self._close_data()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def close(self) -> "ColumnarTable":
+        """Write metadata and move the finished table into place."""
+        if not self.columns:  # nothing appended: an empty table without columns
+            with pa.OSFile(str(self.tmp_dir / DATA_FILE), "wb") as sink:
+                pa.ipc.new_file(sink, pa.schema([])).close()
+        self._close_files()
+        meta = {
+            "version": FORMAT_VERSION,
+            "rows": self.rows,
+            "columns": self.columns,
+            "matrix_columns": self.matrix_columns,
+            "matrix_layout": "compact" if self.specs is not None else "dense",
+            "extra": self.extra,
+        }
+        with open(self.tmp_dir / META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        if not self.replace and is_fresh(self.table_dir):
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            return ColumnarTable(self.table_dir)
+        old_dir = temp_path(self.table_dir).with_suffix(".old")
+        try:
+            os.replace(self.table_dir, old_dir)
+        except FileNotFoundError:
+            pass
+        try:
+            os.replace(self.tmp_dir, self.table_dir)
+        except OSError:
+            if self.replace or not is_fresh(self.table_dir):
+                raise
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)  # another writer published it first
+        shutil.rmtree(old_dir, ignore_errors=True)
+        return ColumnarTable(self.table_dir)
+
+    def abort(self) -> None:
+        """Discard the partially written table."""
+        self._close_files()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+def write_table(
+    table_dir: Path,
+    df: pd.DataFrame,
+    matrix_columns: Sequence[str] = (),
+    extra: Optional[Dict] = None,
+    matrix_specs: Optional[Sequence[CriterionSpec]] = None,
+    replace: bool = True,
+) -> "ColumnarTable":
+    """Write a whole DataFrame as a columnar table (extra is stored in meta.json)."""
+    with ColumnarWriter(table_dir, matrix_columns, extra=extra, matrix_specs=matrix_specs, replace=replace) as writer:
+        writer.append(df)
+    return ColumnarTable(table_dir)
+
+# ---------- Reader ----------
+
+class ColumnarTable:
+    """Read-only view of a columnar table over the memory-mapped Arrow file."""
+
+    def __init__(self, table_dir: Path):
+        self.table_dir = Path(table_dir)
+        with open(self.table_dir / META_FILE, encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.rows: int = self.meta["rows"]
+        self.matrix_columns: List[str] = self.meta["matrix_columns"]
+        self._columns = {c["name"]: c for c in self.meta["columns"]}
+        self.extra: Dict = self.meta.get("extra", {})
+        self._data: Optional[pa.Table] = None
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @property
+    def columns(self) -> List[str]:
+        return [c["name"] for c in self.meta["columns"]]
+
+    @property
+    def data(self) -> pa.Table:
+        """
+        The Arrow table, memory-mapped on first use (buffers stay on disk).
+        The file handle is closed right away; the mapping lives as long as
+        arrays read from it do.
+        """
+        if self._data is None:
+            with pa.memory_map(str(self.table_dir / DATA_FILE)) as source:
+                self._data = pa.ipc.open_file(source).read_all()
+        return self._data
+
+    def _array(self, name: str) -> np.ndarray:
+        """A whole numeric column as stored: a read-only view of the map when it is one batch."""
+        if name not in self._arrays:
+            chunks = self.data.column(name).chunks
+            if len(chunks) == 1:
+                self._arrays[name] = chunks[0].to_numpy(zero_copy_only=True)
+            else:
+                self._arrays[name] = np.concatenate(
+                    [c.to_numpy(zero_copy_only=True) for c in chunks]
+                    or [np.empty(0, dtype=self._columns[name]["dtype"])]
+                )
+        return self._arrays[name]
+
+    @property
+    def is_compact(self) -> bool:
+        return self.meta.get("matrix_layout") == "compact"
+
+    @property
+    def matrix(self) -> CompactMatrix:
+        """
+        The matrix columns as a CompactMatrix: integer codes for compact
+        tables, float64 columns (scale 1) otherwise; either way decoded one
+        row block at a time.
+        """
+        if self.is_compact:
+            return self.compact_matrix()
+        return self.compact_matrix(np.float64)
+
+    def compact_matrix(self, dtype=SCORING_DTYPE, columns: Optional[Sequence[str]] = None) -> CompactMatrix:
+        """The stored matrix columns (or a subset), decoded per block into dtype."""
+        names = self.matrix_columns if columns is None else list(columns)
+        return CompactMatrix([self._array(n) for n in names], [self._columns[n].get("scale", 1) for n in names], dtype)
+
+    def _decode(self, name: str, values: np.ndarray) -> np.ndarray:
+        scale = self._columns[name].get("scale", 1)
+        return values if scale == 1 else values / scale
+
+    def column(self, name: str, rows: Optional[slice] = None) -> np.ndarray:
+        """One column (optionally a row slice): in place if numeric, decoded objects for strings."""
+        rows = rows if rows is not None else slice(None)
+        if self._columns[name]["kind"] != "string":
+            return self._decode(name, self._array(name)[rows])
+        start, stop, _ = rows.indices(self.rows)
+        return self.data.column(name).slice(start, max(stop - start, 0)).to_numpy()
+
+    def take(self, name: str, indices: np.ndarray) -> np.ndarray:
+        """One column at arbitrary row indices (e.g. a ranking order), read through the map."""
+        indices = np.asarray(indices, dtype=np.int64)
+        if self._columns[name]["kind"] != "string":
+            return self._decode(name, self._array(name)[indices])
+        return self.data.column(name).take(pa.array(indices)).to_numpy()
+
+    def to_frame(self, columns: Optional[Iterable[str]] = None, rows: Optional[slice] = None) -> pd.DataFrame:
+        """Materialize the table (or a subset of columns / a row slice) as a DataFrame."""
+        columns = self.columns if columns is None else list(columns)
+        return pd.DataFrame({name: np.asarray(self.column(name, rows)) for name in columns}, columns=columns)
+
+def open_table(table_dir: Path) -> ColumnarTable:
+    """Open an existing columnar table."""
+    return ColumnarTable(table_dir)
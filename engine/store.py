@@ -0,0 +1,256 @@
+# engine/store.py
+"""
+Embedded SQLite store of scoring runs: metadata plus per-applicant scores and ranks.
+
+Flow:
+1. record_run() writes one row per run (dataset hash, criteria, weights,
+   methods, row count, time; cost criteria and normalization are part of the
+   run's identity) and one row per (applicant, method) with its
+   score and rank, BORDA included, in bulk (executemany in one transaction).
+   A run whose dataset, weights and methods are already stored is not
+   written again.
+2. The results table is keyed (run, applicant, method) WITHOUT ROWID, so
+   "where did applicant X rank in run Y" is a single primary-key lookup;
+   secondary indexes on (run, method, rank) and (applicant, run) serve
+   rank ranges / top-k and an applicant's history across runs.
+3. diff() joins two runs of one method on the key and reports each
+   applicant's rank change (plus applicants present in only one run)
+   without reading any CSV.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from itertools import repeat
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.cache import cache_key
+from engine.kernels import ScoringScheme
+from engine.ranking import BORDA, rank_desc
+
+# ---------- Constants ----------
+INSERT_BATCH_ROWS = 100_000
+BUSY_TIMEOUT_SECONDS = 120  # parallel runner workers wait for each other's bulk inserts
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_key TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL,
+    label TEXT,
+    dataset_key TEXT NOT NULL,
+    criteria TEXT NOT NULL,
+    weights TEXT NOT NULL,
+    methods TEXT NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    applicant_id TEXT NOT NULL,
+    method TEXT NOT NULL,
+    score REAL,
+    rank REAL,
+    PRIMARY KEY (run_id, applicant_id, method)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_by_rank ON results (run_id, method, rank);
+CREATE INDEX IF NOT EXISTS results_by_applicant ON results (applicant_id, run_id);
+"""
+
+# ---------- Helper Functions ----------
+
+def run_key(
+    dataset_key: str,
+    criteria: Sequence[str],
+    weights: Sequence[float],
+    methods: Sequence[str],
+    scheme: Optional[ScoringScheme] = None,
+) -> str:
+    """Identity of a run: the same dataset, weights, methods and scheme always give the same results."""
+    scheme_key = scheme.key() if scheme is not None else []
+    return cache_key("run", dataset_key, list(criteria), [float(w) for w in weights], list(methods), *scheme_key)
+
+def _result_rows(run_id: int, ids: np.ndarray, method: str, scores: np.ndarray, ranks: np.ndarray) -> Iterator[tuple]:
+    # NaN becomes NULL in SQLite
+    return zip(repeat(run_id), ids.tolist(), repeat(method), scores.tolist(), ranks.tolist())
+
+# ---------- Store ----------
+
+class ResultStore:
+    """Scoring runs and their per-applicant results in one SQLite file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """This thread's connection (opened once), inside a transaction that commits on success."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        with conn:
+            yield conn
+
+    def close(self) -> None:
+        """Close this thread's connection (others close when their thread ends)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---------- Writing ----------
+
+    def record_run(
+        self,
+        run,
+        dataset_key: str,
+        criteria: Sequence[str],
+        weights: Sequence[float],
+        methods: Optional[Sequence[str]] = None,
+        label: Optional[str] = None,
+        with_borda: bool = True,
+        scheme: Optional[ScoringScheme] = None,
+    ) -> int:
+        """
+        Store a ScoringRun's scores and ranks (plus BORDA for several methods).
+
+        Returns the run id; an identical run already in the store is reused.
+        Runs under a non-default scheme are keyed apart from the default one.
+        """
+        methods = run.methods if methods is None else list(methods)
+        key = run_key(dataset_key, criteria, weights, methods, scheme)
+        with self._connect() as conn:
+            found = conn.execute("SELECT run_id FROM runs WHERE run_key = ?", (key,)).fetchone()
+            if found is not None:
+                return found[0]
+            run_id = conn.execute(
+                "INSERT INTO runs (run_key, created_at, label, dataset_key, criteria, weights, methods, rows) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key, time.time(), label, dataset_key, json.dumps(list(criteria)),
+                    json.dumps([float(w) for w in weights]), json.dumps(list(methods)), len(run.ids),
+                ),
+            ).lastrowid
+
+            ids = np.asarray(run.ids, dtype=object).astype(str)
+            columns = [(m, run.scores[m], run.rank(m)) for m in methods]
+            if with_borda and len(methods) > 1:
+                borda = run.borda(methods)
+                columns.append((BORDA, borda, rank_desc(borda)))
+            insert = "INSERT INTO results (run_id, applicant_id, method, score, rank) VALUES (?, ?, ?, ?, ?)"
+            for start in range(0, len(ids), INSERT_BATCH_ROWS):
+                block = slice(start, start + INSERT_BATCH_ROWS)
+                for method, scores, ranks in columns:
+                    conn.executemany(insert, _result_rows(run_id, ids[block], method, scores[block], ranks[block]))
+        return run_id
+
+    def delete_run(self, run_id: int) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+    # ---------- Queries ----------
+
+    def runs(self) -> pd.DataFrame:
+        """Run history, newest first."""
+        with self._connect() as conn:
+            df = pd.read_sql_query(
+                "SELECT run_id, created_at, label, dataset_key, criteria, weights, methods, rows "
+                "FROM runs ORDER BY run_id DESC",
+                conn,
+            )
+        df["created_at"] = pd.to_datetime(df["created_at"], unit="s")
+        for col in ("criteria", "weights", "methods"):
+            df[col] = df[col].map(json.loads)
+        return df
+
+    def rank_of(self, run_id: int, applicant_id: str, method: str) -> Optional[Tuple[float, float]]:
+        """(score, rank) of one applicant for one method in one run, or None (primary-key lookup)."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT score, rank FROM results WHERE run_id = ? AND applicant_id = ? AND method = ?",
+                (run_id, str(applicant_id), method),
+            ).fetchone()
+
+    def lookup(self, run_id: int, applicant_id: str) -> pd.DataFrame:
+        """Score and rank of one applicant in one run, per method (primary-key lookup)."""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT method, score, rank FROM results WHERE run_id = ? AND applicant_id = ?",
+                conn,
+                params=(run_id, str(applicant_id)),
+            )
+
+    def history(self, applicant_id: str, method: Optional[str] = None) -> pd.DataFrame:
+        """One applicant's scores and ranks across every stored run."""
+        query = (
+            "SELECT r.run_id, runs.created_at, runs.label, r.method, r.score, r.rank "
+            "FROM results r JOIN runs USING (run_id) WHERE r.applicant_id = ?"
+        )
+        params: Tuple = (str(applicant_id),)
+        if method is not None:
+            query += " AND r.method = ?"
+            params += (method,)
+        with self._connect() as conn:
+            df = pd.read_sql_query(query + " ORDER BY r.run_id, r.method", conn, params=params)
+        df["created_at"] = pd.to_datetime(df["created_at"], unit="s")
+        return df
+
+    def rank_range(self, run_id: int, method: str, first: int, last: int) -> pd.DataFrame:
+        """Applicants ranked first..last (inclusive) for one method, best first."""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT applicant_id AS ID, score, rank FROM results "
+                "WHERE run_id = ? AND method = ? AND rank BETWEEN ? AND ? ORDER BY rank, applicant_id",
+                conn,
+                params=(run_id, method, first, last),
+            )
+
+    def diff(self, run_a: int, run_b: int, method: str, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Rank change of every applicant between two runs for one method.
+
+        Sorted by the largest absolute change; applicants in only one run have
+        a missing rank on the other side and sort last.
+        """
+        query = """
+            SELECT * FROM (
+            SELECT a.applicant_id AS ID, a.rank AS rank_a, b.rank AS rank_b, b.rank - a.rank AS change
+            FROM results a LEFT JOIN results b
+              ON b.run_id = :b AND b.applicant_id = a.applicant_id AND b.method = a.method
+            WHERE a.run_id = :a AND a.method = :m
+            UNION ALL
+            SELECT b.applicant_id, NULL, b.rank, NULL
+            FROM results b
+            WHERE b.run_id = :b AND b.method = :m AND NOT EXISTS (
+                SELECT 1 FROM results a WHERE a.run_id = :a AND a.applicant_id = b.applicant_id AND a.method = :m
+            ))
+            ORDER BY change IS NULL, ABS(change) DESC, ID
+        """
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with self._connect() as conn:
+            return pd.read_sql_query(query, conn, params={"a": run_a, "b": run_b, "m": method})
+
+    def methods(self, run_id: int) -> List[str]:
+        """Methods stored for a run (BORDA included when it was recorded)."""
+        with self._connect() as conn:
+            found = conn.execute("SELECT methods FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            has_borda = conn.execute(
+                "SELECT 1 FROM results WHERE run_id = ? AND method = ? LIMIT 1", (run_id, BORDA)
+            ).fetchone()
+        if found is None:
+            return []
+        return json.loads(found[0]) + ([BORDA] if has_borda else [])
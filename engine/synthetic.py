@@ -0,0 +1,120 @@
+# engine/synthetic.py
+"""
+Synthetic applicant datasets for load testing and benchmarks.
+
+Flow:
+1. Draw every criterion from a distribution shaped like the real samples in
+   data/input/ (GPA around 3.3, small counts for certificates and events,
+   log-normal parent income, 1-to-5 letter and interview scores, ...).
+2. Format parent income as the raw IDR values applicants submit: plain
+   numbers or strings with separators ("Rp 8.000.000", "8,000,000",
+   "Rp 8.000.000,00"), so preprocessing has to parse them.
+3. Optionally add extra 1-to-5 criteria (C11_Extra, ...) to test wider
+   criteria matrices.
+4. write_applicants_csv() writes millions of rows chunk by chunk with
+   independent random streams per chunk, so memory stays flat.
+"""
+
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from engine.schema import CRITERIA_COLUMNS, ID_COLUMN, INCOME_COLUMN
+
+# ---------- Constants ----------
+DEFAULT_CHUNK_ROWS = 500_000
+INCOME_FORMATS = ("plain", "mixed")
+
+# Share of formatted income strings in "mixed" mode, per style
+_INCOME_STYLES = (
+    ("plain", 0.55),          # 8000000
+    ("rupiah_dots", 0.25),    # Rp 8.000.000
+    ("commas", 0.15),         # 8,000,000
+    ("rupiah_cents", 0.05),   # Rp 8.000.000,00
+)
+
+# ---------- Helper Functions ----------
+
+def criteria_columns(n_criteria: int = len(CRITERIA_COLUMNS)) -> List[str]:
+    """The schema criteria, followed by C11_Extra, C12_Extra, ... when n_criteria > 10."""
+    if n_criteria < len(CRITERIA_COLUMNS):
+        raise ValueError(f"n_criteria must be at least {len(CRITERIA_COLUMNS)}")
+    extra = [f"C{i}_Extra" for i in range(len(CRITERIA_COLUMNS) + 1, n_criteria + 1)]
+    return CRITERIA_COLUMNS + extra
+
+def _format_income(income: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Render integer IDR amounts in a mix of the styles applicants use."""
+    styles = rng.choice(len(_INCOME_STYLES), size=len(income), p=[p for _, p in _INCOME_STYLES])
+    out = income.astype(str).astype(object)
+    formatted = styles > 0
+    if formatted.any():
+        commas = pd.Series(income[formatted]).map("{:,}".format).to_numpy(dtype=object)
+        dots = np.char.replace(commas.astype(str), ",", ".").astype(object)
+        chosen = styles[formatted]
+        rendered = np.where(chosen == 2, commas, "Rp " + dots)
+        rendered = np.where(chosen == 3, rendered + ",00", rendered)
+        out[formatted] = rendered
+    return out
+
+# ---------- Generators ----------
+
+def generate_applicants(
+    n_rows: int,
+    n_criteria: int = len(CRITERIA_COLUMNS),
+    income_format: str = "mixed",
+    seed: Optional[int] = None,
+    first_id: int = 1,
+) -> pd.DataFrame:
+    """
+    Random applicants following EXPECTED_COLUMNS (plus extra criteria if asked).
+
+    IDs are S0000001, S0000002, ... starting at first_id, so chunks generated
+    separately concatenate into one consistent dataset.
+    """
+    if income_format not in INCOME_FORMATS:
+        raise ValueError(f"income_format must be one of {', '.join(INCOME_FORMATS)}")
+    rng = np.random.default_rng(seed)
+    n = int(n_rows)
+
+    income = np.round(rng.lognormal(mean=np.log(8_000_000), sigma=0.6, size=n) / 50_000) * 50_000
+    income = np.clip(income, 500_000, 200_000_000).astype(np.int64)
+
+    data = {
+        ID_COLUMN: np.char.add("S", np.char.zfill(np.arange(first_id, first_id + n).astype(str), 7)),
+        "C1_GPA": np.round(np.clip(rng.normal(3.3, 0.35, n), 2.0, 4.0), 2),
+        "C2_Certificates": np.clip(rng.poisson(3.0, n), 0, 12),
+        INCOME_COLUMN: _format_income(income, rng) if income_format == "mixed" else income,
+        "C4_Dependents": np.clip(rng.poisson(2.5, n), 1, 8),
+        "C5_OrgScore": rng.integers(1, 4, n),
+        "C6_VolunteerEvents": np.clip(rng.poisson(4.0, n), 0, 15),
+        "C7_LetterScore": rng.integers(1, 6, n),
+        "C8_InterviewScore": rng.integers(1, 6, n),
+        "C9_DocComplete": 1 + (rng.random(n) < 0.8),
+        "C10_OnTime": 1 + (rng.random(n) < 0.85),
+    }
+    for name in criteria_columns(n_criteria)[len(CRITERIA_COLUMNS):]:
+        data[name] = rng.integers(1, 6, n)
+    return pd.DataFrame(data)
+
+def write_applicants_csv(
+    path: Path,
+    n_rows: int,
+    n_criteria: int = len(CRITERIA_COLUMNS),
+    income_format: str = "mixed",
+    seed: Optional[int] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Path:
+    """Write a synthetic applicant CSV chunk by chunk (each chunk has its own random stream)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    n_chunks = max(1, -(-int(n_rows) // chunk_rows))
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for i, chunk_seed in enumerate(seeds):
+            start = i * chunk_rows
+            rows = min(chunk_rows, int(n_rows) - start)
+            chunk = generate_applicants(rows, n_criteria, income_format, chunk_seed, first_id=start + 1)
+            chunk.to_csv(f, index=False, header=i == 0)
+    return path
@@ -0,0 +1,248 @@
+# engine/validation.py
+"""
+Declarative, vectorized validation of applicant rows.
+
+Flow:
+1. The schema is a tuple of ColumnRule: what a column holds (an ID, a number
+   or a money amount), whether it is required, its allowed range and
+   decimals, and whether values must be unique. DEFAULT_RULES requires every
+   criterion to be non-negative and the GPA to lie on its 0–4 scale (the
+   compact storage ranges in engine.compact are only storage hints, not
+   limits); banded criteria (the parent income) are checked as raw money
+   amounts, since they are validated before banding.
+2. RowValidator checks a whole chunk per rule with array operations (no
+   Python loop over rows): missing values, non-numeric values, values out of
+   range or with too many decimals, and duplicate IDs, including duplicates
+   of IDs seen in earlier chunks (kept as one sorted array of the encoded
+   IDs, so matches are exact). Only rows that pass every check register
+   their ID: a row quarantined for another problem does not make a later,
+   corrected row with the same ID a duplicate.
+3. The result lists every problem at once: the invalid row positions
+   (ValidationResult.invalid) and one line per (row, column, problem) in
+   ValidationResult.errors, so ingestion can reject the file with a full
+   report or quarantine just the invalid rows (engine.ingest).
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from engine.preprocess import DEFAULT_BANDS, coerce_numeric
+from engine.schema import CRITERIA_COLUMNS, ID_COLUMN
+
+# ---------- Constants ----------
+ID, NUMBER, MONEY = "id", "number", "money"
+
+MISSING = "missing"
+NOT_NUMERIC = "not numeric"
+OUT_OF_RANGE = "out of range"
+TOO_MANY_DECIMALS = "too many decimals"
+DUPLICATE_ID = "duplicate ID"
+
+ERROR_COLUMNS = ["Row", ID_COLUMN, "Column", "Error", "Message", "Value"]
+SUMMARY_ERRORS = 5  # problems quoted in an error message
+CRITERION_BOUNDS = {"C1_GPA": (0.0, 4.0)}  # (low, high); other criteria: non-negative
+
+# ---------- Rules ----------
+
+@dataclass(frozen=True)
+class ColumnRule:
+    """What one column must hold; low/high/decimals apply to number and money columns."""
+
+    column: str
+    kind: str = NUMBER
+    low: Optional[float] = None
+    high: Optional[float] = None
+    decimals: Optional[int] = None
+    required: bool = True
+    unique: bool = False
+
+    def __post_init__(self):
+        if self.kind not in (ID, NUMBER, MONEY):
+            raise ValueError(f"{self.column}: unknown kind {self.kind!r}")
+        if self.low is not None and self.high is not None and self.high < self.low:
+            raise ValueError(f"{self.column}: high must not be below low")
+
+    def describe(self, error: str) -> str:
+        if error == OUT_OF_RANGE:
+            low = "-∞" if self.low is None else f"{self.low:g}"
+            high = "∞" if self.high is None else f"{self.high:g}"
+            return f"{self.column} {error} ({low} to {high})"
+        if error == TOO_MANY_DECIMALS:
+            return f"{self.column} {error} (at most {self.decimals})"
+        return f"{self.column} {error}"
+
+def default_rules() -> tuple:
+    """ID rule plus one rule per criterion, bounded by CRITERION_BOUNDS."""
+    banded = {band.column for band in DEFAULT_BANDS}
+    rules = [ColumnRule(ID_COLUMN, kind=ID, unique=True)]
+    for column in CRITERIA_COLUMNS:
+        if column in banded:
+            rules.append(ColumnRule(column, kind=MONEY, low=0))
+        else:
+            low, high = CRITERION_BOUNDS.get(column, (0, None))
+            rules.append(ColumnRule(column, low=low, high=high))
+    return tuple(rules)
+
+DEFAULT_RULES = default_rules()
+
+# ---------- Results ----------
+
+@dataclass
+class ValidationResult:
+    """Problems found in one chunk (row numbers are 1-based data rows of the whole file)."""
+
+    invalid: np.ndarray  # positions of invalid rows within the chunk
+    errors: pd.DataFrame  # one line per problem, columns ERROR_COLUMNS
+    rows: int = 0
+
+    @property
+    def valid_mask(self) -> np.ndarray:
+        mask = np.ones(self.rows, dtype=bool)
+        mask[self.invalid] = False
+        return mask
+
+    def row_messages(self) -> pd.Series:
+        """All problems of each invalid row joined into one message, in row order."""
+        return self.errors.groupby("Row", sort=True)["Message"].agg("; ".join)
+
+    def summary(self) -> str:
+        return summarize_errors(len(self.invalid), self.errors)
+
+def summarize_errors(invalid_rows: int, errors: pd.DataFrame) -> str:
+    """One-line report: how many rows are invalid and the first few problems."""
+    head = errors.head(SUMMARY_ERRORS)
+    quoted = "; ".join(f"row {row}: {message} ({value})" for row, message, value in zip(head["Row"], head["Message"], head["Value"]))
+    more = f"; … {len(errors) - len(head):,} more" if len(errors) > len(head) else ""
+    return f"{invalid_rows:,} invalid row{'s' if invalid_rows != 1 else ''}: {quoted}{more}"
+
+# ---------- Validator ----------
+
+def _id_keys(values: pd.Series) -> np.ndarray:
+    """IDs as a fixed-width bytes array (UTF-8), compared and sorted exactly."""
+    text = values.astype(str).to_numpy(dtype=str)
+    try:
+        return text.astype(np.bytes_)  # ASCII IDs: a plain cast
+    except UnicodeEncodeError:
+        return np.char.encode(text, "utf-8")
+
+class RowValidator:
+    """
+    Check chunks of one file against a set of rules.
+
+    Keep one validator per file: uniqueness is checked across every chunk
+    it has seen.
+    """
+
+    def __init__(self, rules: Sequence[ColumnRule] = DEFAULT_RULES):
+        self.rules = tuple(rules)
+        self._seen = {rule.column: np.empty(0, dtype="S1") for rule in self.rules if rule.unique}
+
+    def check(self, chunk: pd.DataFrame, first_row: int) -> ValidationResult:
+        """Validate every rule column present in the chunk (missing columns are the caller's check)."""
+        parts: List[pd.DataFrame] = []
+        unique_rules = []  # (rule, where its duplicate problems go in parts, missing mask)
+        for rule in self.rules:
+            if rule.column not in chunk.columns:
+                continue
+            for error, mask in self._problems(rule, chunk[rule.column]):
+                parts.extend(self._part(rule, chunk, error, mask))
+            if rule.unique:
+                unique_rules.append((rule, len(parts), self._missing(rule, chunk[rule.column])))
+
+        # Duplicates last: an ID counts once its row passes every other check
+        other_invalid = np.zeros(len(chunk), dtype=bool)
+        for part in parts:
+            other_invalid[part["Position"].to_numpy()] = True
+        for rule, at, missing in reversed(unique_rules):
+            duplicate = self._duplicates(rule.column, chunk[rule.column], missing, other_invalid)
+            parts[at:at] = self._part(rule, chunk, DUPLICATE_ID, duplicate)
+
+        if not parts:
+            return ValidationResult(np.empty(0, dtype=np.intp), pd.DataFrame(columns=ERROR_COLUMNS), len(chunk))
+        errors = pd.concat(parts, ignore_index=True).sort_values("Position", kind="stable")
+        positions = errors.pop("Position").to_numpy()
+        errors.insert(0, "Row", first_row + positions + 1)
+        ids = chunk[ID_COLUMN].to_numpy() if ID_COLUMN in chunk.columns else np.full(len(chunk), None)
+        errors.insert(1, ID_COLUMN, ids[positions])
+        return ValidationResult(np.unique(positions), errors.reset_index(drop=True), len(chunk))
+
+    @staticmethod
+    def _part(rule: ColumnRule, chunk: pd.DataFrame, error: str, mask: np.ndarray) -> List[pd.DataFrame]:
+        """The problem lines of one (column, error) mask (none if no row has it)."""
+        positions = np.flatnonzero(mask)
+        if not len(positions):
+            return []
+        return [pd.DataFrame({
+            "Position": positions,
+            "Column": rule.column,
+            "Error": error,
+            "Message": rule.describe(error),
+            "Value": chunk[rule.column].to_numpy()[positions],
+        })]
+
+    @staticmethod
+    def _missing(rule: ColumnRule, series: pd.Series) -> np.ndarray:
+        missing = series.isna().to_numpy()
+        if rule.kind == ID:
+            missing = missing | (series.astype(str).str.strip() == "").to_numpy()
+        return missing
+
+    def _problems(self, rule: ColumnRule, series: pd.Series):
+        """(error, row mask) pairs for one column (duplicate IDs are checked afterwards, in check)."""
+        missing = self._missing(rule, series)
+        if rule.required:
+            yield MISSING, missing
+        if rule.kind == ID:
+            return
+
+        if rule.kind == MONEY:
+            values = coerce_numeric(series)
+        else:
+            values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64)
+        parsed = ~np.isnan(values)
+        yield NOT_NUMERIC, ~missing & ~parsed
+
+        with np.errstate(invalid="ignore"):
+            out = np.zeros(len(values), dtype=bool)
+            if rule.low is not None:
+                out |= values < rule.low
+            if rule.high is not None:
+                out |= values > rule.high
+            yield OUT_OF_RANGE, out
+            if rule.decimals is not None:
+                scaled = values * 10 ** rule.decimals
+                yield TOO_MANY_DECIMALS, parsed & ~out & (np.abs(np.rint(scaled) - scaled) > 1e-6)
+
+    def _duplicates(self, column: str, series: pd.Series, missing: np.ndarray, other_invalid: np.ndarray) -> np.ndarray:
+        """
+        Rows whose ID already belongs to a passing row: one in an earlier
+        chunk, or an earlier row of this chunk with no other problem.
+
+        Seen IDs are kept as one sorted bytes array: a chunk is looked up
+        with a binary search, and the IDs of the rows that pass are merged
+        in (a stable sort of two sorted runs is a linear merge).
+        """
+        keys = _id_keys(series)
+        duplicate = np.zeros(len(keys), dtype=bool)
+        seen = self._seen[column]
+        if len(seen):
+            found = np.minimum(np.searchsorted(seen, keys), len(seen) - 1)
+            duplicate |= seen[found] == keys
+
+        # First passing occurrence of each ID in the chunk; any later row with that ID repeats it
+        positions = np.arange(len(keys))
+        passing = ~missing & ~other_invalid & ~duplicate
+        first = pd.Series(positions[passing], index=keys[passing])
+        first = first[~first.index.duplicated()]
+        first_at = first.reindex(keys).to_numpy(dtype=np.float64)
+        duplicate |= first_at < positions
+        duplicate &= ~missing
+
+        new = keys[passing & ~duplicate]
+        merged = np.concatenate((seen, new))
+        merged.sort(kind="stable")
+        self._seen[column] = merged
+        return duplicate
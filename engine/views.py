@@ -0,0 +1,125 @@
+# engine/views.py
+"""
+Server-side paging, filtering and lazy CSV export of large result tables.
+
+Flow:
+1. A ResultView holds a result in display order: the dataset row shown at
+   each position (order) and, optionally, its rank; no DataFrame is built.
+2. select() filters positions by an ID substring and/or a rank range
+   (vectorized over the whole result, once per distinct filter).
+3. page_positions() cuts one page out of the selection; the caller builds a
+   DataFrame for just those rows, so the browser only ever receives a page.
+4. csv_file() encodes a selection chunk by chunk (one chunk-sized
+   DataFrame at a time) into an anonymous temporary file; the tabs hand it
+   to the download button as a callable, so it runs only when a download
+   is actually requested. Streamlit serves a download from one bytes
+   object, so the finished CSV is still read into memory once when it is
+   served; csv_chunks() is the streaming form for callers that can stream.
+"""
+
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine.ranking import rank_desc, top_k
+
+# ---------- Constants ----------
+DEFAULT_PAGE_SIZE = 50
+PAGE_SIZES = (25, 50, 100, 250, 500)
+CSV_CHUNK_ROWS = 100_000
+
+# ---------- Paging ----------
+
+def page_count(total: int, page_size: int) -> int:
+    """Number of pages for total rows (at least 1, so an empty result still has a page)."""
+    return max(1, -(-int(total) // max(1, int(page_size))))
+
+def page_positions(selection: np.ndarray, page: int, page_size: int) -> np.ndarray:
+    """Entries of selection on a 1-based page (clamped to the last page)."""
+    page = min(max(1, int(page)), page_count(len(selection), page_size))
+    start = (page - 1) * page_size
+    return selection[start:start + page_size]
+
+def id_mask(ids, query: str) -> np.ndarray:
+    """Case-insensitive literal substring match of query against every ID."""
+    ids = pd.Series(np.asarray(ids, dtype=object))
+    return ids.astype(str).str.contains(query, case=False, regex=False).to_numpy(dtype=bool)
+
+@dataclass
+class ResultView:
+    """A result in display order: order[p] is the dataset row at position p, ranks[p] its rank."""
+
+    order: np.ndarray
+    ranks: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_scores(cls, scores: np.ndarray, k: Optional[int] = None) -> "ResultView":
+        """Ranking of a score vector (higher is better): the top-k shortlist with boundary ties, or everyone."""
+        if k:
+            return cls(*top_k(scores, k))
+        order = np.argsort(-scores, kind="stable")
+        return cls(order, rank_desc(scores)[order])
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    @property
+    def nbytes(self) -> int:
+        return self.order.nbytes + (self.ranks.nbytes if self.ranks is not None else 0)
+
+    def select(self, ids=None, id_query: str = "", rank_range: Optional[Tuple[float, float]] = None) -> np.ndarray:
+        """
+        Display positions matching every given filter, in display order.
+
+        ids is the per-dataset-row ID array, or a callable returning it (only
+        called when id_query is given); rank_range is inclusive and ignored
+        when the view has no ranks.
+        """
+        keep = np.ones(len(self.order), dtype=bool)
+        if id_query and ids is not None:
+            ids = ids() if callable(ids) else ids
+            keep &= id_mask(np.asarray(ids, dtype=object)[self.order], id_query)
+        if rank_range is not None and self.ranks is not None:
+            low, high = rank_range
+            keep &= (self.ranks >= low) & (self.ranks <= high)
+        return np.flatnonzero(keep)
+
+    def rows(self, positions: np.ndarray) -> np.ndarray:
+        """Dataset rows at the given display positions."""
+        return self.order[positions]
+
+# ---------- Lazy Downloads ----------
+
+def csv_chunks(
+    frame_of: Callable[[np.ndarray], pd.DataFrame], positions: np.ndarray, chunk_rows: int = CSV_CHUNK_ROWS
+) -> Iterator[bytes]:
+    """UTF-8 CSV of frame_of(positions) encoded chunk by chunk (header in the first chunk)."""
+    for i, start in enumerate(range(0, max(len(positions), 1), chunk_rows)):
+        chunk = frame_of(positions[start:start + chunk_rows])
+        yield chunk.to_csv(index=False, header=i == 0).encode("utf-8")
+
+def csv_bytes(
+    frame_of: Callable[[np.ndarray], pd.DataFrame], positions: np.ndarray, chunk_rows: int = CSV_CHUNK_ROWS
+) -> bytes:
+    """
+    The whole CSV of frame_of(positions) as one bytes object (held in full;
+    prefer csv_file or csv_chunks for large selections).
+    """
+    return b"".join(csv_chunks(frame_of, positions, chunk_rows))
+
+def csv_file(
+    frame_of: Callable[[np.ndarray], pd.DataFrame], positions: np.ndarray, chunk_rows: int = CSV_CHUNK_ROWS
+) -> BinaryIO:
+    """
+    The CSV of frame_of(positions) spooled to an anonymous temporary file
+    (removed when closed), rewound for reading; only one chunk is in memory
+    while it is written.
+    """
+    out = tempfile.TemporaryFile(buffering=0)  # unbuffered: a raw file object Streamlit can read
+    for chunk in csv_chunks(frame_of, positions, chunk_rows):
+        out.write(chunk)
+    out.seek(0)
+    return out
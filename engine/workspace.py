@@ -0,0 +1,109 @@
+# engine/workspace.py
+"""
+Per-session workspaces and a shared, content-addressed table cache.
+
+Flow:
+1. Every UI session (or batch run) gets its own Workspace directory under
+   WORKSPACE_ROOT (DSS_WORKSPACE_DIR): its custom weights, result tables,
+   BORDA table and corrected datasets live there, so concurrent evaluators
+   never overwrite each other's files.
+2. Inputs that are identical for everyone (a preprocessed upload) go to the
+   shared cache under CACHE_ROOT (DSS_CACHE_DIR), named by the content key
+   of the source and settings. A cached table is written once and then only
+   read; two sessions ingesting the same file race harmlessly, as the second
+   finished copy is dropped (storage.ColumnarWriter(replace=False)).
+3. Every write lands in a uniquely named temporary file or directory and is
+   renamed into place (storage.temp_path / atomic_write_csv), so readers see
+   the old file or the new one, never half of one.
+4. Workspaces untouched for longer than the TTL are removed when new
+   sessions start (cleanup_workspaces).
+
+Both roots may sit on a shared filesystem, so several app servers can serve
+the same users.
+"""
+
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from engine.storage import TABLE_SUFFIX
+
+# ---------- Constants ----------
+BASE_DIR = Path(__file__).parent.parent
+WORKSPACE_ROOT = Path(os.environ.get("DSS_WORKSPACE_DIR", BASE_DIR / "data" / "workspaces"))
+CACHE_ROOT = Path(os.environ.get("DSS_CACHE_DIR", BASE_DIR / "data" / "cache"))
+WORKSPACE_TTL_SECONDS = float(os.environ.get("DSS_WORKSPACE_TTL_HOURS", 24)) * 3600
+
+# ---------- Workspace ----------
+
+@dataclass(frozen=True)
+class Workspace:
+    """Private directory of one session: weights, results and corrected data."""
+
+    root: Path
+
+    @classmethod
+    def create(cls, parent: Path = WORKSPACE_ROOT, name: Optional[str] = None) -> "Workspace":
+        """New (or reopened, when name is given) workspace under parent."""
+        workspace = cls(Path(parent) / (name or uuid.uuid4().hex))
+        for directory in (workspace.result_dir, workspace.weight_dir, workspace.data_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        return workspace
+
+    @property
+    def name(self) -> str:
+        return self.root.name
+
+    @property
+    def result_dir(self) -> Path:
+        return self.root / "result"
+
+    @property
+    def weight_dir(self) -> Path:
+        return self.root / "weight"
+
+    @property
+    def data_dir(self) -> Path:
+        return self.root / "data"
+
+    @property
+    def custom_weight_path(self) -> Path:
+        return self.weight_dir / "weight_custom.csv"
+
+    def result_table(self, method: str) -> Path:
+        """Result table of one method (e.g. saw_result.cols, borda_result.cols)."""
+        return self.result_dir / f"{method.lower()}_result{TABLE_SUFFIX}"
+
+    def touch(self) -> None:
+        """Mark the workspace as in use (cleanup_workspaces goes by this time)."""
+        os.utime(self.root)
+
+# ---------- Shared Cache ----------
+
+def shared_table_dir(key: str, kind: str = "preprocessed", root: Path = CACHE_ROOT) -> Path:
+    """Content-addressed location of a shared, read-only table."""
+    directory = Path(root) / kind
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{key}{TABLE_SUFFIX}"
+
+# ---------- Cleanup ----------
+
+def cleanup_workspaces(parent: Path = WORKSPACE_ROOT, ttl_seconds: float = WORKSPACE_TTL_SECONDS) -> int:
+    """Remove workspaces not touched within ttl_seconds; returns how many were removed."""
+    parent = Path(parent)
+    if not parent.is_dir():
+        return 0
+    cutoff = time.time() - ttl_seconds
+    removed = 0
+    for path in parent.iterdir():
+        try:
+            if path.is_dir() and path.stat().st_mtime < cutoff:
+                shutil.rmtree(path)
+                removed += 1
+        except OSError:
+            continue  # touched or removed by another server meanwhile
+    return removed
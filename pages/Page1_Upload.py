@@ -7,108 +7,120 @@ Flow:
 2. Let the user:
     • pick an existing CSV in data/input/, or
     • upload their own CSV.
-3. Validate schema + NaNs.
-4. Pre-process C3_ParentIncomeIDR → 1-to-5 band score.
-5. Save:
-    • original file (if uploaded) → data/input/
-    • pre-processed file → data/preprocessed/{name}_preprocessed.csv
-6. Store DataFrame in st.session_state.df and preview it.
+3. Stream the CSV in chunks (engine.ingest): validate the schema and every
+   row (engine.validation rules) and pre-process C3_ParentIncomeIDR → 1-to-5
+   band score per chunk. Invalid rows reject the whole file with a full
+   report, or, with the quarantine toggle on, are quarantined (the valid
+   rows go on; the rejected rows and their problems can be downloaded).
+4. Save:
+    • original file (if uploaded) → data/input/ (renamed if another file
+      already has its name)
+    • pre-processed columnar table → shared cache, named by content
+      (engine.workspace): identical files are processed once for everyone
+5. Store the pre-processed path in st.session_state and browse the
+   pre-processed table a page at a time (pages are read from the
+   memory-mapped table; the full dataset never goes to the browser).
 """
 
-import os
 from pathlib import Path
+from typing import Optional
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from engine.cache import fingerprint_file, fingerprint_stream
+from engine.ingest import (
+    QUARANTINE,
+    REJECT,
+    IngestError,
+    IngestReport,
+    cached_report,
+    copy_stream,
+    ingest_csv,
+    source_key,
+)
+from engine.storage import open_table
+from engine.views import ResultView
+from engine.workspace import shared_table_dir
+from utils import csv_download, get_recorder, kept, paged_table, stage
+
 # Directories setup relative to this script
 HERE = Path(__file__).parent
 BASE_DIR = HERE.parent
 
 INPUT_DIR = BASE_DIR / "data" / "input"
-PREPROC_DIR = BASE_DIR / "data" / "preprocessed"
 TEMPLATE_DIR = BASE_DIR / "data" / "template"
 TEMPLATE_PATH = TEMPLATE_DIR / "template.csv"
+ERROR_PREVIEW_ROWS = 200
+
+def show_ingest_error(e: IngestError) -> None:
+    """Error message plus, for row-level problems, a table of them."""
+    st.error(f"❌ {e}")
+    if e.errors is not None and len(e.errors):
+        st.dataframe(e.errors.head(ERROR_PREVIEW_ROWS), use_container_width=True, hide_index=True)
+        if len(e.errors) > ERROR_PREVIEW_ROWS:
+            st.caption(f"First {ERROR_PREVIEW_ROWS} of {len(e.errors):,} problems shown.")
+
+def show_rejected(report: IngestReport) -> None:
+    """Summary and download of the rows quarantined during ingestion."""
+    st.warning(f"⚠️ Invalid rows quarantined: {report.rejected:,} (the other {report.rows:,} rows were kept).")
+    with st.expander("🚫 Quarantined rows"):
+        st.dataframe(pd.read_csv(report.rejected_path, nrows=ERROR_PREVIEW_ROWS), use_container_width=True, hide_index=True)
+        csv_download(
+            "⬇️ Download quarantined rows (CSV)",
+            "rejected_rows.csv",
+            report.rejected_path.read_bytes,
+            report.rejected,
+            key="rejected_download",
+            stage_name="upload.rejected_csv",
+        )
 
-# Ensure required directories exist
-for directory in [INPUT_DIR, PREPROC_DIR, TEMPLATE_DIR]:
-    directory.mkdir(parents=True, exist_ok=True)
-
-# Expected CSV columns
-EXPECTED_COLUMNS = [
-    "ID", "C1_GPA", "C2_Certificates", "C3_ParentIncomeIDR",
-    "C4_Dependents", "C5_OrgScore", "C6_VolunteerEvents",
-    "C7_LetterScore", "C8_InterviewScore", "C9_DocComplete", "C10_OnTime"
-]
-
-def map_income_to_score(idr: float) -> int:
-    """
-    Map Indonesian Rupiah income value to a score band:
-    - <4M   : 4
-    - 4-6M  : 5
-    - 6-10M : 3
-    - 10-20M: 2
-    - >=20M : 1
+def ingest_with_progress(source, table_dir: Path, key: str, on_invalid: str) -> Optional[IngestReport]:
     """
-    if idr < 4_000_000:
-        return 4
-    elif idr < 6_000_000:
-        return 5
-    elif idr < 10_000_000:
-        return 3
-    elif idr < 20_000_000:
-        return 2
-    return 1
-
-def load_dataframe_from_uploaded(uploaded_file) -> pd.DataFrame:
-    """Load CSV from uploaded file object."""
-    try:
-        return pd.read_csv(uploaded_file)
-    except Exception as e:
-        st.error(f"❌ Unable to read uploaded file: {e}")
-        return None
+    Stream-ingest a CSV and show progress; returns None after showing the error.
 
-def load_dataframe_from_file(filepath: Path) -> pd.DataFrame:
-    """Load CSV from file path."""
+    If the table was already built from the same source content and band
+    settings, it is reused instead of being preprocessed and written again.
+    """
+    progress = st.empty()
     try:
-        return pd.read_csv(filepath)
-    except Exception as e:
-        st.error(f"❌ Unable to read file {filepath.name}: {e}")
+        report = cached_report(table_dir, key, on_invalid)
+        if report is None:
+            report = ingest_csv(
+                source,
+                table_dir=table_dir,
+                on_chunk=lambda rows: progress.caption(f"⏳ Processed {rows:,} rows..."),
+                extra={"source_key": key},
+                recorder=get_recorder(),
+                replace=False,  # shared cache entry: identical content, first writer wins
+                on_invalid=on_invalid,
+            )
+    except IngestError as e:
+        show_ingest_error(e)
         return None
+    finally:
+        progress.empty()
+    return report
 
-def validate_dataframe(df: pd.DataFrame) -> bool:
-    """Check if dataframe has required columns and no missing values."""
-    missing_cols = [col for col in EXPECTED_COLUMNS if col not in df.columns]
-    if missing_cols:
-        st.error(f"❌ Missing required columns: {', '.join(missing_cols)}")
-        return False
-
-    nan_cols = df.columns[df.isnull().any()].tolist()
-    if nan_cols:
-        st.error(f"❌ Dataset contains missing values in columns: {', '.join(nan_cols)}")
-        return False
-
-    return True
-
-def preprocess_income_column(df: pd.DataFrame) -> pd.DataFrame:
-    """Preprocess C3_ParentIncomeIDR column to income score bands."""
-    try:
-        df["C3_ParentIncomeIDR"] = (
-            df["C3_ParentIncomeIDR"]
-            .astype(str)
-            .str.replace(r"[^\d.]", "", regex=True)
-            .astype(float)
-            .apply(map_income_to_score)
-        )
-        return df
-    except Exception as e:
-        st.error(f"❌ Failed to preprocess C3_ParentIncomeIDR column: {e}")
-        return None
+def save_uploaded_file(uploaded_file, save_dir: Path, content_hash: Optional[str] = None) -> Path:
+    """
+    Save uploaded file to disk (skipped if an identical copy is already there).
 
-def save_uploaded_file(uploaded_file, save_dir: Path) -> None:
-    """Save uploaded file to disk."""
-    uploaded_file.seek(0)
-    with open(save_dir / uploaded_file.name, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    A different file already saved under the same name is kept; the upload
+    is stored as {stem}-{hash}.csv instead.
+    """
+    save_dir.mkdir(parents=True, exist_ok=True)
+    target = save_dir / uploaded_file.name
+    if target.exists():
+        if content_hash is not None and fingerprint_file(target) == content_hash:
+            return target
+        suffix = content_hash[:8] if content_hash is not None else fingerprint_stream(uploaded_file)[:8]
+        target = save_dir / f"{Path(uploaded_file.name).stem}-{suffix}{Path(uploaded_file.name).suffix}"
+        if target.exists():
+            return target
+    copy_stream(uploaded_file, target)
+    return target
 
 def upload_tab() -> None:
     st.header("1 . Upload / Choose Data")
@@ -131,54 +143,62 @@ def upload_tab() -> None:
     # List existing datasets
     existing_files = sorted([p.name for p in INPUT_DIR.glob("*.csv")])
     existing_files = ["-- Select --"] + existing_files
-    selected_file = st.selectbox("Choose a dataset in *data/input/*:", existing_files)
+    selected_file = st.selectbox("Choose a dataset in *data/input/*:", existing_files, key=kept("dataset_choice"))
 
     # File uploader widget
     uploaded_file = st.file_uploader("Or upload a new CSV", type=["csv"])
+    st.session_state.setdefault("quarantine_invalid", False)  # reject by default, as before
+    quarantine = st.toggle(
+        "Quarantine invalid rows (keep the valid ones) instead of rejecting the file",
+        key=kept("quarantine_invalid"),
+    )
 
-    df = None
     src_name = None
     is_uploaded = False
 
-    # Determine data source and load DataFrame
+    # Determine data source and its content hash
     if uploaded_file is not None:
         src_name = uploaded_file.name
         is_uploaded = True
-        df = load_dataframe_from_uploaded(uploaded_file)
-        if df is None:
-            return
+        source = uploaded_file
+        with stage("upload.hash"):
+            source_hash = fingerprint_stream(uploaded_file)
     elif selected_file != "-- Select --":
         src_name = selected_file
-        df = load_dataframe_from_file(INPUT_DIR / selected_file)
-        if df is None:
-            return
+        source = INPUT_DIR / selected_file
+        with stage("upload.hash"):
+            source_hash = fingerprint_file(source)
     else:
         st.info("📂 Please select an existing dataset or upload a new one.")
         return
 
-    # Validate dataframe columns and missing values
-    if not validate_dataframe(df):
+    # Validate + preprocess chunk by chunk and write the preprocessed table
+    # Identical sources share one read-only preprocessed table (content-addressed)
+    key = source_key(source_hash)
+    report = ingest_with_progress(source, shared_table_dir(key), key, QUARANTINE if quarantine else REJECT)
+    if report is None:
         return
 
-    # Preprocess income column
-    df_processed = preprocess_income_column(df)
-    if df_processed is None:
-        return
-
-    # Save preprocessed data
-    preproc_filename = f"{Path(src_name).stem}_preprocessed.csv"
-    df_processed.to_csv(PREPROC_DIR / preproc_filename, index=False)
-
     # Save original uploaded file if applicable
     if is_uploaded:
-        save_uploaded_file(uploaded_file, INPUT_DIR)
-
-    st.success(
-        f"✅ Pre-processed data saved as **{preproc_filename}** in *data/preprocessed/*. Ready for next step."
-    )
-
-    # Store DataFrame in session state and display preview
-    st.session_state.df = df_processed
-    st.subheader("Preview of Pre-processed Data")
-    st.dataframe(df_processed, use_container_width=True)
-    st.markdown(f"**Rows:** {df_processed.shape[0]} &nbsp;|&nbsp; **Columns:** {df_processed.shape[1]}")
+        with stage("upload.save_file"):
+            save_uploaded_file(uploaded_file, INPUT_DIR, source_hash)
+
+    st.success(f"✅ **{src_name}** pre-processed ({report.rows:,} rows). Ready for next step.")
+    if report.rejected:
+        show_rejected(report)
+
+    # Store preprocessed path in session state and display preview
+    st.session_state.preprocessed_path = report.table_dir
+    st.session_state.df = report.preview
+    st.subheader("Pre-processed Data")
+    table = open_table(report.table_dir)
+    view = ResultView(np.arange(table.rows))
+
+    def page_frame(positions: np.ndarray) -> pd.DataFrame:
+        rows = view.rows(positions)
+        return pd.DataFrame({name: table.take(name, rows) for name in table.columns}, columns=table.columns)
+
+    with stage("upload.render"):
+        paged_table("preprocessed", view, page_frame, lambda: table.column("ID"), cache_id=table.extra.get("source_key"))
+    st.markdown(f"**Rows:** {report.rows} &nbsp;|&nbsp; **Columns:** {len(report.columns)}")
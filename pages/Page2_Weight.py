@@ -6,7 +6,7 @@ Flow:
 1. Load default weights from CSV or fallback to predefined.
 2. Show loaded weights with normalized values and descriptions.
 3. Allow manual custom weight input via form.
-4. Normalize custom weights and save option.
+4. Normalize custom weights and save them to this session's workspace.
 """
 
 import os
@@ -17,10 +17,12 @@ from typing import Dict
 import pandas as pd
 import streamlit as st
 
+from engine.storage import atomic_write_csv
+from utils import get_workspace, kept
+
 # ---------- Constants ----------
 BASE_DIR = Path(__file__).parent.parent
 DEFAULT_WEIGHT_PATH = BASE_DIR / "data" / "weight" / "weight_default.csv"
-CUSTOM_WEIGHT_SAVE_PATH = BASE_DIR / "data" / "weight" / "weight_custom.csv"
 
 CRITERION_DESCRIPTIONS: Dict[str, str] = {
     "C1_GPA": "Grade Point Average - Academic performance indicator",
@@ -124,8 +126,9 @@ def display_action_buttons() -> None:
         if st.button("💾 Save Weights as CSV", use_container_width=True, key="save_weights_btn"):
             if "weights" in st.session_state and "custom_normalized_weights" in st.session_state:
                 weights_df = pd.DataFrame([st.session_state["custom_normalized_weights"]])
-                weights_df.to_csv(CUSTOM_WEIGHT_SAVE_PATH, index=False)
-                st.success(f"✅ Weights saved to {CUSTOM_WEIGHT_SAVE_PATH}")
+                # Saved to this session's workspace, so other evaluators keep their own weights
+                atomic_write_csv(weights_df, get_workspace().custom_weight_path, index=False)
+                st.success("✅ Custom weights saved for this session")
             else:
                 st.warning("⚠️ No weights to save. Load or input weights first.")
 
@@ -167,7 +170,7 @@ def custom_weights_ui() -> None:
             custom_weights[crit] = st.radio(
                 f"**{format_label(crit)}** - {CRITERION_DESCRIPTIONS.get(crit, '')}",
                 RATING_OPTIONS,
-                key=f"rating_{crit}",
+                key=kept(f"rating_{crit}"),
                 horizontal=True,
             )
 
@@ -175,7 +178,7 @@ def custom_weights_ui() -> None:
             custom_weights[crit] = st.radio(
                 f"**{format_label(crit)}** - {CRITERION_DESCRIPTIONS.get(crit, '')}",
                 RATING_OPTIONS,
-                key=f"rating_{crit}",
+                key=kept(f"rating_{crit}"),
                 horizontal=True,
             )
 
@@ -204,7 +207,7 @@ def weight_tab() -> None:
         "Choose weight configuration mode:",
         options=["Default Weights", "Custom Weights"],
         horizontal=True,
-        key="weight_mode_radio",
+        key=kept("weight_mode_radio"),
     )
 
     if st.session_state["weight_method"] == "Default Weights":
@@ -3,10 +3,26 @@
 Tab 3 – Scholarship Scoring
 
 Flow:
-1. Load preprocessed data and weights (default or custom).
-2. Allow user to select scoring methods (SAW, WP, TOPSIS).
-3. Compute scores per selected methods.
-4. Display and allow CSV download of results.
+1. Open this session's preprocessed data (memory-mapped columnar table; a
+   rerun reads only the ID column and the weighted criteria, other columns
+   only for a download or correction) and weights (default or custom);
+   results are written to the session's
+   workspace (engine.workspace), never to paths shared with other users.
+2. Allow user to mark cost criteria (lower is better), pick a normalization
+   (max, min-max, vector, z-score, or each method's own) and select scoring
+   methods (every method in the registry: SAW, WP, TOPSIS, VIKOR, MOORA,
+   EDAS, CODAS, PROMETHEE II).
+3. Compute scores per selected methods (ScoringPipeline, kept in st.session_state);
+   the column statistics behind every normalization come from one pass.
+4. Record the run (metadata, scores and ranks) in the SQLite results store
+   in the background.
+5. Display the top-K shortlist (or full ranking) one page at a time with ID
+   search and rank filters, save results as columnar tables in the
+   background and build the full CSV only when its download is clicked.
+6. Optionally run a Monte Carlo weight-sensitivity (rank stability) report.
+7. Optionally apply late corrections / new applicants incrementally: only the
+   affected scores and ranks are recomputed (engine.incremental) and a
+   corrected copy of the table is written to the workspace.
 """
 
 import os
@@ -17,24 +33,83 @@ import numpy as np
 import pandas as pd
 import streamlit as st
 
+from engine import as_matrix
+from engine.batch import PROFILE_METHODS
+from engine.cache import RESULT_CACHE, cache_key, fingerprint_table
+from engine.compact import CRITERIA_SPECS
+from engine.incremental import IncrementalScorer, upsert_rows
+from engine.kernels import BENEFIT, COST, NORMALIZATIONS, ScoringScheme, get_method, registered_methods
+from engine.ingest import IngestError, validate_chunk
+from engine.pipeline import ScoringPipeline, ScoringRun, persist_async
+from engine.preprocess import DEFAULT_BANDS, apply_bands
+from engine.schema import CRITERIA_COLUMNS, ID_COLUMN
+from engine.sensitivity import rank_stability
+from engine.storage import TABLE_SUFFIX, ColumnarTable, columnar_path, is_fresh, open_table, write_table
+from engine.views import csv_file
+from utils import csv_download, get_recorder, get_workspace, kept, paged_table, results_store, stage
+
 # ---------- Constants ----------
 BASE_DIR = Path(__file__).parent.parent
 PREPROCESSED_FILE = BASE_DIR / "data" / "preprocessed" / "scholarship_sample_preprocessed.csv"
-RESULT_DIR = BASE_DIR / "data" / "result"
-RESULT_DIR.mkdir(parents=True, exist_ok=True)
+SCORER_KEY = "incremental_scorer"
+METHOD_COLUMNS = 4  # method checkboxes per row
+METHOD_DEFAULT = "Method default"
+NORMALIZATION_LABELS = {
+    METHOD_DEFAULT: "Method default (SAW/CODAS: max, TOPSIS/MOORA: vector)",
+    "max": "Max (x / max)",
+    "minmax": "Min-max ((x − min) / (max − min))",
+    "vector": "Vector (x / ‖x‖)",
+    "zscore": "Z-score ((x − mean) / std)",
+}
 
 DEFAULT_WEIGHT_PATH = BASE_DIR / "data" / "weight" / "weight_default.csv"
 CUSTOM_WEIGHT_PATH = BASE_DIR / "data" / "weight" / "weight_custom.csv"
 
 # ---------- Helper Functions ----------
 
-def load_preprocessed_data(path: Path) -> Optional[pd.DataFrame]:
-    """Load preprocessed scholarship data from CSV."""
+def load_preprocessed_table(path: Path) -> Optional[ColumnarTable]:
+    """
+    Open the columnar copy of a preprocessed dataset (memory-mapped).
+
+    The table next to the CSV is used while it is at least as new as the CSV;
+    otherwise the CSV is parsed once and converted.
+    """
+    table_dir = columnar_path(path)
+    if is_fresh(table_dir, path):
+        return open_table(table_dir)
     try:
-        return pd.read_csv(path)
+        df = pd.read_csv(path, dtype={ID_COLUMN: str})
     except FileNotFoundError:
         st.error(f"Preprocessed data file not found at {path}")
         return None
+    return write_table(table_dir, df, matrix_columns=[c for c in CRITERIA_COLUMNS if c in df.columns])
+
+def current_table() -> Optional[ColumnarTable]:
+    """
+    This session's dataset: the table chosen in the upload tab (or its
+    corrected copy in the workspace), else the bundled sample.
+    """
+    table_dir = st.session_state.get("preprocessed_path")
+    if table_dir is not None and is_fresh(table_dir):
+        return open_table(table_dir)
+    return load_preprocessed_table(PREPROCESSED_FILE)
+
+def criteria_matrix(table: ColumnarTable, criteria: list):
+    """
+    The weighted criteria as a matrix: the table's memory-mapped matrix (or
+    a subset of its compact code columns) when possible, otherwise just
+    those columns read into a float matrix.
+    """
+    if list(criteria) == table.matrix_columns:
+        return table.matrix
+    if table.is_compact and set(criteria) <= set(table.matrix_columns):
+        return table.compact_matrix(columns=criteria)
+    return as_matrix(table.to_frame(criteria))
+
+def load_preprocessed_data(path: Path) -> Optional[pd.DataFrame]:
+    """Load preprocessed scholarship data as a DataFrame."""
+    table = load_preprocessed_table(path)
+    return table.to_frame() if table is not None else None
 
 def load_weights(path: Path) -> Optional[pd.DataFrame]:
     """Load weights CSV into DataFrame."""
@@ -48,51 +123,187 @@ def load_weights(path: Path) -> Optional[pd.DataFrame]:
         st.error(f"Weight file not found at {path}. Please configure weights first.")
         return None
 
-def save_result(method_name: str, df: pd.DataFrame) -> None:
-    """Save scoring result CSV to disk."""
-    output_path = RESULT_DIR / f"{method_name.lower()}_result.csv"
-    df.to_csv(output_path, index=False)
+def save_result(run: ScoringRun, method: str, output_path: Path) -> None:
+    """
+    Save one method's scores as a columnar table (CSV is only built for download).
+
+    The table records its run (run_key and the run's methods), so the
+    ranking tab only aggregates results saved together. When the stored
+    result and run keys match, the same result is already on disk and the
+    write is skipped; otherwise the frame is built here, off the rerun.
+    """
+    extra = {"result_key": run.keys.get(method), "run_key": run.key, "run_methods": run.methods}
+    if is_fresh(output_path):
+        stored = open_table(output_path).extra
+        if all(stored.get(name) == value for name, value in extra.items()):
+            return
+    write_table(output_path, run.result_frame(method), extra=extra)
+
+def scheme_section(criteria: list) -> ScoringScheme:
+    """Criterion types (benefit/cost) and the normalization used by the normalizing methods."""
+    with st.expander("⚖️ Criterion Types & Normalization"):
+        # Keep only choices that still exist (the criteria follow the weight file)
+        key = kept("cost_criteria")
+        if key in st.session_state:
+            st.session_state[key] = [c for c in st.session_state[key] if c in criteria]
+        cost = st.multiselect("Cost criteria (lower is better; all others are benefit)", criteria, key=key)
+        normalization = st.selectbox(
+            "Normalization",
+            [METHOD_DEFAULT, *NORMALIZATIONS],
+            format_func=NORMALIZATION_LABELS.get,
+            key=kept("normalization"),
+        )
+    types = [COST if c in cost else BENEFIT for c in criteria]
+    return ScoringScheme.from_types(types, None if normalization == METHOD_DEFAULT else normalization)
+
+def sensitivity_section(ids: np.ndarray, features: np.ndarray, weights: list, methods: list, scheme: ScoringScheme) -> None:
+    """Monte Carlo weight perturbation report for the selected methods."""
+    with st.expander("🎲 Weight Sensitivity (Monte Carlo rank stability)"):
+        # Thousands of weight samples need the many-profiles-at-once kernels (engine.batch)
+        methods = [m for m in methods if m in PROFILE_METHODS]
+        if not methods:
+            st.info(f"Sensitivity analysis covers {', '.join(PROFILE_METHODS)}; select at least one of them.")
+            return
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            n_samples = st.number_input("Weight samples", min_value=100, max_value=100_000, value=1000, step=100)
+        with col2:
+            cutoff = st.number_input("Award cutoff (top K)", min_value=1, max_value=len(ids), value=min(10, len(ids)))
+        with col3:
+            concentration = st.number_input(
+                "Concentration (higher = smaller perturbation)", min_value=1.0, value=200.0, step=10.0
+            )
+
+        if st.button("▶️ Run Sensitivity Analysis", key="run_sensitivity_btn"):
+            with stage("scoring.sensitivity", len(ids)):
+                report = rank_stability(
+                    features,
+                    weights,
+                    n_samples=int(n_samples),
+                    methods=methods,
+                    cutoff=int(cutoff),
+                    concentration=float(concentration),
+                    n_workers=os.cpu_count() or 1,
+                    scheme=scheme,
+                )
+            st.caption(f"{report.n_samples} samples · final rank = {'BORDA of ' if len(methods) > 1 else ''}{', '.join(methods)}")
+            st.dataframe(report.to_frame(ids), use_container_width=True)
 
-def compute_saw(features: pd.DataFrame, weights: np.ndarray) -> np.ndarray:
-    """Compute SAW scores."""
-    norm = features / features.max()
-    scores = norm.dot(weights)
-    return scores
+def display_method_result(method: str, run: ScoringRun, table: ColumnarTable, shortlist_size: int) -> None:
+    """Show one method's shortlist (or full ranking) a page at a time, persist it and offer the full CSV."""
+    st.markdown(f"#### 🔹 {method} Result")
+    score_col = f"{method}_Score"
+    view_id = (run.keys[method], "view", shortlist_size)
+    with stage(f"scoring.sort.{method}", len(run.ids)):
+        view = RESULT_CACHE.get_or_compute(view_id, lambda: run.view(method, shortlist_size))
 
-def compute_wp(features: pd.DataFrame, weights: np.ndarray) -> np.ndarray:
-    """Compute WP scores."""
-    features_safe = features.replace(0, 1e-6)
-    log_matrix = np.log(features_safe) * weights
-    scores = np.exp(log_matrix.sum(axis=1))
-    return scores
+    def page_frame(positions: np.ndarray) -> pd.DataFrame:
+        rows = view.rows(positions)
+        return pd.DataFrame({
+            f"Rank_{method}": view.ranks[positions],
+            "ID": run.ids[rows],
+            score_col: run.scores[method][rows],
+        })
 
-def compute_topsis(features: pd.DataFrame, weights: np.ndarray) -> np.ndarray:
-    """Compute TOPSIS scores."""
-    norm = features / np.sqrt((features**2).sum())
-    weighted = norm * weights
+    with stage(f"scoring.render.{method}"):
+        paged_table(f"{method.lower()}_result", view, page_frame, run.ids, cache_id=view_id)
 
-    ideal_pos = weighted.max()
-    ideal_neg = weighted.min()
+    # Saved in the background (the frame is only built if the saved one is stale)
+    write = get_recorder().wrap(f"scoring.write.{method}", save_result, len(run.ids))
+    persist_async(write, run, method, get_workspace().result_table(method))
 
-    dist_pos = np.sqrt(((weighted - ideal_pos) ** 2).sum(axis=1))
-    dist_neg = np.sqrt(((weighted - ideal_neg) ** 2).sum(axis=1))
+    # The full sorted table (all criteria) is only read and encoded, a chunk at a time, when the button is clicked
+    def full_frame(rows: np.ndarray) -> pd.DataFrame:
+        data = {name: table.take(name, rows) for name in table.columns}
+        return pd.DataFrame(data).assign(**{score_col: run.scores[method][rows]})
 
-    scores = dist_neg / (dist_pos + dist_neg)
-    return scores
+    csv_download(
+        f"⬇️ Download {method} Result",
+        f"{method.lower()}_result.csv",
+        lambda: csv_file(full_frame, run.order(method)),
+        len(run.ids),
+        key=f"{method.lower()}_download",
+        stage_name=f"scoring.csv.{method}",
+    )
+
+def scorer_key(dataset_key: str, criteria: list, weights: list, methods: list, scheme: ScoringScheme) -> str:
+    """Identifies the dataset, weights, methods and scheme an incremental scorer is valid for."""
+    return cache_key("incremental", dataset_key, list(criteria), [float(w) for w in weights], list(methods), *scheme.key())
+
+def corrections_section(
+    table: ColumnarTable,
+    pipeline: ScoringPipeline,
+    run: ScoringRun,
+    weights: list,
+    methods: list,
+    scheme: ScoringScheme,
+) -> None:
+    """Apply corrected rows and late applicants without re-uploading or rescoring everything."""
+    with st.expander("✏️ Late Corrections & New Applicants (incremental re-scoring)"):
+        st.caption(
+            "Upload rows in the template format: an existing ID replaces that applicant, "
+            "a new ID is appended. Only the affected scores and ranks are recomputed."
+        )
+        uploaded = st.file_uploader("Corrections CSV", type=["csv"], key="corrections_upload")
+        if uploaded is None or not st.button("▶️ Apply Corrections", key="apply_corrections_btn"):
+            return
+        try:
+            # IDs as text, like the table's, so numeric-looking IDs match their applicants
+            changes = pd.read_csv(uploaded, dtype={ID_COLUMN: str})
+            validate_chunk(changes, 0)
+            changes = apply_bands(changes, DEFAULT_BANDS)
+            df_new = upsert_rows(table.to_frame(), changes)  # the whole table, only when corrections are applied
+            # Write the corrected copy first: if a value is out of range nothing has changed yet.
+            # It goes to this session's workspace; the source table may be shared.
+            with stage("scoring.incremental.write", len(df_new)):
+                specs = CRITERIA_SPECS if table.is_compact else None
+                new_table = write_table(
+                    get_workspace().data_dir / f"corrected{TABLE_SUFFIX}",
+                    df_new,
+                    matrix_columns=table.matrix_columns,
+                    matrix_specs=specs,
+                )
+        except (IngestError, ValueError, TypeError, pd.errors.ParserError) as e:
+            st.error(f"❌ {e}")
+            return
+
+        entry = st.session_state.get(SCORER_KEY)
+        if entry is not None and entry[0] == scorer_key(pipeline.dataset_key, pipeline.criteria, weights, methods, scheme):
+            scorer = entry[1]
+        else:
+            scorer = IncrementalScorer(pipeline.ids, pipeline.matrix, weights, methods, scores=run.scores, scheme=scheme)
+        with stage("scoring.incremental", len(changes)):
+            report = scorer.upsert(changes[ID_COLUMN].tolist(), as_matrix(changes[pipeline.criteria]))
+
+        new_key = scorer_key(fingerprint_table(new_table), pipeline.criteria, weights, methods, scheme)
+        st.session_state[SCORER_KEY] = (new_key, scorer)
+        st.session_state.preprocessed_path = new_table.table_dir
+        st.session_state["corrections_report"] = (
+            f"✅ {report.rows_changed} corrected, {report.rows_appended} added · "
+            f"rescored incrementally: {', '.join(report.incremental) or '–'} · "
+            f"fully (normalizer shifted): {', '.join(report.full_rescore) or '–'}"
+        )
+        st.rerun()
 
 # ---------- Main Tab Function ----------
 
 def scoring_tab() -> None:
     st.subheader("🎯 Scholarship Scoring")
 
-    # Load data
-    df = load_preprocessed_data(PREPROCESSED_FILE)
-    if df is None:
-        return
+    # Load data (memory-mapped columnar table)
+    with stage("scoring.load") as record:
+        table = current_table()
+        if table is None:
+            return
+        record.rows = table.rows
 
     # Select weight file path based on selected mode
     weight_method = st.session_state.get("weight_method", "Default Weights")
-    weight_path = CUSTOM_WEIGHT_PATH if weight_method == "Custom Weights" else DEFAULT_WEIGHT_PATH
+    weight_path = DEFAULT_WEIGHT_PATH
+    if weight_method == "Custom Weights":
+        # Weights saved in this session, else the bundled custom profile
+        saved = get_workspace().custom_weight_path
+        weight_path = saved if saved.exists() else CUSTOM_WEIGHT_PATH
 
     # Load weights
     if "weighted_df" in st.session_state:
@@ -106,59 +317,53 @@ def scoring_tab() -> None:
     criteria = list(weights_dict.keys())
     weights = list(weights_dict.values())
 
+    # Benefit/cost type per criterion and the normalization
+    scheme = scheme_section(criteria)
 
-    # Assume all criteria are benefit type
-    types = ["Benefit"] * len(criteria)  # currently unused but can be extended
-
-    # Scoring method selection UI
+    # Scoring method selection UI (one checkbox per registered method)
     st.markdown("#### Select Scoring Methods")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        use_saw = st.checkbox("SAW (Simple Additive Weighting)")
-    with col2:
-        use_wp = st.checkbox("WP (Weighted Product)")
-    with col3:
-        use_topsis = st.checkbox("TOPSIS")
+    columns = st.columns(METHOD_COLUMNS)
+    selected = []
+    for i, method in enumerate(registered_methods()):
+        with columns[i % METHOD_COLUMNS]:
+            if st.checkbox(get_method(method).label, key=kept(f"use_{method.lower()}")):
+                selected.append(method)
+
+    shortlist_size = st.number_input(
+        "Shortlist size (top K awards, 0 = full ranking)",
+        min_value=0,
+        max_value=max(table.rows, 1),
+        key=kept("shortlist_size"),
+    )
 
     # Compute and display results if any method selected
-    if any([use_saw, use_wp, use_topsis]):
+    if selected:
         st.markdown("### 📊 Scoring Results")
 
-        # Select feature columns according to criteria from data
-        features = df[list(criteria)].copy()
-
-        if use_saw:
-            st.markdown("#### 🔹 SAW Result")
-            scores = compute_saw(features, weights)
-            df_saw = df.copy()
-            df_saw["SAW_Score"] = scores
-            df_saw = df_saw.sort_values(by="SAW_Score", ascending=False)
-            st.dataframe(df_saw[["ID", "SAW_Score"]].reset_index(drop=True), use_container_width=True)
-            save_result("SAW", df_saw)
-            csv_saw = df_saw.to_csv(index=False).encode("utf-8")
-            st.download_button("⬇️ Download SAW Result", csv_saw, "saw_result.csv", "text/csv")
-
-        if use_wp:
-            st.markdown("#### 🔹 WP Result")
-            scores = compute_wp(features, weights)
-            df_wp = df.copy()
-            df_wp["WP_Score"] = scores
-            df_wp = df_wp.sort_values(by="WP_Score", ascending=False)
-            st.dataframe(df_wp[["ID", "WP_Score"]].reset_index(drop=True), use_container_width=True)
-            save_result("WP", df_wp)
-            csv_wp = df_wp.to_csv(index=False).encode("utf-8")
-            st.download_button("⬇️ Download WP Result", csv_wp, "wp_result.csv", "text/csv")
-
-        if use_topsis:
-            st.markdown("#### 🔹 TOPSIS Result")
-            scores = compute_topsis(features, weights)
-            df_topsis = df.copy()
-            df_topsis["TOPSIS_Score"] = scores
-            df_topsis = df_topsis.sort_values(by="TOPSIS_Score", ascending=False)
-            st.dataframe(df_topsis[["ID", "TOPSIS_Score"]].reset_index(drop=True), use_container_width=True)
-            save_result("TOPSIS", df_topsis)
-            csv_topsis = df_topsis.to_csv(index=False).encode("utf-8")
-            st.download_button("⬇️ Download TOPSIS Result", csv_topsis, "topsis_result.csv", "text/csv")
+        # Score all selected methods in one pass over a single float matrix
+        # (the ID column and the weighted criteria only; nothing else is read)
+        features = criteria_matrix(table, criteria)
+        with stage("scoring.score", table.rows):
+            pipeline = ScoringPipeline(table.column(ID_COLUMN), features, criteria, dataset_key=fingerprint_table(table))
+            # After incremental corrections the session scorer already holds this dataset's scores and ranks
+            entry = st.session_state.get(SCORER_KEY)
+            if entry is not None and entry[0] == scorer_key(pipeline.dataset_key, criteria, weights, selected, scheme):
+                run = entry[1].to_run({m: pipeline.result_key(weights, m, scheme) for m in selected})
+            else:
+                run = pipeline.score(weights, selected, scheme)
+        st.session_state["scoring_run"] = run
+
+        # Run history for lookups and run-to-run diffs (skipped if this exact run is stored)
+        record = get_recorder().wrap("scoring.store", results_store().record_run, len(run.ids))
+        persist_async(record, run, pipeline.dataset_key, criteria, weights, selected, scheme=scheme)
+        if "corrections_report" in st.session_state:
+            st.success(st.session_state.pop("corrections_report"))
+
+        for method in selected:
+            display_method_result(method, run, table, int(shortlist_size))
+
+        corrections_section(table, pipeline, run, weights, selected, scheme)
+        sensitivity_section(run.ids, features, weights, selected, scheme)
 
     else:
         st.info("Please select at least one method to calculate scores.")
@@ -1,80 +1,243 @@
 # pages/Page4_Ranking.py
 """
-Tab 4 – Final Scholarship Ranking with BORDA Method
+Tab 4 – Final Scholarship Ranking (BORDA, Copeland or Kemeny aggregation)
 
 Flow:
-1. Load results from SAW, WP, and TOPSIS scoring methods.
+1. Take the scores of every method the scoring tab ran (at least two) from
+   the in-memory scoring run (or, without one, the last run's result tables
+   saved in this session's workspace, only if every one of them is there).
 2. Compute ranks for each method (higher score → higher rank).
-3. Calculate BORDA score by summing inverted ranks.
-4. Display and save the final BORDA ranking table.
+3. Aggregate the ranks (memoized on result content): BORDA sums inverted
+   ranks, Copeland counts pairwise majority wins, Kemeny approximates the
+   order closest to every method; each method can be weighted
+   (engine.aggregation).
+4. Display the final ranking a page at a time (ID search, rank range),
+   save it to the workspace in the background and build the CSV only when its download is
+   clicked.
+5. Report how far the methods agree (Kendall's tau, Spearman's rho) on demand.
+6. Run history (SQLite results store): look up where an applicant ranked in
+   any stored run and diff the ranks of two runs.
 """
 
 import os
 from pathlib import Path
+from typing import Optional
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from engine.aggregation import (
+    AGGREGATIONS,
+    COPELAND,
+    COPELAND_EXACT_ROWS,
+    COPELAND_EXACT_TOP,
+    KEMENY,
+    SCORE_COLUMNS,
+    agreement,
+    is_copeland_exact,
+)
+from engine.cache import RESULT_CACHE
+from engine.kernels import registered_methods
+from engine.pipeline import ScoringRun, persist_async
+from engine.ranking import BORDA
+from engine.storage import META_FILE, is_fresh, open_table, write_table
+from engine.views import ResultView, csv_file
+from utils import csv_download, get_recorder, get_workspace, kept, paged_table, results_store, stage
+
 # ---------- Constants ----------
 BASE_DIR = Path(__file__).parent.parent
-RESULT_DIR = BASE_DIR / "data" / "result"
-RESULT_DIR.mkdir(parents=True, exist_ok=True)
-
-PATH_SAW = RESULT_DIR / "saw_result.csv"
-PATH_WP = RESULT_DIR / "wp_result.csv"
-PATH_TOPSIS = RESULT_DIR / "topsis_result.csv"
-PATH_BORDA = RESULT_DIR / "borda_result.csv"
+MIN_BORDA_METHODS = 2
+DIFF_ROWS = 1000  # largest rank changes shown per diff
+AGGREGATION_LABELS = {
+    BORDA: "BORDA (Σ weight × (n − rank))",
+    COPELAND: (
+        f"Copeland (pairwise majority wins − losses; above {COPELAND_EXACT_ROWS:,} applicants "
+        f"exact for the top {COPELAND_EXACT_TOP}, estimated below)"
+    ),
+    KEMENY: "Kemeny (median rank + local Kemenization)",
+}
+WEIGHT_COLUMNS = 4  # method weight inputs per row
+
+# ---------- Helper Functions ----------
+
+def load_scoring_run() -> Optional[ScoringRun]:
+    """
+    Scores for BORDA: the in-memory run from the scoring tab (whatever
+    methods it ran), otherwise the most recently saved run in this session's
+    workspace, read only from tables saved with that run (older weights,
+    schemes or deselected methods are never mixed in). None unless the run
+    has at least two methods.
+    """
+    run = st.session_state.get("scoring_run")
+    if run is not None:
+        return run if len(run.methods) >= MIN_BORDA_METHODS else None
+    workspace = get_workspace()
+    paths = {m: workspace.result_table(m) for m in registered_methods()}
+    tables = {m: open_table(path) for m, path in paths.items() if is_fresh(path)}
+    if not tables:
+        return None
+    latest = max(tables.values(), key=lambda t: (t.table_dir / META_FILE).stat().st_mtime).extra
+    methods = latest.get("run_methods") or []
+    same_run = {m: t for m, t in tables.items() if latest.get("run_key") and t.extra.get("run_key") == latest["run_key"]}
+    if len(methods) < MIN_BORDA_METHODS or set(same_run) != set(methods):
+        return None
+    return ScoringRun.from_tables({m: same_run[m] for m in methods})
+
+def save_aggregate(run: ScoringRun, result_key: str, path: Path, aggregation: str, scores: np.ndarray) -> None:
+    """Save the aggregate ranking (from its already computed scores) unless this exact result is already saved."""
+    if is_fresh(path) and open_table(path).extra.get("result_key") == result_key:
+        return
+    write_table(path, run.aggregate_frame(aggregation=aggregation, scores=scores), extra={"result_key": result_key})
+
+def aggregation_controls(methods: list):
+    """Aggregation and per-method weights (None when every weight is 1, i.e. plain BORDA weighting)."""
+    with st.expander("⚙️ Rank Aggregation"):
+        aggregation = st.selectbox(
+            "Aggregation", AGGREGATIONS, format_func=AGGREGATION_LABELS.get, key=kept("aggregation")
+        )
+        st.caption("Method weights (a method's say in the aggregate)")
+        columns = st.columns(WEIGHT_COLUMNS)
+        weights = []
+        for i, method in enumerate(methods):
+            key = kept(f"method_weight_{method.lower()}")
+            st.session_state.setdefault(key, 1.0)
+            with columns[i % WEIGHT_COLUMNS]:
+                weights.append(st.number_input(method, min_value=0.0, step=0.5, key=key))
+    if not any(weights):
+        st.warning("All method weights are 0; using equal weights.")
+        weights = None
+    elif all(w == 1.0 for w in weights):
+        weights = None
+    return aggregation, weights
+
+def agreement_section(run: ScoringRun, methods: list, result_key: str) -> None:
+    """Pairwise Kendall's tau-b and Spearman's rho between the methods' rankings."""
+    with st.expander("🤝 Method Agreement (Kendall τ, Spearman ρ)"):
+        cache_id = (result_key, "agreement")
+        table = RESULT_CACHE.get(cache_id)
+        if table is None and st.button("▶️ Compute Agreement", key="agreement_btn"):
+            with stage("ranking.agreement", len(run.ids)):
+                table = RESULT_CACHE.get_or_compute(cache_id, lambda: agreement(run.rank_matrix(methods), methods))
+        if table is not None:
+            st.caption("1 = identical order, 0 = unrelated, −1 = reversed.")
+            st.dataframe(table, use_container_width=True, hide_index=True)
+
+def run_label(runs: pd.DataFrame, run_id: int) -> str:
+    row = runs.set_index("run_id").loc[run_id]
+    return f"#{run_id} · {row['created_at']:%Y-%m-%d %H:%M} · {', '.join(row['methods'])} · {row['rows']:,} rows"
+
+def history_section() -> None:
+    """Appeals lookups and run-to-run rank diffs from the results store."""
+    with st.expander("🗂️ Run History & Applicant Lookup"):
+        store = results_store()
+        runs = store.runs()
+        if runs.empty:
+            st.caption("No runs stored yet.")
+            return
+        run_ids = runs["run_id"].tolist()
+
+        col1, col2 = st.columns(2)
+        with col1:
+            run_id = st.selectbox("Run", run_ids, format_func=lambda r: run_label(runs, r), key="history_run")
+        with col2:
+            applicant = st.text_input("Applicant ID", key="history_applicant").strip()
+        if applicant:
+            with stage("ranking.lookup"):
+                found = store.lookup(run_id, applicant)
+                history = store.history(applicant)
+            if found.empty:
+                st.info(f"{applicant} is not in run #{run_id}.")
+            else:
+                st.dataframe(found, use_container_width=True, hide_index=True)
+            if len(history["run_id"].unique()) > 1:
+                st.caption("Across stored runs")
+                st.dataframe(history, use_container_width=True, hide_index=True)
+
+        if len(run_ids) > 1:
+            st.markdown("**Compare two runs**")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                run_a = st.selectbox("From run", run_ids, index=1, format_func=lambda r: f"#{r}", key="diff_run_a")
+            with col2:
+                run_b = st.selectbox("To run", run_ids, index=0, format_func=lambda r: f"#{r}", key="diff_run_b")
+            with col3:
+                shared = [m for m in store.methods(run_a) if m in store.methods(run_b)]
+                method = st.selectbox("Method", shared, key="diff_method") if shared else None
+            if method is not None and run_a != run_b:
+                with stage("ranking.diff"):
+                    diff = store.diff(run_a, run_b, method, limit=DIFF_ROWS)
+                st.caption(f"Largest {method} rank changes (up to {DIFF_ROWS}); a missing rank means the applicant is only in one run.")
+                st.dataframe(diff, use_container_width=True, hide_index=True)
 
 # ---------- Main Tab Function ----------
 
 def ranking_tab() -> None:
-    st.subheader("🏆 Final Scholarship Ranking - BORDA Method")
-
-    # Check if all required scoring result files exist
-    if not (PATH_SAW.exists() and PATH_WP.exists() and PATH_TOPSIS.exists()):
-        st.error("SAW, WP, and TOPSIS results are incomplete. Please run scoring first.")
+    st.subheader("🏆 Final Scholarship Ranking")
+
+    # Scores for every method, aligned by row (no CSV re-reads, no merges)
+    with stage("ranking.load"):
+        run = load_scoring_run()
+    if run is None:
+        st.error(f"BORDA needs results of at least {MIN_BORDA_METHODS} scoring methods. Please run scoring first.")
+        history_section()
         return
 
-    # Load score results
-    df_saw = pd.read_csv(PATH_SAW)[["ID", "SAW_Score"]]
-    df_wp = pd.read_csv(PATH_WP)[["ID", "WP_Score"]]
-    df_topsis = pd.read_csv(PATH_TOPSIS)[["ID", "TOPSIS_Score"]]
-
-    # Compute ranks (higher score → better rank, rank 1 is best)
-    df_saw["Rank_SAW"] = df_saw["SAW_Score"].rank(ascending=False, method="min")
-    df_wp["Rank_WP"] = df_wp["WP_Score"].rank(ascending=False, method="min")
-    df_topsis["Rank_TOPSIS"] = df_topsis["TOPSIS_Score"].rank(ascending=False, method="min")
-
-
-    # Merge ranks into single DataFrame
-    df_rank = (
-        df_saw[["ID", "Rank_SAW"]]
-        .merge(df_wp[["ID", "Rank_WP"]], on="ID")
-        .merge(df_topsis[["ID", "Rank_TOPSIS"]], on="ID")
-    )
-
-    # Calculate BORDA score (higher BORDA score is better)
-    total_participants = len(df_rank)
-    df_rank["Borda_Score"] = (
-        (total_participants - df_rank["Rank_SAW"]) +
-        (total_participants - df_rank["Rank_WP"]) +
-        (total_participants - df_rank["Rank_TOPSIS"])
-    )
-
-    # Sort descending by BORDA score
-    df_rank_sorted = df_rank.sort_values(by="Borda_Score", ascending=False).reset_index(drop=True)
+    # Same top-K shortlist size as the scoring tab (0 = full ranking)
+    shortlist_size = int(st.session_state.get("shortlist_size", 0))
+
+    # Aggregate every method that ran, once per distinct set of results and
+    # settings (shared, content-keyed cache)
+    methods = run.methods
+    aggregation, weights = aggregation_controls(methods)
+    score_col = SCORE_COLUMNS[aggregation]
+    weighted = "weighted " if weights is not None else ""
+    st.caption(f"{aggregation} ({weighted}over {len(methods)} methods): {', '.join(methods)}")
+    if aggregation == COPELAND and not is_copeland_exact(len(run.ids)):
+        st.caption(
+            f"⚠️ {len(run.ids):,} applicants: Copeland scores are exact for the top {COPELAND_EXACT_TOP} "
+            "(compared with every applicant) and estimated from a reference sample below that."
+        )
+    with stage(f"ranking.{aggregation.lower()}", len(run.ids)):
+        result_key = run.aggregate_key(methods, aggregation, weights)
+        view_id = (result_key, "view", shortlist_size)
+        scores = RESULT_CACHE.get_or_compute((result_key, "scores"), lambda: run.aggregate(methods, aggregation, weights))
+        view = RESULT_CACHE.get_or_compute(view_id, lambda: ResultView.from_scores(scores, shortlist_size))
+
+    def result_frame(rows: np.ndarray) -> pd.DataFrame:
+        """Rows of the borda_result layout (ID, per-method ranks, aggregate score)."""
+        data = {"ID": run.ids[rows]}
+        for m in methods:
+            data[f"Rank_{m}"] = run.rank(m)[rows]
+        data[score_col] = scores[rows]
+        return pd.DataFrame(data)
+
+    def page_frame(positions: np.ndarray) -> pd.DataFrame:
+        return result_frame(view.rows(positions)).assign(Rank=view.ranks[positions])[
+            ["Rank", "ID", *(f"Rank_{m}" for m in methods), score_col]
+        ]
 
     # Display ranking table
-    st.markdown("### 📊 Final Ranking Table (BORDA)")
-    st.dataframe(df_rank_sorted, use_container_width=True)
-
-    # Save BORDA results to CSV
-    df_rank_sorted.to_csv(PATH_BORDA, index=False)
-
-    # Download button for BORDA result
-    csv_borda = df_rank_sorted.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        label="⬇️ Download BORDA Result",
-        data=csv_borda,
-        file_name="borda_result.csv",
-        mime="text/csv",
+    st.markdown(f"### 📊 Final Ranking Table ({aggregation})")
+    if shortlist_size > 0:
+        st.caption(f"Top {shortlist_size} shortlist (ties on the cutoff included); the download has the full ranking.")
+    with stage("ranking.render"):
+        paged_table(f"{aggregation.lower()}_result", view, page_frame, run.ids, cache_id=view_id)
+
+    # Save the ranking in the background (the frame is only built if the saved one is stale)
+    result_path = get_workspace().result_table(aggregation)
+    write = get_recorder().wrap("ranking.write", save_aggregate, len(run.ids))
+    persist_async(write, run, result_key, result_path, aggregation, scores)
+
+    # Download button (same layout as borda_result, encoded on click)
+    csv_download(
+        f"⬇️ Download {aggregation} Result",
+        f"{aggregation.lower()}_result.csv",
+        lambda: csv_file(result_frame, np.argsort(-scores, kind="stable")),
+        len(run.ids),
+        key=f"{aggregation.lower()}_download",
+        stage_name="ranking.csv",
     )
+
+    agreement_section(run, methods, run.borda_key(methods))
+    history_section()
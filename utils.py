@@ -0,0 +1,174 @@
+# utils.py
+"""
+Shared Streamlit helpers for the tabs.
+
+Kept at the repo root (not in pages/) so Streamlit does not list it as a page.
+
+Flow:
+1. app.py calls start_recorder() at the top of every script run; tabs time
+   their stages with `with stage("scoring.score", rows=n):`.
+2. diagnostics_panel() shows this run's stage timings when switched on.
+3. app.py flushes the recorder at the end of the run (JSON log lines and,
+   if DSS_METRICS_FILE is set, the metrics file).
+4. paged_table() shows large results one page at a time (ID search, rank
+   range, page size) and csv_download() builds a CSV only when its button
+   is clicked.
+5. results_store() is the server-wide SQLite run history (engine.store).
+6. get_workspace() gives each session its own directory for weights and
+   results (engine.workspace), so concurrent evaluators never collide.
+7. Only the open tab runs (app.py), and Streamlit drops the state of any
+   widget that did not render in a run; widgets created with
+   key=kept("...") keep their value while their tab is hidden
+   (keep_widget_state() at the top of every run).
+"""
+
+from pathlib import Path
+from typing import BinaryIO, Callable, Hashable, Optional, Set, Union
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from engine.cache import RESULT_CACHE
+from engine.metrics import StageRecorder
+from engine.store import ResultStore
+from engine.workspace import Workspace, cleanup_workspaces
+from engine.views import DEFAULT_PAGE_SIZE, PAGE_SIZES, ResultView, page_count, page_positions
+
+# ---------- Constants ----------
+RESULTS_DB_PATH = Path(__file__).parent / "data" / "result" / "results.sqlite"
+WORKSPACE_KEY = "workspace"
+KEPT_WIDGETS_KEY = "kept_widget_keys"
+
+# ---------- Instrumentation ----------
+RECORDER_KEY = "stage_recorder"
+
+def start_recorder() -> StageRecorder:
+    """New recorder for this script run, stored in st.session_state."""
+    recorder = StageRecorder()
+    st.session_state[RECORDER_KEY] = recorder
+    return recorder
+
+def get_recorder() -> StageRecorder:
+    """The current run's recorder (started on demand when a tab runs on its own)."""
+    recorder = st.session_state.get(RECORDER_KEY)
+    return recorder if recorder is not None else start_recorder()
+
+def stage(name: str, rows: Optional[int] = None):
+    """Time a block as one stage of the current run."""
+    return get_recorder().stage(name, rows)
+
+def diagnostics_panel(recorder: StageRecorder) -> None:
+    """Optional table of stage timings and memory for this run."""
+    if not st.toggle("🩺 Show diagnostics", key="show_diagnostics"):
+        return
+    rows = recorder.to_rows()
+    if not rows:
+        st.caption("No stages recorded in this run.")
+        return
+    df = pd.DataFrame(rows).rename(columns={
+        "stage": "Stage",
+        "seconds": "Seconds",
+        "rss_delta_mb": "RSS Δ (MB)",
+        "peak_rss_delta_mb": "Peak RSS Δ (MB)",
+        "rows": "Rows",
+        "calls": "Calls",
+    })
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    st.caption(
+        f"Run {recorder.run_id} · {df['Seconds'].sum():.3f}s in recorded stages · "
+        "background writes are logged when they finish"
+    )
+
+# ---------- Widget State ----------
+
+def kept(key: str) -> str:
+    """Widget key whose value survives runs in which its tab is not rendered."""
+    keys: Set[str] = st.session_state.setdefault(KEPT_WIDGETS_KEY, set())
+    keys.add(key)
+    return key
+
+def keep_widget_state() -> None:
+    """Re-assign every kept widget value so this run does not drop it (call before any tab runs)."""
+    for key in st.session_state.get(KEPT_WIDGETS_KEY, ()):
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+
+# ---------- Result Views ----------
+
+def paged_table(
+    key: str,
+    view: ResultView,
+    frame_of: Callable[[np.ndarray], pd.DataFrame],
+    ids=None,
+    cache_id: Optional[Hashable] = None,
+) -> np.ndarray:
+    """
+    Filter controls and one page of a result; returns the selected display positions.
+
+    frame_of builds the DataFrame for a set of display positions, so only the
+    visible page is materialized and sent to the browser. With cache_id, each
+    distinct filter is evaluated once (shared RESULT_CACHE).
+    """
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        query = st.text_input("🔎 Search ID", key=f"{key}_query").strip()
+    rank_range = None
+    if view.ranks is not None and len(view) and not np.isnan(view.ranks).all():
+        worst = int(np.nanmax(view.ranks))
+        with col2:
+            rank_from = st.number_input("Rank from", min_value=1, value=1, key=f"{key}_rank_from")
+        with col3:
+            rank_to = st.number_input("Rank to", min_value=1, value=worst, key=f"{key}_rank_to")
+        if (rank_from, rank_to) != (1, worst):
+            rank_range = (int(rank_from), int(rank_to))
+
+    def select() -> np.ndarray:
+        return view.select(ids, query, rank_range)
+
+    if cache_id is not None and (query or rank_range):
+        selection = RESULT_CACHE.get_or_compute((cache_id, "select", query, rank_range), select)
+    else:
+        selection = select()
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key=f"{key}_page_size")
+    pages = page_count(len(selection), page_size)
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages  # the filter shrank the result
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+
+    st.dataframe(frame_of(page_positions(selection, page, page_size)), use_container_width=True, hide_index=True)
+    st.caption(f"{len(selection):,} of {len(view):,} rows · page {page} of {pages}")
+    return selection
+
+def csv_download(
+    label: str, file_name: str, build: Callable[[], Union[bytes, BinaryIO]], rows: int, key: str, stage_name: str
+) -> None:
+    """Download button whose CSV (e.g. engine.views.csv_file) is built only when it is clicked."""
+    st.download_button(label, get_recorder().wrap(stage_name, build, rows), file_name, "text/csv", key=key, on_click="ignore")
+
+# ---------- Results Store ----------
+
+@st.cache_resource
+def results_store() -> ResultStore:
+    """Run history shared by every session on this server."""
+    return ResultStore(RESULTS_DB_PATH)
+
+# ---------- Workspaces ----------
+
+def get_workspace() -> Workspace:
+    """This session's private workspace (stale ones are cleaned up when a new one is made)."""
+    workspace = st.session_state.get(WORKSPACE_KEY)
+    if workspace is None:
+        cleanup_workspaces()
+        workspace = Workspace.create()
+        st.session_state[WORKSPACE_KEY] = workspace
+    else:
+        try:
+            workspace.touch()
+        except FileNotFoundError:  # removed after a long idle period
+            workspace = Workspace.create(workspace.root.parent, workspace.name)
+    return workspace